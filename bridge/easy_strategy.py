@@ -1,13 +1,16 @@
 import math
 import bridge.processors.field as fld
+import bridge.processors.log as log
 import bridge.processors.waypoint as wp
 
+logger = log.get_logger("easy_strategy")
+
 
 def easy_run(field: fld.Field, waypoints: list[wp.Waypoint]) -> None:
     robot = field.allies[0]
     ball_pos = field.ball.get_pos()
 
-    print("dist:", (robot.get_pos() - ball_pos).mag())
+    logger.debug("dist: %s", (robot.get_pos() - ball_pos).mag())
 
 
 # длина вектора - point.mag()
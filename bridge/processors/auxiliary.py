@@ -4,16 +4,22 @@
 
 import math
 import typing
-
 from typing import Optional
+
 from bridge.processors import const
 
 
 class Point:
     """
     Класс, описывающий точку (вектор)
+
+    Операции не изменяют точку и возвращают новую. Координаты не защищены от записи,
+    но присваивать их нельзя: точки разделяются между объектами (RIGHT, UP, путевые точки).
+    Для накопления сумм в циклах используется PointAcc
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x: float = 0, y: float = 0):
         self.x = x
         self.y = y
@@ -27,13 +33,16 @@ class Point:
         return Point(-self.x, -self.y)
 
     def __sub__(self, p: "Point") -> "Point":
-        return self + -p
+        return Point(self.x - p.x, self.y - p.y)
 
     def __mul__(self, a: float) -> "Point":
         return Point(self.x * a, self.y * a)
 
+    def __rmul__(self, a: float) -> "Point":
+        return Point(self.x * a, self.y * a)
+
     def __truediv__(self, a: float) -> "Point":
-        return self * (1 / a)
+        return Point(self.x / a, self.y / a)
 
     def __pow__(self, a: float) -> "Point":
         return Point(self.x**a, self.y**a)
@@ -46,6 +55,9 @@ class Point:
     def __str__(self) -> str:
         return f"x = {self.x:.2f}, y = {self.y:.2f}"
 
+    def __repr__(self) -> str:
+        return f"Point({self.x!r}, {self.y!r})"
+
     def mag(self) -> float:
         """
         Получить модуль вектора
@@ -62,10 +74,74 @@ class Point:
         """
         Получить единичный вектор, коллинеарный данному
         """
-        if self.mag() == 0:
+        mag = math.hypot(self.x, self.y)
+        if mag == 0:
             # raise ValueError("БАГА, .unity от нулевого вектора")
             return self
-        return self / self.mag()
+        return Point(self.x / mag, self.y / mag)
+
+    def dist_to(self, p: "Point") -> float:
+        """
+        Получить расстояние до точки p
+        """
+        return math.hypot(self.x - p.x, self.y - p.y)
+
+    def dot(self, p: "Point") -> float:
+        """
+        Получить скалярное произведение с вектором p
+        """
+        return self.x * p.x + self.y * p.y
+
+    def cross(self, p: "Point") -> float:
+        """
+        Получить векторное произведение с вектором p (см. vec_mult)
+        """
+        return self.x * p.y - self.y * p.x
+
+    def rotate_cs(self, cos: float, sin: float) -> "Point":
+        """
+        Повернуть вектор на угол, заданный заранее посчитанными косинусом и синусом
+        """
+        return Point(self.x * cos - self.y * sin, self.y * cos + self.x * sin)
+
+
+class PointAcc(Point):
+    """
+    Изменяемая точка для накопления сумм без создания промежуточных объектов
+    """
+
+    __slots__ = ()
+
+    def __iadd__(self, p: typing.Optional[Point]) -> "PointAcc":
+        if p is None:
+            return self
+        self.x += p.x
+        self.y += p.y
+        return self
+
+    def __isub__(self, p: Point) -> "PointAcc":
+        self.x -= p.x
+        self.y -= p.y
+        return self
+
+    def __imul__(self, a: float) -> "PointAcc":
+        self.x *= a
+        self.y *= a
+        return self
+
+    def add_scaled(self, p: Point, a: float) -> "PointAcc":
+        """
+        Прибавить вектор p, умноженный на a
+        """
+        self.x += p.x * a
+        self.y += p.y * a
+        return self
+
+    def to_point(self) -> Point:
+        """
+        Получить копию в виде обычной точки
+        """
+        return Point(self.x, self.y)
 
 
 RIGHT = Point(1, 0)
@@ -78,7 +154,7 @@ def dist2line(p1: Point, p2: Point, p: Point) -> float:
     """
     Рассчитать расстояние от точки p до прямой, образованной точками p1 и p2
     """
-    return abs(vec_mult((p2 - p1).unity(), p - p1))
+    return abs((p2 - p1).unity().cross(p - p1))
 
 
 def line_poly_intersect(
@@ -116,9 +192,9 @@ def is_point_inside_poly(p: Point, poly: list[Point]) -> bool:
     """
     Определить, лежит ли точка внутри выпуклого полигона
     """
-    old_sign = sign(vec_mult(p - poly[-1], poly[0] - poly[-1]))
+    old_sign = sign((p - poly[-1]).cross(poly[0] - poly[-1]))
     for i in range(len(poly) - 1):
-        if old_sign != sign(vec_mult(p - poly[i], poly[i + 1] - poly[i])):
+        if old_sign != sign((p - poly[i]).cross(poly[i + 1] - poly[i])):
             return False
     return True
 
@@ -134,10 +210,10 @@ def average_point(points: list[Point]) -> Point:
     """
     Возвращает точку с усредненными координатами
     """
-    point = Point(0, 0)
+    point = PointAcc(0, 0)
     for p in points:
         point += p
-    return point / len(points)
+    return Point(point.x / len(points), point.y / len(points))
 
 
 def average_angle(angles: list[float]) -> float:
@@ -237,10 +313,7 @@ def rotate(p: Point, angle: float) -> Point:
     """
     Повернуть вектор p на угол angle
     """
-    return Point(
-        p.x * math.cos(angle) - p.y * math.sin(angle),
-        p.y * math.cos(angle) + p.x * math.sin(angle),
-    )
+    return p.rotate_cs(math.cos(angle), math.sin(angle))
 
 
 def find_nearest_point(
@@ -256,8 +329,9 @@ def find_nearest_point(
     for _, point in enumerate(points):
         if point in exclude:
             continue
-        if dist(p, point) < min_dist:
-            min_dist = dist(p, point)
+        d = p.dist_to(point)
+        if d < min_dist:
+            min_dist = d
             closest = point
     return closest
 
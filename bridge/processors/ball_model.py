@@ -0,0 +1,140 @@
+"""
+Модель движения мяча и расчет перехвата
+
+Мяч после удара сначала скользит (замедление BALL_SLIDE_ACC), а после снижения
+скорости до 5/7 начальной катится (замедление BALL_ROLL_ACC)
+"""
+
+import math
+
+import numpy as np
+
+from bridge.processors import const
+
+# Доля скорости, при которой скольжение переходит в качение (сплошной шар)
+ROLL_RATIO = 5 / 7
+
+
+class BallPredictor:
+    """
+    Предсказатель траектории мяча
+    """
+
+    def __init__(
+        self,
+        slide_acc: float = const.BALL_SLIDE_ACC,
+        roll_acc: float = const.BALL_ROLL_ACC,
+    ) -> None:
+        """
+        Конструктор
+
+        slide_acc - замедление при скольжении [мм/с^2]
+        roll_acc - замедление при качении [мм/с^2]
+        """
+        self._slide_acc = slide_acc
+        self._roll_acc = roll_acc
+
+        self.pos = np.zeros(2)
+        self.vel = np.zeros(2)
+        self._speed = 0.0
+        self._roll_speed = 0.0
+        self._sliding = False
+
+    def update(self, pos: np.ndarray, vel: np.ndarray) -> None:
+        """
+        Обновить состояние мяча
+
+        Резкий рост скорости считается ударом: мяч снова начинает скользить
+        """
+        speed = math.hypot(vel[0], vel[1])
+        if speed > self._speed + const.BALL_KICK_DETECT_SPEED:
+            self._sliding = True
+            self._roll_speed = ROLL_RATIO * speed
+        elif self._sliding and speed <= self._roll_speed:
+            self._sliding = False
+        if not self._sliding:
+            self._roll_speed = speed
+        self._speed = speed
+        self.pos[:] = pos
+        self.vel[:] = vel
+
+    def get_stop_time(self) -> float:
+        """
+        Получить время до остановки мяча [с]
+        """
+        slide_time = (self._speed - self._roll_speed) / self._slide_acc
+        return slide_time + self._roll_speed / self._roll_acc
+
+    def get_distance(self, t: np.ndarray) -> np.ndarray:
+        """
+        Получить путь, пройденный мячом к моментам t [с] от текущего
+        """
+        t = np.asarray(t, dtype=float)
+        v0, v1 = self._speed, self._roll_speed
+        slide_time = (v0 - v1) / self._slide_acc
+        roll_time = v1 / self._roll_acc
+
+        t_slide = np.minimum(t, slide_time)
+        t_roll = np.clip(t - slide_time, 0, roll_time)
+        return v0 * t_slide - self._slide_acc * t_slide**2 / 2 + v1 * t_roll - self._roll_acc * t_roll**2 / 2
+
+    def predict(self, t: np.ndarray) -> np.ndarray:
+        """
+        Получить положения мяча [len(t), 2] в моменты t [с] от текущего
+        """
+        dist = self.get_distance(t)
+        if self._speed == 0:
+            return np.broadcast_to(self.pos, (len(dist), 2)).copy()
+        direction = self.vel / self._speed
+        return self.pos + dist[:, np.newaxis] * direction
+
+    def get_intercepts(
+        self,
+        robots_pos: np.ndarray,
+        max_speed: float = const.MAX_SPEED,
+        max_acc: float = const.MAX_ACC,
+        horizon: float = const.BALL_PREDICT_HORIZON,
+        step: float = const.BALL_PREDICT_STEP,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Найти для каждого робота самый ранний момент и точку перехвата мяча
+
+        robots_pos - положения роботов [N, 2]
+        Робот считается стартующим с места и разгоняющимся до max_speed с ускорением max_acc
+
+        @return (times [N], points [N, 2]); если мяч не остановится за horizon и
+        перехват невозможен, время равно inf
+        """
+        robots_pos = np.asarray(robots_pos, dtype=float).reshape(-1, 2)
+        times = np.arange(0.0, horizon + step / 2, step)
+        ball_pos = self.predict(times)
+
+        delta = ball_pos[np.newaxis, :, :] - robots_pos[:, np.newaxis, :]
+        dist = np.maximum(np.hypot(delta[..., 0], delta[..., 1]) - const.ROBOT_R - const.BALL_R, 0)
+        reach = reach_time(dist, max_speed, max_acc)
+
+        feasible = reach <= times
+        first = np.argmax(feasible, axis=1)
+        found = feasible[np.arange(len(robots_pos)), first]
+
+        result_t = np.where(found, times[first], np.inf)
+        result_p = ball_pos[first]
+
+        # Мяч остановился в пределах горизонта - до него можно доехать позже
+        if self.get_stop_time() <= horizon:
+            late = ~found
+            result_t[late] = reach[late, -1]
+            result_p[late] = ball_pos[-1]
+        return result_t, result_p
+
+
+def reach_time(dist: np.ndarray, max_speed: float, max_acc: float) -> np.ndarray:
+    """
+    Получить минимальное время проезда расстояния dist с места с ограничениями скорости и ускорения
+    """
+    acc_dist = max_speed**2 / (2 * max_acc)
+    return np.where(
+        dist < acc_dist,
+        np.sqrt(2 * dist / max_acc),
+        max_speed / max_acc + (dist - acc_dist) / max_speed,
+    )
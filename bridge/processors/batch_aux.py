@@ -0,0 +1,244 @@
+"""
+Векторизованные версии функций auxiliary для массивов точек
+
+Точки задаются массивами NumPy формы [N, 2] (или [2] для одной точки), полигоны -
+массивами вершин [M, 2]. Результаты совпадают с результатами функций auxiliary,
+примененных к каждой точке по отдельности
+"""
+
+import typing
+
+import numpy as np
+
+import bridge.processors.auxiliary as aux
+
+
+def to_array(points: typing.Iterable[aux.Point]) -> np.ndarray:
+    """
+    Получить массив [N, 2] из списка точек
+    """
+    return np.array([(p.x, p.y) for p in points], dtype=float).reshape(-1, 2)
+
+
+def to_points(arr: np.ndarray) -> list[aux.Point]:
+    """
+    Получить список точек из массива [N, 2]
+    """
+    return [aux.Point(x, y) for x, y in np.asarray(arr, dtype=float).reshape(-1, 2).tolist()]
+
+
+def _cross(v: np.ndarray, u: np.ndarray) -> np.ndarray:
+    return v[..., 0] * u[..., 1] - v[..., 1] * u[..., 0]
+
+
+def dist(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Рассчитать расстояния между точками a и b (с broadcasting)
+    """
+    delta = np.asarray(a, dtype=float) - np.asarray(b, dtype=float)
+    return np.hypot(delta[..., 0], delta[..., 1])
+
+
+def pairwise_dist(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Рассчитать расстояния между всеми парами точек a [N, 2] и b [M, 2]
+
+    @return матрица [N, M]
+    """
+    return dist(np.asarray(a)[:, np.newaxis, :], np.asarray(b)[np.newaxis, :, :])
+
+
+def closest_point_on_line(p1: np.ndarray, p2: np.ndarray, points: np.ndarray, is_inf: str = "S") -> np.ndarray:
+    """
+    Получить ближайшие к точкам points точки на линиях p1-p2
+
+    p1, p2, points - массивы [..., 2], согласованные по broadcasting
+    is_inf - как в auxiliary.closest_point_on_line
+    """
+    p1 = np.asarray(p1, dtype=float)
+    p2 = np.asarray(p2, dtype=float)
+    points = np.asarray(points, dtype=float)
+
+    line = p2 - p1
+    length = np.hypot(line[..., 0], line[..., 1])
+    safe = np.where(length == 0, 1, length)
+    direction = line / safe[..., np.newaxis]
+    proj = np.einsum("...i,...i->...", points - p1, direction)
+
+    result = p1 + direction * proj[..., np.newaxis]
+    shape = np.broadcast_shapes(result.shape, p1.shape)
+    result = np.broadcast_to(result, shape).copy()
+    p1 = np.broadcast_to(p1, shape)
+    p2 = np.broadcast_to(p2, shape)
+    if is_inf != "L":
+        before = np.broadcast_to(proj <= 0, shape[:-1])
+        result[before] = p1[before]
+    if is_inf == "S":
+        after = np.broadcast_to((proj >= length) & (proj > 0), shape[:-1])
+        result[after] = p2[after]
+    degenerate = np.broadcast_to(length == 0, shape[:-1])
+    result[degenerate] = p1[degenerate]
+    return result
+
+
+def get_line_intersection(
+    line1_start: np.ndarray,
+    line1_end: np.ndarray,
+    line2_start: np.ndarray,
+    line2_end: np.ndarray,
+    is_inf: str = "SS",
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Получить точки пересечения отрезков или прямых (см. auxiliary.get_line_intersection)
+
+    @return (points [..., 2], found [...]) - точки пересечения и маска их существования
+    """
+    line1_start = np.asarray(line1_start, dtype=float)
+    line2_start = np.asarray(line2_start, dtype=float)
+    delta1 = np.asarray(line1_end, dtype=float) - line1_start
+    delta2 = np.asarray(line2_end, dtype=float) - line2_start
+    delta_start = line1_start - line2_start
+
+    determinant = delta1[..., 1] * delta2[..., 0] - delta2[..., 1] * delta1[..., 0]
+    parallel = determinant == 0
+    safe = np.where(parallel, 1, determinant)
+    t1 = (delta_start[..., 0] * delta2[..., 1] - delta2[..., 0] * delta_start[..., 1]) / safe
+    t2 = (delta_start[..., 0] * delta1[..., 1] - delta1[..., 0] * delta_start[..., 1]) / safe
+
+    found = ~parallel & _is_valid_param(t1, is_inf[0]) & _is_valid_param(t2, is_inf[1])
+    return line1_start + t1[..., np.newaxis] * delta1, found
+
+
+def _is_valid_param(t: np.ndarray, kind: str) -> np.ndarray:
+    """
+    Проверить параметр точки на прямой: S - отрезок, R - луч, L - прямая
+    """
+    if kind == "S":
+        return (t >= 0) & (t <= 1)
+    if kind == "R":
+        return t >= 0
+    return np.ones(np.shape(t), dtype=bool)
+
+
+def segment_poly_intersect(starts: np.ndarray, ends: np.ndarray, poly: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Найти пересечения отрезков starts[i]-ends[i] с полигоном poly
+
+    Для каждого отрезка возвращается та же точка, что и у auxiliary.segment_poly_intersect
+    @return (points [N, 2], found [N])
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    poly = np.asarray(poly, dtype=float)
+    # Ребра в порядке обхода auxiliary: (poly[-1], poly[0]), (poly[0], poly[1]), ...
+    edge_start = np.roll(poly, 1, axis=0)
+    points, found = get_line_intersection(
+        starts[:, np.newaxis, :], ends[:, np.newaxis, :], edge_start[np.newaxis], poly[np.newaxis], "SS"
+    )
+    first = np.argmax(found, axis=1)
+    rows = np.arange(len(starts))
+    return points[rows, first], found[rows, first]
+
+
+def is_point_inside_poly(points: np.ndarray, poly: np.ndarray) -> np.ndarray:
+    """
+    Определить, какие из точек points [N, 2] лежат внутри выпуклого полигона poly
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    poly = np.asarray(poly, dtype=float)
+    old_sign = np.sign(_cross(points - poly[-1], poly[0] - poly[-1]))
+    signs = np.sign(_cross(points[:, np.newaxis, :] - poly[np.newaxis, :-1, :], (poly[1:] - poly[:-1])[np.newaxis]))
+    return np.all(signs == old_sign[:, np.newaxis], axis=1)
+
+
+def nearest_point_on_poly(points: np.ndarray, poly: np.ndarray) -> np.ndarray:
+    """
+    Получить ближайшие к точкам points [N, 2] точки на границе полигона poly
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    poly = np.asarray(poly, dtype=float)
+    closest = closest_point_on_line(np.roll(poly, 1, axis=0)[np.newaxis], poly[np.newaxis], points[:, np.newaxis, :], "S")
+    d = dist(closest, points[:, np.newaxis, :])
+    return closest[np.arange(len(points)), np.argmin(d, axis=1)]
+
+
+def get_tangent_points(center: np.ndarray, points: np.ndarray, r: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Получить точки касания касательных из points [N, 2] к окружности center, r
+
+    @return (tangents [N, 2, 2], count [N]) - точки касания и их количество (0, 1 или 2),
+    как у auxiliary.get_tangent_points
+    """
+    center = np.asarray(center, dtype=float)
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    d = dist(center, points)
+    count = np.where(d < r, 0, np.where(d == r, 1, 2))
+
+    # Пересечение окружности с окружностью на отрезке center-point как на диаметре
+    mid = (center + points) / 2
+    d_mid = d / 2
+    safe = np.where(d_mid == 0, 1, d_mid)
+    # Расстояние от центра до хорды касания: (r^2 - d_mid^2 + d_mid^2) / (2 * d_mid)
+    a = r**2 / (2 * safe)
+    h = np.sqrt(np.maximum(r**2 - a**2, 0))
+    delta = (mid - center) / safe[:, np.newaxis]
+    base = center + a[:, np.newaxis] * delta
+    normal = np.stack((delta[:, 1], -delta[:, 0]), axis=1) * h[:, np.newaxis]
+
+    tangents = np.stack((base + normal, base - normal), axis=1)
+    single = count == 1
+    tangents[single, 0] = points[single]
+    return tangents, count
+
+
+def line_circle_intersect(x1: np.ndarray, x2: np.ndarray, c: np.ndarray, radius: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Найти пересечения отрезков x1-x2 с окружностью c, radius (см. auxiliary.line_circle_intersect)
+
+    @return (points [N, 2, 2], valid [N, 2]) - точки пересечения и маска тех,
+    которые вернула бы auxiliary.line_circle_intersect (в том же порядке)
+    """
+    x1 = np.asarray(x1, dtype=float).reshape(-1, 2)
+    x2 = np.asarray(x2, dtype=float).reshape(-1, 2)
+    c = np.asarray(c, dtype=float)
+
+    h = closest_point_on_line(x1, x2, c, "L")
+    dist_h = dist(c, h)
+    d = np.sqrt(np.maximum(radius**2 - dist_h**2, 0))
+
+    line = x2 - x1
+    length = np.hypot(line[:, 0], line[:, 1])
+    unit = line / np.where(length == 0, 1, length)[:, np.newaxis]
+    vec = unit * d[:, np.newaxis]
+    points = np.stack((h + vec, h - vec), axis=1)
+
+    # Точка считается лежащей на отрезке с точностью сравнения aux.Point (0.1 мм)
+    on_segment = np.empty((len(x1), 2), dtype=bool)
+    for k in range(2):
+        proj = closest_point_on_line(x1, x2, points[:, k], "S")
+        on_segment[:, k] = np.all(np.abs(proj - points[:, k]) < 0.1, axis=1)
+
+    tangent = radius == dist_h
+    valid = on_segment & (radius > dist_h)[:, np.newaxis]
+    valid[tangent] = (True, False)
+    points[tangent, 0] = h[tangent]
+    return points, valid
+
+
+def is_point_inside_circle(points: np.ndarray, c: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Определить, какие из точек points лежат внутри окружности c, radius
+    """
+    return dist(points, c) < radius
+
+
+def nearest_point_on_circle(points: np.ndarray, c: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Получить ближайшие к points [N, 2] точки окружности c, radius
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    c = np.asarray(c, dtype=float)
+    delta = points - c
+    mag = np.hypot(delta[:, 0], delta[:, 1])
+    unit = delta / np.where(mag == 0, 1, mag)[:, np.newaxis]
+    return c + unit * radius
@@ -0,0 +1,67 @@
+"""
+Кольцевой буфер команд роботам в общей памяти
+
+Контроллер пишет кадры команд [2, TEAM_ROBOTS_MAX_COUNT, 13] (32x13 чисел, как таблица
+CommandSink) прямо в общую память, CommandSink читает последний записанный кадр без шины
+и десериализации. У каждого цвета свой буфер, поэтому два контроллера не мешают друг другу
+
+Кадр: [цвет (синие, желтые), номер робота, поле команды]; столбец 0 - признак
+наличия команды роботу (в пакете на робота он нулевой)
+"""
+
+import typing
+
+import numpy as np
+
+import bridge.processors.const as const
+import bridge.processors.robot_command as robot_command
+import bridge.processors.shared_frames as shared_frames
+
+FRAME_SHAPE = (2, const.TEAM_ROBOTS_MAX_COUNT, robot_command.COMMAND_SIZE)
+
+
+class CommandRing:
+    """
+    Кольцевой буфер кадров команд одного цвета
+    """
+
+    def __init__(self, color: const.Color, create: bool, slots: int = const.COMMANDS_SHM_SLOTS) -> None:
+        """
+        Конструктор
+
+        color - цвет команды, пишущей в буфер
+        create - создать буфер (контроллер) или подключиться к существующему (CommandSink);
+        при подключении к еще не созданному буферу возникает FileNotFoundError
+        """
+        self._frames = shared_frames.SharedFrames(f"ssl-commands-{color.name.lower()}", FRAME_SHAPE, slots, create)
+
+    def write(self, commands: typing.Iterable[robot_command.RobotCommand]) -> int:
+        """
+        Записать кадр из команд роботам
+
+        @return номер записанного кадра
+        """
+        frame = self._frames.begin_write()
+        frame.fill(0)
+        for command in commands:
+            color = robot_command.get_color_index(command.color)
+            if color is None or command.ctrl_id is None:
+                continue
+            row = frame[color, command.ctrl_id]
+            command.write(row)
+            row[0] = 1
+        return self._frames.end_write()
+
+    def read(self, out: np.ndarray) -> typing.Optional[int]:
+        """
+        Скопировать в out [FRAME_SHAPE] последний кадр, если он новее прочитанного ранее
+
+        @return номер кадра или None, если нового целого кадра нет
+        """
+        return self._frames.read(out)
+
+    def close(self) -> None:
+        """
+        Отключиться от буфера (и удалить его, если он создан этим объектом)
+        """
+        self._frames.close()
@@ -28,6 +28,7 @@ PENALTY_KICKER = 13
 ENEMY_GK = 1
 
 CAMERAS_COUNT: int = 4
+VISION_MAX_FRAME_AGE = 0.1  # s, кадры камер старше этого не используются
 MAX_BALLS_IN_CAMERA: int = 64
 MAX_BALLS_IN_FIELD: int = CAMERAS_COUNT * MAX_BALLS_IN_CAMERA
 BALL_PACKET_SIZE: int = 2
@@ -66,11 +67,34 @@ for i in range(TEAM_ROBOTS_MAX_COUNT):
         CONTROL_MAPPING[i] = -1
 
 TOPIC_SINK = "control-sink"
+SINK_BATCHED = True  # отправлять в TOPIC_SINK команды всех роботов одним сообщением за такт
+COMMANDS_SHM = False  # передавать команды от контроллера в CommandSink через общую память, а не TOPIC_SINK
+COMMANDS_SHM_SLOTS = 4  # количество кадров в кольцевом буфере команд
+VISION_SHM = True  # разбирать SSL-Vision один раз в VisionProcessor и читать снимок поля из общей памяти
+LOG_LEVEL = "INFO"  # уровень журнала, DEBUG включает сообщения с каждого такта
+LOG_RATE_INTERVAL = 1.0  # с, минимальный интервал между сообщениями с одним ключом
+LOG_QUEUE_SIZE = 1000  # сообщений в очереди журнала, при переполнении новые отбрасываются
 ##################################################
 
 ##################################################
 # CONTROL CONSTS
-Ts = 0.05  # s
+Ts = 0.05  # s, период стратегии и планирования маршрутов
+LOW_LEVEL_Ts = Ts / 4  # s, период регуляторов скорости роботов и отправки команд
+VISION_Ts = 1 / 60  # s, период обновления модели мира по SSL-Vision (VisionProcessor)
+MAX_DT = 3 * Ts  # s, ограничение фактического шага регуляторов после долгого такта
+SINK_Ts = LOW_LEVEL_Ts / 2  # s, период опроса команд в CommandSink и RobotCommandsSender
+
+# Бюджеты этапов такта контроллера [с]: такт с планированием укладывается в Ts,
+# такт только с регуляторами (vision, control, assign) - в LOW_LEVEL_Ts.
+# Стратегия и reroute выполняются в том же процессе, что и регуляторы, поэтому такт
+# с планированием задерживает регуляторы на время до бюджета "planning"
+STAGE_BUDGETS = {
+    "vision": 0.005,
+    "referee": 0.002,
+    "planning": 0.03,
+    "control": 0.008,
+    "assign": 0.002,
+}
 
 # ROBOT SETTING CONSTS
 # MAX_SPEED = 100
@@ -81,13 +105,31 @@ MAX_SPEED = 1000
 MAX_SPEED_R = 30
 SOFT_MAX_SPEED = 750
 SOFT_MAX_SPEED_R = 16
-ACCELERATION = 3
+ACCELERATION = 3  # м/с^2
+MAX_ACC = ACCELERATION * 1000  # мм/с^2, то же ускорение для расчетов перехвата и траекторий
 BASE_KICKER_VOLTAGE = 7.0
 
 R_KP = 7
 R_KD = 0
 KP = 0.1
 
+# TRAJECTORY CONSTS
+TRAJ_MAX_DEVIATION = 200  # мм, отклонение от траектории, после которого она строится заново
+
+# TRACKER CONSTS
+# СКО шума измерения и характерный рывок по осям x [мм], y [мм], угол [рад]
+ROBOT_MEAS_NOISE = (5.0, 5.0, 0.02)
+ROBOT_JERK = (1e4, 1e4, 300.0)
+BALL_MEAS_NOISE = (5.0, 5.0, 1.0)
+BALL_JERK = (2e3, 2e3, 0.0)
+
+# BALL MODEL CONSTS
+BALL_SLIDE_ACC = 3500  # мм/с^2
+BALL_ROLL_ACC = 400  # мм/с^2
+BALL_KICK_DETECT_SPEED = 500  # мм/с, скачок скорости, считающийся ударом
+BALL_PREDICT_HORIZON = 4.0  # с
+BALL_PREDICT_STEP = 0.02  # с
+
 INTERCEPT_SPEED = 50
 GK_PEN_KICKOUT_SPEED = 500
 ##################################################
@@ -102,11 +144,13 @@ GOAL_DX = 4000
 GOAL_DY = 1000
 GOAL_PEN_DX = 1000
 GOAL_PEN_DY = 2000
+FIELD_DY = 3000  # половина ширины поля
 if DIV == "C":
     GOAL_DX = 2250
     GOAL_DY = 800
     GOAL_PEN_DX = 500
     GOAL_PEN_DY = 1350
+    FIELD_DY = 1500
 
 GK_FORW = 200 + ROBOT_R
 KICK_ALIGN_DIST = 200
@@ -118,7 +162,19 @@ BALL_GRABBED_DIST = 115
 BALL_GRABBED_ANGLE = 0.8
 
 # ROUTE CONSTS
+SPATIAL_CELL_SIZE = 500  # мм, размер ячейки индекса роботов
 KEEP_BALL_DIST = 500 + ROBOT_R
+PLANNER_CLEARANCE = 2 * ROBOT_R + 100  # мм, радиус робота-препятствия для планировщика
+PATH_PLANNER = "visibility"  # глобальный планировщик: "visibility", "rrt" или None
+RRT_TIME_BUDGET = 0.01  # с, время RRT* на один маршрут
+COSTMAP_RESOLUTION = 50  # мм, размер клетки карты стоимости
+REPLAN_TARGET_TOL = 50  # мм, смещение цели, при котором сохраненный путь строится заново
+# Исполнителей глобального планировщика PATH_PLANNER, 0 - планировать в процессе контроллера.
+# Для "rrt" процессы ускоряют перепланирование, для "visibility" передача заданий дороже расчета
+PLANNING_WORKERS = 0
+PLANNING_PROCESSES = True  # исполнители - процессы (иначе потоки)
+DECONFLICT_HORIZON = 1.0  # с, горизонт проверки столкновений союзников
+DECONFLICT_WEIGHT = 500  # мм, вес близкого столкновения относительно отклонения скорости [мм/с]
 
 # VOLTAGES
 VOLTAGE_PASS = 6
@@ -0,0 +1,184 @@
+"""
+Растровая карта стоимости поля для планирования
+
+Слои:
+- статический: расстояние со знаком до расширенных штрафных зон (пересчитывается
+  только при изменении геометрии поля)
+- динамический: счетчики занятости клеток раздутыми кругами роботов и зоной вокруг мяча,
+  обновляется только для сместившихся объектов
+
+Все запросы - обращение к элементам массивов по индексу клетки; точная проверка
+статических зон (inside_static) обращается к многоугольникам только у их границ
+"""
+
+import math
+import typing
+
+import numpy as np
+
+from bridge.processors import const, polygon
+
+
+class CostMap:
+    """
+    Карта стоимости на равномерной сетке
+    """
+
+    def __init__(
+        self,
+        resolution: float = const.COSTMAP_RESOLUTION,
+        robot_radius: float = const.PLANNER_CLEARANCE,
+        count: int = const.ROBOTS_MAX_COUNT,
+    ) -> None:
+        """
+        Конструктор
+
+        resolution - размер клетки [мм]
+        robot_radius - радиус круга, занимаемого роботом-препятствием [мм]
+        count - количество роботов
+        """
+        self.resolution = resolution
+        margin = 2 * max(robot_radius, const.KEEP_BALL_DIST)
+        self.origin = np.array((-abs(const.GOAL_DX) - margin, -const.FIELD_DY - margin))
+        size = 2 * np.abs(self.origin) / resolution
+        self.shape = (int(np.ceil(size[0])) + 1, int(np.ceil(size[1])) + 1)
+
+        self.static_sdf = np.full(self.shape, np.inf)
+        self._static_polygons: list[polygon.ConvexPolygon] = []
+        self.occupancy = np.zeros(self.shape, dtype=np.int16)
+
+        self._robot_radius = robot_radius
+        self._robot_disc = _disc_offsets(robot_radius, resolution)
+        self._ball_disc = _disc_offsets(const.KEEP_BALL_DIST, resolution)
+
+        # Клетки центров, в которых сейчас отмечены роботы и мяч (-1 - не отмечен)
+        self._robot_cells = np.full((count, 2), -1)
+        self._ball_cell = np.array((-1, -1))
+
+        # Центры клеток для расчета статического слоя
+        xs = self.origin[0] + np.arange(self.shape[0]) * resolution
+        ys = self.origin[1] + np.arange(self.shape[1]) * resolution
+        self._centers = np.stack(np.meshgrid(xs, ys, indexing="ij"), axis=-1).reshape(-1, 2)
+
+    def to_cells(self, points: np.ndarray) -> np.ndarray:
+        """
+        Получить индексы клеток [N, 2] для точек [N, 2]
+        """
+        return np.rint((np.asarray(points, dtype=float) - self.origin) / self.resolution).astype(np.intp)
+
+    def _inside(self, cells: np.ndarray) -> np.ndarray:
+        return (
+            (cells[..., 0] >= 0) & (cells[..., 0] < self.shape[0]) & (cells[..., 1] >= 0) & (cells[..., 1] < self.shape[1])
+        )
+
+    def set_static(self, polygons: typing.Sequence[polygon.ConvexPolygon]) -> None:
+        """
+        Пересчитать статический слой по многоугольникам запретных зон
+        """
+        sdf = np.full(len(self._centers), np.inf)
+        for poly in polygons:
+            sdf = np.minimum(sdf, poly.sdf_many(self._centers))
+        self.static_sdf = sdf.reshape(self.shape)
+        self._static_polygons = list(polygons)
+
+    def _stamp(self, cell: np.ndarray, disc: np.ndarray, value: int) -> None:
+        """
+        Добавить value к счетчикам клеток круга disc с центром в клетке cell
+        """
+        cells = cell + disc
+        cells = cells[self._inside(cells)]
+        self.occupancy[cells[:, 0], cells[:, 1]] += value
+
+    def update_robots(self, pos: np.ndarray, used: np.ndarray) -> int:
+        """
+        Обновить отметки роботов
+
+        pos - положения всех роботов [count, 2], used - маска роботов на поле
+        Перерисовываются только роботы, сместившиеся на половину клетки, появившиеся или пропавшие
+
+        @return количество перерисованных роботов
+        """
+        cells = np.where(used[:, np.newaxis], self.to_cells(pos), -1)
+        changed = np.flatnonzero(np.any(cells != self._robot_cells, axis=1))
+        for i in changed:
+            if self._robot_cells[i, 0] >= 0:
+                self._stamp(self._robot_cells[i], self._robot_disc, -1)
+            if cells[i, 0] >= 0:
+                self._stamp(cells[i], self._robot_disc, 1)
+        self._robot_cells[changed] = cells[changed]
+        return len(changed)
+
+    def update_ball(self, pos: np.ndarray, active: bool) -> None:
+        """
+        Обновить зону вокруг мяча (KEEP_BALL_DIST), active - нужно ли ее объезжать
+        """
+        cell = self.to_cells(pos) if active else np.array((-1, -1))
+        if np.array_equal(cell, self._ball_cell):
+            return
+        if self._ball_cell[0] >= 0:
+            self._stamp(self._ball_cell, self._ball_disc, -1)
+        if cell[0] >= 0:
+            self._stamp(cell, self._ball_disc, 1)
+        self._ball_cell = cell
+
+    def get_static_dist(self, points: np.ndarray) -> np.ndarray:
+        """
+        Получить расстояния со знаком [N] до статических запретных зон (отрицательные внутри)
+
+        Точки вне карты считаются свободными (inf)
+        """
+        cells = self.to_cells(np.asarray(points, dtype=float).reshape(-1, 2))
+        inside = self._inside(cells)
+        result = np.full(len(cells), np.inf)
+        result[inside] = self.static_sdf[cells[inside, 0], cells[inside, 1]]
+        return result
+
+    def inside_static(self, points: np.ndarray) -> np.ndarray:
+        """
+        Определить, какие из точек [N, 2] лежат строго внутри статических запретных зон
+
+        Ответ берется из статического слоя; многоугольники проверяются только для точек вне карты
+        и точек, клетки которых ближе половины диагонали клетки к границе зоны
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        sdf = self.get_static_dist(points)
+        result = sdf < 0
+        near = np.flatnonzero((np.abs(sdf) <= self.resolution * math.sqrt(2) / 2) | np.isinf(sdf))
+        if len(near) != 0:
+            exact = np.zeros(len(near), dtype=bool)
+            for poly in self._static_polygons:
+                exact |= poly.contains_many(points[near])
+            result[near] = exact
+        return result
+
+    def is_free(self, points: np.ndarray, ignore: typing.Optional[int] = None) -> np.ndarray:
+        """
+        Определить, какие из точек [N, 2] не заняты препятствиями
+
+        ignore - номер робота, собственный круг которого не считается препятствием
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        cells = self.to_cells(points)
+        inside = self._inside(cells)
+        occupancy = np.zeros(len(points), dtype=np.int16)
+        occupancy[inside] = self.occupancy[cells[inside, 0], cells[inside, 1]]
+
+        if ignore is not None and self._robot_cells[ignore, 0] >= 0:
+            # Вычитаем собственную отметку робота, если клетка в нее попадает
+            delta = cells - self._robot_cells[ignore]
+            own = np.sum(delta * delta, axis=1) <= (self._robot_radius / self.resolution) ** 2
+            occupancy -= own
+
+        static = np.full(len(points), np.inf)
+        static[inside] = self.static_sdf[cells[inside, 0], cells[inside, 1]]
+        return (occupancy <= 0) & (static >= 0)
+
+
+def _disc_offsets(radius: float, resolution: float) -> np.ndarray:
+    """
+    Получить смещения клеток [K, 2], центры которых лежат в круге радиуса radius
+    """
+    r = int(np.ceil(radius / resolution))
+    di, dj = np.meshgrid(np.arange(-r, r + 1), np.arange(-r, r + 1), indexing="ij")
+    mask = di * di + dj * dj <= (radius / resolution) ** 2
+    return np.stack((di[mask], dj[mask]), axis=1)
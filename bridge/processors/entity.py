@@ -9,10 +9,10 @@
 - радиус
 """
 
-from time import time
+import typing
 
 import bridge.processors.auxiliary as aux
-from bridge.processors import const, tau
+from bridge.processors import world
 
 
 class Entity:
@@ -20,10 +20,17 @@ class Entity:
     Класс для описания геометрического объекта на поле
 
     Хранит положение, скорость, угол и тп.
+    Само состояние лежит в строке idx массивов world.EntityStates,
+    объект служит лишь представлением этой строки
     """
 
     def __init__(
-        self, pos: aux.Point, angle: float, R: float, T: float = const.Ts
+        self,
+        pos: aux.Point,
+        angle: float,
+        R: float,
+        states: typing.Optional[world.EntityStates] = None,
+        idx: int = 0,
     ) -> None:
         """
         Конструктор
@@ -31,70 +38,53 @@ class Entity:
         @param pos Изначальное положение объекта. Тип: aux.Point
         @param angle Угол поворота объекта [рад]
         @param R Радиус объекта [м]
+        @param states Общее хранилище состояния группы объектов
+        @param idx Индекс объекта в states
         """
-        # T = 0.05
-        Ts = const.Ts
-
-        self._pos = pos
-        self._vel = aux.Point(0, 0)
-        self._vel_fx = tau.FOD(T, Ts)
-        self._vel_fy = tau.FOD(T, Ts)
-        self._acc = aux.Point(0, 0)
-        self._acc_fx = tau.FOD(T, Ts)
-        self._acc_fy = tau.FOD(T, Ts)
-        self._angle = angle
-        self._anglevel = 0.0
-        self._vel_fr = tau.FOD(T, Ts, True)
+        if states is None:
+            states = world.EntityStates(1)
+            idx = 0
+
+        self._states = states
+        self._idx = idx
         self._radius = R
-        self.last_update_ = 0.0
 
-        self.__launch_flag = False
-        self.__launch_timer = time()
+        states.pos[idx] = (pos.x, pos.y)
+        states.angle[idx] = angle
 
     def update(self, pos: aux.Point, angle: float, t: float) -> None:
         """
         Обновить положение и рассчитать исходя из этого скорость и ускорение
-        !!! Вызывать один раз за итерацию с постоянной частотой !!!
         """
-        self._pos = pos
-        self._angle = angle
-        self._vel.x = self._vel_fx.process(self._pos.x)
-        self._vel.y = self._vel_fy.process(self._pos.y)
-        self._acc.x = self._acc_fx.process(self._vel.x)
-        self._acc.y = self._acc_fy.process(self._vel.y)
-        self._anglevel = self._vel_fr.process(self._angle)
-        self.last_update_ = t
-
-        if not self.__launch_flag and time() - self.__launch_timer > 5:
-            self.__launch_flag = True
+        self._states.update(self._idx, (pos.x, pos.y), angle, t)
 
     def last_update(self) -> float:
         """
         Получить время последнего обновления
         """
-        return self.last_update_
+        return float(self._states.last_update[self._idx])
 
     def get_pos(self) -> aux.Point:
         """Геттер положения"""
-        return self._pos
+        return aux.Point(*self._states.pos[self._idx].tolist())
 
     def get_anglevel(self) -> float:
         """Геттер скорости"""
-        return self._anglevel
+        return float(self._states.anglevel[self._idx])
 
     def get_vel(self) -> aux.Point:
         """Геттер скорости"""
-        if not self.__launch_flag:
-            return self._vel * 0
-        return self._vel
+        if not self._states.launched[self._idx]:
+            return aux.Point(0, 0)
+        return aux.Point(*self._states.vel[self._idx].tolist())
 
     def get_acc(self) -> aux.Point:
         """Геттер ускорения"""
-        return self._acc
+        return aux.Point(*self._states.acc[self._idx].tolist())
 
     def get_angle(self) -> float:
         """Геттер угла"""
-        return self._angle
+        return float(self._states.angle[self._idx])
 
     def get_radius(self) -> float:
         """Геттер радиуса"""
@@ -102,4 +92,4 @@ class Entity:
 
     def __str__(self) -> str:
         """Для print"""
-        return str(self._pos)
+        return str(self.get_pos())
@@ -5,10 +5,17 @@
 from math import cos
 from typing import Optional
 
+import numpy as np
+
 import bridge.processors.auxiliary as aux
+import bridge.processors.ball_model as ball_model
 import bridge.processors.const as const
 import bridge.processors.entity as entity
+import bridge.processors.polygon as polygon
 import bridge.processors.robot as robot
+import bridge.processors.spatial as spatial
+import bridge.processors.tracker as tracker
+import bridge.processors.world as world
 
 
 class Goal:
@@ -58,6 +65,10 @@ class Goal:
             self.center_down - self.eye_up * const.ROBOT_R,
         ]
 
+        # Оболочки с заранее посчитанными нормалями для быстрых запросов
+        self.hull_poly = polygon.ConvexPolygon(self.hull)
+        self.big_hull_poly = polygon.ConvexPolygon(self.big_hull)
+
 
 class Field:
     """
@@ -81,16 +92,57 @@ class Field:
             self.polarity = const.POLARITY * -1
         else:
             self.polarity = const.POLARITY
-        self.ball = entity.Entity(aux.GRAVEYARD_POS, 0, const.BALL_R, 0.2)
+
+        # Состояние всех объектов хранится в массивах, объекты ниже - их представления
+        # Скорости всех объектов оцениваются одним батчевым фильтром Калмана
+        team_size = const.TEAM_ROBOTS_MAX_COUNT
+        self.tracker = tracker.KalmanTracker(2 * team_size + 1, const.ROBOT_MEAS_NOISE, const.ROBOT_JERK)
+        self.tracker.set_noise(2 * team_size, const.BALL_MEAS_NOISE, const.BALL_JERK)
+        self.b_states = world.EntityStates(team_size, self.tracker, 0)
+        self.y_states = world.EntityStates(team_size, self.tracker, team_size)
+        self.ball_states = world.EntityStates(1, self.tracker, 2 * team_size)
+
+        self.ball = entity.Entity(aux.GRAVEYARD_POS, 0, const.BALL_R, states=self.ball_states)
+        self.ball_predictor = ball_model.BallPredictor()
+        # Фильтры скорости роботов команды тоже общие (robot.update_vel_xyw_many)
+        b_filters = robot.make_vel_filters(team_size)
+        y_filters = robot.make_vel_filters(team_size)
         self.b_team = [
-            robot.Robot(aux.GRAVEYARD_POS, 0, const.ROBOT_R, "b", i, ctrl_mapping[i])
+            robot.Robot(aux.GRAVEYARD_POS, 0, const.ROBOT_R, "b", i, ctrl_mapping[i], self.b_states, b_filters)
             for i in range(const.TEAM_ROBOTS_MAX_COUNT)
         ]
         self.y_team = [
-            robot.Robot(aux.GRAVEYARD_POS, 0, const.ROBOT_R, "y", i, ctrl_mapping[i])
+            robot.Robot(aux.GRAVEYARD_POS, 0, const.ROBOT_R, "y", i, ctrl_mapping[i], self.y_states, y_filters)
             for i in range(const.TEAM_ROBOTS_MAX_COUNT)
         ]
         self.all_bots = [*self.b_team, *self.y_team]
+        # Индекс положений всех роботов, номера в нем совпадают с номерами в all_bots
+        self.index = spatial.SpatialIndex()
+        self._geometry: Optional[tuple[float, float]] = None
+        self.update_geometry()
+
+        if self.ally_color == const.Color.BLUE:
+            self.allies = [*self.b_team]
+            self.enemies = [*self.y_team]
+            self.allies_states = self.b_states
+            self.enemies_states = self.y_states
+        elif self.ally_color == const.Color.YELLOW:
+            self.allies = [*self.y_team]
+            self.enemies = [*self.b_team]
+            self.allies_states = self.y_states
+            self.enemies_states = self.b_states
+
+    def update_geometry(self) -> bool:
+        """
+        Пересоздать ворота, если размеры поля (const.GOAL_DX, const.GOAL_DY) изменились
+
+        @return True, если ворота были пересозданы
+        """
+        geometry = (const.GOAL_DX, const.GOAL_DY)
+        if geometry == self._geometry:
+            return False
+        self._geometry = geometry
+
         self.ally_goal = Goal(
             const.GOAL_DX * self.polarity,
             const.GOAL_DY * self.polarity,
@@ -106,20 +158,14 @@ class Field:
 
         if const.SELF_PLAY:
             self.enemy_goal = self.ally_goal
-
-        if self.ally_color == const.Color.BLUE:
-            self.allies = [*self.b_team]
-            self.enemies = [*self.y_team]
-        elif self.ally_color == const.Color.YELLOW:
-            self.allies = [*self.y_team]
-            self.enemies = [*self.b_team]
+        return True
 
     def update_ball(self, pos: aux.Point, t: float) -> None:
         """
         Обновить положение мяча
-        !!! Вызывать один раз за итерацию с постоянной частотой !!!
         """
         self.ball.update(pos, 0, t)
+        self.ball_predictor.update(self.ball_states.pos[0], self.ball_states.vel[0])
 
     def _is_ball_in(self, robo: robot.Robot) -> bool:
         """
@@ -133,6 +179,17 @@ class Field:
             )
         ) < const.BALL_GRABBED_ANGLE
 
+    def update_ally_with_ball(self) -> None:
+        """
+        Найти союзного робота, в дриблере которого находится мяч
+        """
+        vec = self.ball_states.pos[0] - self.allies_states.pos
+        dist = np.hypot(vec[:, 0], vec[:, 1])
+        angle = np.arctan2(vec[:, 1], vec[:, 0]) - self.allies_states.angle
+        angle = (angle + np.pi) % (2 * np.pi) - np.pi
+        ids = np.flatnonzero((dist < const.BALL_GRABBED_DIST) & (np.abs(angle) < const.BALL_GRABBED_ANGLE))
+        self.ally_with_ball = self.allies[ids[-1]] if len(ids) != 0 else None
+
     def is_ball_in(self, robo: robot.Robot) -> bool:
         """
         Определить, находится ли мяч внутри дриблера
@@ -144,7 +201,6 @@ class Field:
     ) -> None:
         """
         Обновить положение робота синей команды
-        !!! Вызывать один раз за итерацию с постоянной частотой !!!
         """
         self.b_team[idx].update(pos, angle, t)
 
@@ -153,10 +209,41 @@ class Field:
     ) -> None:
         """
         Обновить положение робота желтой команды
-        !!! Вызывать один раз за итерацию с постоянной частотой !!!
         """
         self.y_team[idx].update(pos, angle, t)
 
+    def update_team(
+        self, color: const.Color, ids: np.ndarray, pos: np.ndarray, angles: np.ndarray, t: float
+    ) -> None:
+        """
+        Обновить положения сразу нескольких роботов команды color
+
+        ids - номера роботов, pos - массив положений [len(ids), 2], angles - массив углов
+        """
+        if len(ids) == 0:
+            return
+        self.get_team_states(color).update(ids, pos, angles, t)
+        team = self.b_team if color == const.Color.BLUE else self.y_team
+        for r_id in ids:
+            team[r_id].reset_kick()
+
+    def update_used(self, t: float) -> None:
+        """
+        Обновить флаги использования роботов обеих команд по времени последнего обновления
+        """
+        self.b_states.update_used(t)
+        self.y_states.update_used(t)
+        self.update_index()
+
+    def update_index(self) -> None:
+        """
+        Перестроить пространственный индекс роботов по актуальным положениям
+        """
+        self.index.build(
+            np.concatenate((self.b_states.pos, self.y_states.pos)),
+            np.concatenate((self.b_states.used, self.y_states.used)),
+        )
+
     def get_ball(self) -> entity.Entity:
         """
         Получить объект мяча
@@ -165,6 +252,14 @@ class Field:
         """
         return self.ball
 
+    def get_team_states(self, color: const.Color) -> world.EntityStates:
+        """
+        Получить массивы состояния команды color
+        """
+        if color == const.Color.BLUE:
+            return self.b_states
+        return self.y_states
+
     def get_blu_team(self) -> list[robot.Robot]:
         """
         Получить массив роботов синей команды
@@ -186,7 +281,7 @@ class Field:
         Определить, находится ли мяч в штрафной зоне
         """
         return (
-            aux.is_point_inside_poly(self.ball.get_pos(), self.ally_goal.hull)
+            self.ally_goal.hull_poly.contains(self.ball.get_pos())
             and not self.is_ball_moves_to_goal()
         )
 
@@ -214,41 +309,54 @@ class Field:
         """
         return self.is_ball_moves_to_point(self.ally_goal.center)
 
+    def predict_ball(self, t: float) -> aux.Point:
+        """
+        Предсказать положение мяча через t секунд
+        """
+        return aux.Point(*self.ball_predictor.predict(np.array([t]))[0].tolist())
+
+    def get_ball_intercepts(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Найти для каждого союзного робота самое раннее время и точку перехвата мяча
+
+        @return (times [N], points [N, 2]), для неиспользуемых роботов время равно inf
+        """
+        times, points = self.ball_predictor.get_intercepts(self.allies_states.pos)
+        times[~self.allies_states.used] = np.inf
+        return times, points
+
     def find_nearest_allies(
         self, point: aux.Point, num: int, avoid: Optional[list[int]] = None
     ) -> list[robot.Robot]:
         """
-        Найти num роботов из field.allies, ближайших к точке point
+        Найти num роботов из field.allies, ближайших к точке point, не считая вратаря
+
+        Если подходящих роботов меньше num, список дополняется последним роботом field.allies
         """
         if avoid is None:
             avoid = []
-        avoid += [self.gk_id]
-        robots: list[robot.Robot] = []
-        # if len(self.allies) < num:
-        #     return None  # сам виноват
-
-        while len(robots) < num:
-            robo = find_nearest_robot(point, self.allies, avoid)
-            robots.append(robo)
-            avoid.append(robo.r_id)
-        return robots
+        robots = self._find_nearest_allies(point, num, [*avoid, self.gk_id])
+        return robots + [self.allies[-1]] * (num - len(robots))
 
+    def find_nearest_ally(self, point: aux.Point, avoid: Optional[list[int]] = None) -> robot.Robot:
+        """
+        Найти ближайшего к точке point робота из field.allies, игнорируя avoid
+        """
+        robots = self._find_nearest_allies(point, 1, avoid)
+        if not robots:
+            return self.allies[-1]
+        return robots[0]
 
-def find_nearest_robot(
-    point: aux.Point, team: list[robot.Robot], avoid: Optional[list[int]] = None
-) -> robot.Robot:
-    """
-    Найти ближайшего робота из массива team к точке point, игнорируя avoid
-    """
-    if avoid is None:
-        avoid = []
-    robo_id = -1
-    min_dist = 10e10
-
-    for i, player in enumerate(team):
-        if player.r_id in avoid or not player.is_used():
-            continue
-        if aux.dist(point, player.get_pos()) < min_dist:
-            min_dist = aux.dist(point, player.get_pos())
-            robo_id = i
-    return team[robo_id]
+    def _find_nearest_allies(
+        self, point: aux.Point, num: int, avoid: Optional[list[int]] = None
+    ) -> list[robot.Robot]:
+        """
+        Найти до num используемых союзных роботов, ближайших к point, через пространственный индекс
+        """
+        offset = 0 if self.allies_states is self.b_states else const.TEAM_ROBOTS_MAX_COUNT
+        allowed = np.zeros(const.ROBOTS_MAX_COUNT, dtype=bool)
+        allowed[offset : offset + const.TEAM_ROBOTS_MAX_COUNT] = True
+        if avoid:
+            allowed[[offset + r_id for r_id in avoid]] = False
+        ids = self.index.query_knn((point.x, point.y), num, allowed)
+        return [self.all_bots[i] for i in ids]
@@ -0,0 +1,143 @@
+"""
+Журнал стратегии
+
+Сообщения кладутся в очередь и выводятся фоновым потоком, поэтому такт контроллера
+не ждет терминала. Строка сообщения собирается только в фоновом потоке и только для
+включенных уровней: аргументы передаются отдельно, как в logging ("%s", value), и
+не должны изменяться после вызова. Сообщения с одним ключом (по умолчанию - место
+вызова) выводятся не чаще, чем раз в LOG_RATE_INTERVAL
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import typing
+
+from bridge.processors import const
+
+ROOT = "ssl"
+FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Фильтр, пропускающий сообщения с одним ключом не чаще, чем раз в interval
+
+    Ключ задается через extra={"key": ...}, иначе это место вызова
+    """
+
+    def __init__(self, interval: float = const.LOG_RATE_INTERVAL) -> None:
+        super().__init__()
+        self.interval = interval
+        self._last: dict[typing.Hashable, float] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "key", None)
+        if key is None:
+            key = (record.pathname, record.lineno)
+        now = record.created
+        if now - self._last.get(key, -self.interval) < self.interval:
+            return False
+        self._last[key] = now
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик, который не блокирует поток при переполнении очереди
+    и оставляет форматирование фоновому потоку
+
+    Фоновый поток не переживает fork, поэтому в новом процессе он запускается заново
+    """
+
+    def __init__(self, writer: logging.Handler, size: int = const.LOG_QUEUE_SIZE) -> None:
+        super().__init__(queue.Queue(size))
+        self.writer = writer
+        self.size = size
+        self.dropped = 0
+        self._listener: typing.Optional[logging.handlers.QueueListener] = None
+        self._pid: typing.Optional[int] = None
+
+    def start(self) -> None:
+        """
+        Запустить фоновый вывод в текущем процессе
+        """
+        if self._pid == os.getpid():
+            return
+        self.queue = queue.Queue(self.size)
+        self._listener = logging.handlers.QueueListener(self.queue, self.writer)
+        self._listener.start()
+        self._pid = os.getpid()
+
+    def stop(self) -> None:
+        """
+        Вывести оставшиеся сообщения и остановить фоновый вывод
+        """
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+        self._listener = None
+        self._pid = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: typing.Optional[_QueueHandler] = None
+
+
+def setup(level: typing.Union[int, str] = const.LOG_LEVEL, stream: typing.Optional[typing.TextIO] = None) -> None:
+    """
+    Настроить журнал: уровень и поток вывода (по умолчанию stderr)
+    """
+    global _handler  # pylint: disable=global-statement
+
+    root = logging.getLogger(ROOT)
+    root.setLevel(level)
+    if _handler is not None:
+        if stream is None:
+            return
+        _handler.stop()
+        root.removeHandler(_handler)
+
+    writer = logging.StreamHandler(stream)
+    writer.setFormatter(logging.Formatter(FORMAT))
+    _handler = _QueueHandler(writer)
+    _handler.addFilter(RateLimitFilter())
+    root.addHandler(_handler)
+    root.propagate = False
+
+
+def shutdown() -> None:
+    """
+    Вывести оставшиеся сообщения и остановить фоновый поток
+    """
+    if _handler is not None:
+        _handler.stop()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Получить журнал модуля name, настроив журнал при первом обращении
+    """
+    if _handler is None:
+        setup()
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def get_dropped() -> int:
+    """
+    Получить число сообщений, отброшенных из-за переполнения очереди
+    """
+    return 0 if _handler is None else _handler.dropped
+
+
+atexit.register(shutdown)
@@ -0,0 +1,429 @@
+"""
+Глобальные планировщики пути
+
+Препятствия - круги (роботы, мяч) и выпуклые полигоны (штрафные зоны).
+Планировщик возвращает полный список точек пути от старта до цели
+"""
+
+import abc
+import heapq
+import math
+import time
+import typing
+
+import numpy as np
+
+import bridge.processors.auxiliary as aux
+from bridge.processors import const, costmap
+
+# Допуск при проверке касания препятствий [мм]
+EPS = 1e-6
+# Количество случайных точек, которые RRT* генерирует за раз
+SAMPLE_BATCH = 64
+
+
+class Obstacles:
+    """
+    Набор препятствий для планировщика
+    """
+
+    def __init__(
+        self,
+        centers: np.ndarray,
+        radii: np.ndarray,
+        polygons: typing.Sequence[np.ndarray] = (),
+        cost_map: typing.Optional[costmap.CostMap] = None,
+        ignore: typing.Optional[int] = None,
+    ) -> None:
+        """
+        Конструктор
+
+        centers - центры кругов [N, 2]
+        radii - радиусы кругов [N]
+        polygons - выпуклые полигоны, каждый задан вершинами [M, 2]
+        cost_map - карта стоимости поля для быстрого отсева занятых точек (необязательна)
+        ignore - номер робота в карте стоимости, собственный круг которого не препятствие
+        """
+        self.cost_map = cost_map
+        self.ignore = ignore
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        self.radii = np.asarray(radii, dtype=float).reshape(-1)
+        self.polygons = [np.asarray(poly, dtype=float).reshape(-1, 2) for poly in polygons]
+
+        # Ребра всех полигонов одним массивом: начала, векторы и номер полигона
+        if self.polygons:
+            self._edge_start = np.concatenate(self.polygons)
+            self._edge_vec = np.concatenate([np.roll(poly, -1, axis=0) - poly for poly in self.polygons])
+            self._edge_poly = np.concatenate([np.full(len(poly), i) for i, poly in enumerate(self.polygons)])
+            self._poly_offsets = np.cumsum([0] + [len(poly) for poly in self.polygons[:-1]])
+        else:
+            self._edge_start = np.zeros((0, 2))
+            self._edge_vec = np.zeros((0, 2))
+            self._edge_poly = np.zeros(0, dtype=int)
+            self._poly_offsets = np.zeros(0, dtype=int)
+
+    @staticmethod
+    def from_points(
+        circles: typing.Sequence[tuple[aux.Point, float]],
+        polygons: typing.Sequence[list[aux.Point]] = (),
+    ) -> "Obstacles":
+        """
+        Создать набор препятствий из кругов (центр, радиус) и полигонов из aux.Point
+        """
+        centers = np.array([(c.x, c.y) for c, _ in circles], dtype=float).reshape(-1, 2)
+        radii = np.array([r for _, r in circles], dtype=float)
+        polys = [np.array([(p.x, p.y) for p in poly]) for poly in polygons]
+        return Obstacles(centers, radii, polys)
+
+    def select(self, circles: np.ndarray, polygons: typing.Optional[np.ndarray] = None) -> "Obstacles":
+        """
+        Получить набор, содержащий только отмеченные маской препятствия
+        """
+        polys = self.polygons
+        if polygons is not None:
+            polys = [poly for poly, keep in zip(self.polygons, polygons) if keep]
+        return Obstacles(self.centers[circles], self.radii[circles], polys, self.cost_map, self.ignore)
+
+    def __getstate__(self) -> dict[str, typing.Any]:
+        # Карта стоимости не передается в процессы-исполнители: она только ускоряет поиск
+        state = self.__dict__.copy()
+        state["cost_map"] = None
+        return state
+
+    def maybe_free(self, points: np.ndarray) -> np.ndarray:
+        """
+        Получить маску точек, которые по карте стоимости могут быть свободны
+
+        Проверка приближенная (с точностью до клетки) и служит только для отсева
+        заведомо занятых точек перед точными проверками
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if self.cost_map is None:
+            return np.ones(len(points), dtype=bool)
+        return self.cost_map.is_free(points, self.ignore)
+
+    def inside_circles(self, points: np.ndarray) -> np.ndarray:
+        """
+        Получить маску [len(points), N] попадания точек внутрь кругов
+        """
+        delta = points[:, np.newaxis, :] - self.centers[np.newaxis, :, :]
+        return np.hypot(delta[..., 0], delta[..., 1]) < self.radii - EPS
+
+    def inside_polygons(self, points: np.ndarray) -> np.ndarray:
+        """
+        Получить маску [len(points), len(polygons)] попадания точек внутрь полигонов
+        """
+        if not self.polygons:
+            return np.zeros((len(points), 0), dtype=bool)
+        # Ребра всех полигонов одной операцией, затем подсчет по каждому полигону
+        rel_x = points[:, 0, np.newaxis] - self._edge_start[:, 0]
+        rel_y = points[:, 1, np.newaxis] - self._edge_start[:, 1]
+        cross = self._edge_vec[:, 0] * rel_y - self._edge_vec[:, 1] * rel_x
+        sizes = np.bincount(self._edge_poly, minlength=len(self.polygons))
+        left = np.add.reduceat(cross > EPS, self._poly_offsets, axis=1)
+        right = np.add.reduceat(cross < -EPS, self._poly_offsets, axis=1)
+        return (left == sizes) | (right == sizes)
+
+    def points_free(self, points: np.ndarray) -> np.ndarray:
+        """
+        Получить маску точек, не лежащих внутри препятствий
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return ~(self.inside_circles(points).any(axis=1) | self.inside_polygons(points).any(axis=1))
+
+    def segments_free(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Получить маску отрезков starts[i]-ends[i], не задевающих препятствия
+
+        Концы отрезков считаются лежащими вне препятствий
+        """
+        starts = np.broadcast_to(np.asarray(starts, dtype=float), np.shape(ends)).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        seg = ends - starts
+        free = np.ones(len(seg), dtype=bool)
+
+        if len(self.centers) != 0:
+            rel = self.centers[np.newaxis, :, :] - starts[:, np.newaxis, :]
+            seg_len2 = np.maximum(np.einsum("sk,sk->s", seg, seg), EPS)
+            proj = np.clip(np.einsum("sok,sk->so", rel, seg) / seg_len2[:, np.newaxis], 0, 1)
+            closest = rel - proj[..., np.newaxis] * seg[:, np.newaxis, :]
+            free &= ~np.any(np.hypot(closest[..., 0], closest[..., 1]) < self.radii - EPS, axis=1)
+
+        if len(self._edge_start) != 0:
+            # Пересечение с ребрами полигонов
+            rel = self._edge_start[np.newaxis, :, :] - starts[:, np.newaxis, :]
+            denom = seg[:, 0, np.newaxis] * self._edge_vec[:, 1] - seg[:, 1, np.newaxis] * self._edge_vec[:, 0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t_seg = (rel[..., 0] * self._edge_vec[:, 1] - rel[..., 1] * self._edge_vec[:, 0]) / denom
+                t_edge = (rel[..., 0] * seg[:, 1, np.newaxis] - rel[..., 1] * seg[:, 0, np.newaxis]) / denom
+            cross = (t_seg > EPS) & (t_seg < 1 - EPS) & (t_edge >= 0) & (t_edge <= 1)
+            free &= ~cross.any(axis=1)
+            # Отрезок целиком внутри полигона или проходит через его вершины
+            free &= ~self.inside_polygons((starts + ends) / 2).any(axis=1)
+        return free
+
+
+class Planner(abc.ABC):
+    """
+    Базовый класс планировщика пути
+    """
+
+    @abc.abstractmethod
+    def plan(self, start: aux.Point, goal: aux.Point, obstacles: Obstacles) -> typing.Optional[list[aux.Point]]:
+        """
+        Построить путь от start до goal в обход obstacles
+
+        @return список точек пути, включая start и goal, или None, если путь не найден
+        """
+
+    def reseed(self, seed: np.random.SeedSequence) -> None:
+        """
+        Задать новое начальное состояние генератора случайных чисел (для случайных планировщиков)
+        """
+
+
+def _to_array(p: aux.Point) -> np.ndarray:
+    return np.array([p.x, p.y], dtype=float)
+
+
+def _to_points(path: np.ndarray) -> list[aux.Point]:
+    return [aux.Point(x, y) for x, y in path.tolist()]
+
+
+def _shortcut(path: np.ndarray, obstacles: Obstacles) -> np.ndarray:
+    """
+    Спрямить путь: из каждой точки перейти в самую дальнюю видимую точку пути
+    """
+    result = [0]
+    i = 0
+    while i < len(path) - 1:
+        visible = np.flatnonzero(obstacles.segments_free(path[i], path[i + 1 :]))
+        i = i + 1 + (int(visible[-1]) if len(visible) != 0 else 0)
+        result.append(i)
+    return path[result]
+
+
+class VisibilityGraphPlanner(Planner):
+    """
+    Планировщик по графу видимости
+
+    Вершины графа - точки вокруг раздутых кругов и вершины полигонов, отодвинутые наружу.
+    Поиск A* с ленивым построением ребер: видимость из вершины проверяется
+    одной операцией над массивами только при ее раскрытии
+    """
+
+    def __init__(self, circle_nodes: int = 8, margin: float = 20) -> None:
+        """
+        Конструктор
+
+        circle_nodes - количество вершин графа вокруг каждого круга
+        margin - отступ вершин графа от препятствий [мм]
+        """
+        self._margin = margin
+        angles = np.arange(circle_nodes) * 2 * math.pi / circle_nodes
+        self._ring = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+        # Описанный многоугольник не заходит внутрь круга
+        self._ring_scale = 1 / math.cos(math.pi / circle_nodes)
+
+    def get_nodes(self, obstacles: Obstacles) -> np.ndarray:
+        """
+        Получить свободные вершины графа видимости [N, 2]
+        """
+        parts = [
+            obstacles.centers[:, np.newaxis, :]
+            + self._ring[np.newaxis, :, :] * (obstacles.radii[:, np.newaxis, np.newaxis] * self._ring_scale + self._margin)
+        ]
+        for poly in obstacles.polygons:
+            out = poly - poly.mean(axis=0)
+            out /= np.maximum(np.hypot(out[:, 0], out[:, 1]), EPS)[:, np.newaxis]
+            parts.append(poly + out * self._margin)
+        nodes = np.concatenate([part.reshape(-1, 2) for part in parts])
+        return nodes[obstacles.points_free(nodes)]
+
+    def plan(self, start: aux.Point, goal: aux.Point, obstacles: Obstacles) -> typing.Optional[list[aux.Point]]:
+        """
+        Построить кратчайший путь по графу видимости
+        """
+        start_pos, goal_pos = _to_array(start), _to_array(goal)
+        if obstacles.segments_free(start_pos, goal_pos[np.newaxis])[0]:
+            return [start, goal]
+
+        nodes = np.concatenate((start_pos[np.newaxis], goal_pos[np.newaxis], self.get_nodes(obstacles)))
+        heuristic = np.hypot(nodes[:, 0] - goal_pos[0], nodes[:, 1] - goal_pos[1])
+        cost = np.full(len(nodes), np.inf)
+        parent = np.full(len(nodes), -1)
+        closed = np.zeros(len(nodes), dtype=bool)
+
+        cost[0] = 0
+        queue = [(heuristic[0], 0)]
+        while queue:
+            _, node = heapq.heappop(queue)
+            if closed[node]:
+                continue
+            if node == 1:
+                path = [1]
+                while path[-1] != 0:
+                    path.append(int(parent[path[-1]]))
+                return _to_points(nodes[path[::-1]])
+            closed[node] = True
+
+            candidates = np.flatnonzero(~closed)
+            candidates = candidates[obstacles.segments_free(nodes[node], nodes[candidates])]
+            new_cost = cost[node] + np.hypot(nodes[candidates, 0] - nodes[node, 0], nodes[candidates, 1] - nodes[node, 1])
+            better = new_cost < cost[candidates]
+            candidates, new_cost = candidates[better], new_cost[better]
+            cost[candidates] = new_cost
+            parent[candidates] = node
+            for nxt, val in zip(candidates.tolist(), (new_cost + heuristic[candidates]).tolist()):
+                heapq.heappush(queue, (val, nxt))
+        return None
+
+
+class RRTStarPlanner(Planner):
+    """
+    Планировщик RRT* с ограничением времени (anytime)
+
+    Дерево растет, пока не истечет время; возвращается лучший найденный путь
+    """
+
+    def __init__(
+        self,
+        time_budget: float = const.RRT_TIME_BUDGET,
+        step: float = 300,
+        near_radius: float = 600,
+        goal_bias: float = 0.1,
+        max_nodes: int = 2000,
+        seed: typing.Optional[int] = None,
+    ) -> None:
+        """
+        Конструктор
+
+        time_budget - время на построение одного пути [с]
+        step - максимальная длина нового ребра [мм]
+        near_radius - радиус поиска соседей для перепривязки [мм]
+        goal_bias - вероятность выбрать цель в качестве случайной точки
+        """
+        self._time_budget = time_budget
+        self._step = step
+        self._near_radius = near_radius
+        self._goal_bias = goal_bias
+        self._max_nodes = max_nodes
+        self._rng = np.random.default_rng(seed)
+
+    def reseed(self, seed: np.random.SeedSequence) -> None:
+        self._rng = np.random.default_rng(seed)
+
+    def get_bounds(self) -> tuple[float, float, float, float]:
+        """
+        Получить границы области выбора случайных точек
+        """
+        dx = abs(const.GOAL_DX) + const.ROBOT_R * 3
+        dy = const.FIELD_DY + const.ROBOT_R * 3
+        return -dx, -dy, dx, dy
+
+    def plan(self, start: aux.Point, goal: aux.Point, obstacles: Obstacles) -> typing.Optional[list[aux.Point]]:
+        """
+        Построить путь, улучшая его, пока не истечет time_budget
+        """
+        deadline = time.time() + self._time_budget
+        start_pos, goal_pos = _to_array(start), _to_array(goal)
+        if obstacles.segments_free(start_pos, goal_pos[np.newaxis])[0]:
+            return [start, goal]
+
+        x_min, y_min, x_max, y_max = self.get_bounds()
+        nodes = np.empty((self._max_nodes, 2))
+        parent = np.full(self._max_nodes, -1)
+        edge = np.zeros(self._max_nodes)
+        cost = np.zeros(self._max_nodes)
+        nodes[0] = start_pos
+        count = 1
+
+        best_cost = math.inf
+        best_node = -1
+
+        # Случайные точки генерируются пачками, занятые по карте стоимости отбрасываются сразу
+        samples = np.zeros((0, 2))
+        used = 0
+
+        while count < self._max_nodes and time.time() < deadline:
+            if self._rng.random() < self._goal_bias:
+                sample = goal_pos
+            else:
+                if used == len(samples):
+                    samples = self._rng.uniform((x_min, y_min), (x_max, y_max), (SAMPLE_BATCH, 2))
+                    samples = samples[obstacles.maybe_free(samples)]
+                    used = 0
+                    if len(samples) == 0:
+                        continue
+                sample = samples[used]
+                used += 1
+
+            dist = np.hypot(nodes[:count, 0] - sample[0], nodes[:count, 1] - sample[1])
+            nearest = int(np.argmin(dist))
+            if dist[nearest] == 0:
+                continue
+            new = nodes[nearest] + (sample - nodes[nearest]) * min(1, self._step / dist[nearest])
+            if not obstacles.points_free(new)[0]:
+                continue
+
+            # Выбор родителя с наименьшей стоимостью среди видимых соседей
+            dist = np.hypot(nodes[:count, 0] - new[0], nodes[:count, 1] - new[1])
+            near = np.flatnonzero(dist <= max(self._near_radius, dist[nearest] + EPS))
+            near = near[obstacles.segments_free(nodes[near], np.broadcast_to(new, (len(near), 2)))]
+            if len(near) == 0:
+                continue
+            through = cost[near] + dist[near]
+            best_parent = int(near[np.argmin(through)])
+
+            idx = count
+            count += 1
+            nodes[idx] = new
+            parent[idx] = best_parent
+            edge[idx] = dist[best_parent]
+            cost[idx] = cost[best_parent] + edge[idx]
+
+            # Перепривязка соседей через новую вершину
+            rewire = near[cost[idx] + dist[near] < cost[near] - EPS]
+            if len(rewire) != 0:
+                parent[rewire] = idx
+                edge[rewire] = dist[rewire]
+                self._update_costs(rewire, parent[:count], edge, cost)
+
+            # Соединение с целью пробуется из каждой новой вершины, а не только в пределах шага:
+            # первый путь находится за несколько десятков итераций вместо сотен
+            goal_dist = math.hypot(goal_pos[0] - new[0], goal_pos[1] - new[1])
+            if cost[idx] + goal_dist < best_cost:
+                if obstacles.segments_free(new, goal_pos[np.newaxis])[0]:
+                    best_cost = cost[idx] + goal_dist
+                    best_node = idx
+
+        if best_node < 0:
+            return None
+        path = [best_node]
+        while path[-1] != 0:
+            path.append(int(parent[path[-1]]))
+        points = np.concatenate((nodes[path[::-1]], goal_pos[np.newaxis]))
+        return _to_points(_shortcut(points, obstacles))
+
+    @staticmethod
+    def _update_costs(roots: np.ndarray, parent: np.ndarray, edge: np.ndarray, cost: np.ndarray) -> None:
+        """
+        Пересчитать стоимости вершин roots и всех их потомков
+        """
+        frontier = roots
+        while len(frontier) != 0:
+            cost[frontier] = cost[parent[frontier]] + edge[frontier]
+            frontier = np.flatnonzero(np.isin(parent, frontier))
+
+
+def make_planner(name: typing.Optional[str]) -> typing.Optional[Planner]:
+    """
+    Создать планировщик по имени: "visibility", "rrt" или None (без глобального планировщика)
+    """
+    if name is None:
+        return None
+    if name == "visibility":
+        return VisibilityGraphPlanner()
+    if name == "rrt":
+        return RRTStarPlanner()
+    raise ValueError(f"Unknown path planner: {name}")
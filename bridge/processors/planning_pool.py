@@ -0,0 +1,140 @@
+"""
+Параллельный запуск глобального планировщика для нескольких роботов
+
+Задания (начало, цель, препятствия) не зависят от состояния маршрутизатора, поэтому
+считаются в пуле процессов или потоков; результаты возвращаются в порядке заданий
+"""
+
+import concurrent.futures
+import os
+import time
+import typing
+
+import numpy as np
+
+import bridge.processors.auxiliary as aux
+from bridge.processors import log, planner
+
+logger = log.get_logger("planning_pool")
+
+PlanJob = tuple[aux.Point, aux.Point, planner.Obstacles]
+
+# Планировщик процесса-исполнителя, передается один раз при запуске процесса
+_worker_planner: typing.Optional[planner.Planner] = None
+
+
+def _init_worker(path_planner: planner.Planner, entropy: int) -> None:
+    global _worker_planner  # pylint: disable=global-statement
+    # Планировщик копируется в исполнители вместе с состоянием генератора случайных чисел,
+    # поэтому каждый исполнитель получает свою последовательность по номеру процесса
+    path_planner.reseed(np.random.SeedSequence(entropy, spawn_key=(os.getpid(),)))
+    _worker_planner = path_planner
+
+
+def _plan_in_worker(job: PlanJob) -> typing.Optional[list[aux.Point]]:
+    assert _worker_planner is not None
+    return _worker_planner.plan(*job)
+
+
+class PlanningPool:
+    """
+    Пул исполнителей глобального планировщика
+    """
+
+    def __init__(self, path_planner: planner.Planner, workers: int, use_processes: bool = True) -> None:
+        """
+        Конструктор
+
+        workers - число исполнителей
+        use_processes - считать в процессах; потоки имеют смысл только для планировщиков,
+        отпускающих GIL, или интерпретатора без GIL
+        """
+        self.planner = path_planner
+        self.workers = workers
+        self.use_processes = use_processes
+        self._executor: typing.Optional[concurrent.futures.Executor] = None
+        # Задания прошлых тактов, которые уже выполнялись и не были отменены, по ключам
+        self._running: dict[typing.Hashable, concurrent.futures.Future] = {}
+        self.timeouts = 0  # задания, не успевшие к крайнему сроку
+        self.errors = 0  # задания, завершившиеся ошибкой
+
+    def get_executor(self) -> concurrent.futures.Executor:
+        """
+        Получить исполнителя, запустив его при первом обращении
+        """
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, initializer=_init_worker, initargs=(self.planner, np.random.SeedSequence().entropy)
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+        return self._executor
+
+    def plan_all(
+        self,
+        jobs: list[PlanJob],
+        keys: typing.Sequence[typing.Hashable],
+        deadline: typing.Optional[float] = None,
+    ) -> list[typing.Optional[list[aux.Point]]]:
+        """
+        Построить пути для всех заданий
+
+        keys - ключи заданий (номера роботов): пока предыдущее задание с тем же ключом
+        выполняется, новое не отправляется, чтобы задания не копились в очереди исполнителей
+        deadline - момент (time.time()), после которого результаты не ждем
+        @return пути в порядке заданий; None, если путь не найден, не успел к крайнему сроку,
+        задание не отправлено или завершилось ошибкой
+        """
+        if not jobs:
+            return []
+
+        self._running = {key: future for key, future in self._running.items() if not future.done()}
+        futures: list[typing.Optional[concurrent.futures.Future]] = []
+        try:
+            executor = self.get_executor()
+            for key, job in zip(keys, jobs):
+                if key in self._running:
+                    futures.append(None)
+                elif self.use_processes:
+                    futures.append(executor.submit(_plan_in_worker, job))
+                else:
+                    futures.append(executor.submit(self.planner.plan, *job))
+        except concurrent.futures.BrokenExecutor:
+            logger.exception("planning executor is broken, restarting")
+            self.close()
+            return [None] * len(jobs)
+
+        timeout = None if deadline is None else max(deadline - time.time(), 0.0)
+        concurrent.futures.wait([future for future in futures if future is not None], timeout)
+
+        paths: list[typing.Optional[list[aux.Point]]] = []
+        is_broken = False
+        for key, future in zip(keys, futures):
+            if future is None:
+                paths.append(None)
+            elif not future.done():
+                if not future.cancel():
+                    self._running[key] = future
+                self.timeouts += 1
+                paths.append(None)
+            elif future.exception() is not None:
+                self.errors += 1
+                is_broken = is_broken or isinstance(future.exception(), concurrent.futures.BrokenExecutor)
+                logger.error("planning job failed: %r", future.exception())
+                paths.append(None)
+            else:
+                paths.append(future.result())
+        if is_broken:
+            # Новый исполнитель будет запущен при следующем обращении
+            self.close()
+        return paths
+
+    def close(self) -> None:
+        """
+        Остановить исполнителей
+        """
+        self._running = {}
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,162 @@
+"""
+Выпуклый многоугольник с заранее посчитанными параметрами
+
+Нормали ребер, коэффициенты полуплоскостей и ограничивающий прямоугольник
+считаются один раз при создании, после чего запросы принадлежности,
+расстояния и пересечения с отрезком не создают промежуточных точек
+"""
+
+import math
+import typing
+
+import numpy as np
+
+import bridge.processors.auxiliary as aux
+
+
+class ConvexPolygon:
+    """
+    Неизменяемый выпуклый многоугольник
+
+    Результаты запросов совпадают с функциями auxiliary для того же списка вершин
+    """
+
+    __slots__ = ("points", "vertices", "normals", "offsets", "bbox", "_edges")
+
+    def __init__(self, points: list[aux.Point]) -> None:
+        """
+        Конструктор
+
+        points - вершины многоугольника в порядке обхода (любого направления)
+        """
+        self.points = tuple(points)
+        self.vertices = np.array([(p.x, p.y) for p in points], dtype=float)
+
+        # Ребра в порядке обхода auxiliary: (p[-1], p[0]), (p[0], p[1]), ...
+        starts = np.roll(self.vertices, 1, axis=0)
+        deltas = self.vertices - starts
+        lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+
+        # Внешние нормали: направление обхода определяется знаком площади
+        area = np.sum(starts[:, 0] * self.vertices[:, 1] - self.vertices[:, 0] * starts[:, 1])
+        orient = 1.0 if area > 0 else -1.0
+        self.normals = orient * np.stack((deltas[:, 1], -deltas[:, 0]), axis=1) / lengths[:, np.newaxis]
+        self.offsets = np.einsum("ij,ij->i", self.normals, starts)
+        self.bbox = (
+            float(self.vertices[:, 0].min()),
+            float(self.vertices[:, 1].min()),
+            float(self.vertices[:, 0].max()),
+            float(self.vertices[:, 1].max()),
+        )
+
+        # (x0, y0, dx, dy, длина^2, nx, ny, c) для каждого ребра
+        self._edges = tuple(
+            tuple(row) for row in np.column_stack((starts, deltas, lengths**2, self.normals, self.offsets)).tolist()
+        )
+
+    def contains(self, p: aux.Point) -> bool:
+        """
+        Определить, лежит ли точка строго внутри многоугольника
+        """
+        x_min, y_min, x_max, y_max = self.bbox
+        if not (x_min < p.x < x_max and y_min < p.y < y_max):
+            return False
+        for edge in self._edges:
+            if edge[5] * p.x + edge[6] * p.y >= edge[7]:
+                return False
+        return True
+
+    def contains_many(self, points: np.ndarray) -> np.ndarray:
+        """
+        Определить, какие из точек [N, 2] лежат строго внутри многоугольника
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.all(points @ self.normals.T < self.offsets, axis=1)
+
+    def sdf(self, p: aux.Point) -> float:
+        """
+        Получить расстояние со знаком до границы: отрицательное внутри, положительное снаружи
+        """
+        depth = max(edge[5] * p.x + edge[6] * p.y - edge[7] for edge in self._edges)
+        if depth < 0:
+            return depth
+        return self.dist_to_boundary(p)
+
+    def sdf_many(self, points: np.ndarray) -> np.ndarray:
+        """
+        Получить расстояния со знаком для точек [N, 2]
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        depth = np.max(points @ self.normals.T - self.offsets, axis=1)
+        starts = np.roll(self.vertices, 1, axis=0)
+        deltas = self.vertices - starts
+        rel = points[:, np.newaxis, :] - starts[np.newaxis]
+        t = np.clip(np.einsum("nmi,mi->nm", rel, deltas) / np.einsum("mi,mi->m", deltas, deltas), 0, 1)
+        closest = rel - t[..., np.newaxis] * deltas
+        outside = np.min(np.hypot(closest[..., 0], closest[..., 1]), axis=1)
+        return np.where(depth < 0, depth, outside)
+
+    def _closest_on_edge(self, edge: tuple[float, ...], x: float, y: float) -> tuple[float, float]:
+        """
+        Получить ближайшую к (x, y) точку ребра (как auxiliary.closest_point_on_line)
+        """
+        x0, y0, dx, dy, len2 = edge[:5]
+        if len2 == 0:
+            return x0, y0
+        t = ((x - x0) * dx + (y - y0) * dy) / len2
+        if t <= 0:
+            return x0, y0
+        if t >= 1:
+            return x0 + dx, y0 + dy
+        return x0 + t * dx, y0 + t * dy
+
+    def dist_to_boundary(self, p: aux.Point) -> float:
+        """
+        Получить расстояние от точки до границы многоугольника
+        """
+        best = math.inf
+        for edge in self._edges:
+            cx, cy = self._closest_on_edge(edge, p.x, p.y)
+            best = min(best, math.hypot(p.x - cx, p.y - cy))
+        return best
+
+    def nearest_point(self, p: aux.Point) -> aux.Point:
+        """
+        Получить ближайшую к p точку на границе многоугольника (см. aux.nearest_point_on_poly)
+        """
+        best = math.inf
+        best_x, best_y = 0.0, 0.0
+        for edge in self._edges:
+            cx, cy = self._closest_on_edge(edge, p.x, p.y)
+            d = math.hypot(p.x - cx, p.y - cy)
+            if d < best:
+                best, best_x, best_y = d, cx, cy
+        return aux.Point(best_x, best_y)
+
+    def segment_intersect(self, start: aux.Point, end: aux.Point) -> typing.Optional[aux.Point]:
+        """
+        Получить точку пересечения отрезка start-end с границей (см. aux.segment_poly_intersect)
+        """
+        x_min, y_min, x_max, y_max = self.bbox
+        if (
+            max(start.x, end.x) < x_min
+            or min(start.x, end.x) > x_max
+            or max(start.y, end.y) < y_min
+            or min(start.y, end.y) > y_max
+        ):
+            return None
+
+        delta_x1 = end.x - start.x
+        delta_y1 = end.y - start.y
+        for edge in self._edges:
+            x0, y0, delta_x2, delta_y2 = edge[:4]
+            determinant = delta_y1 * delta_x2 - delta_y2 * delta_x1
+            if determinant == 0:
+                continue
+            delta_x_start = start.x - x0
+            delta_y_start = start.y - y0
+            t1 = (delta_x_start * delta_y2 - delta_x2 * delta_y_start) / determinant
+            t2 = (delta_x_start * delta_y1 - delta_x1 * delta_y_start) / determinant
+            if 0 <= t1 <= 1 and 0 <= t2 <= 1:
+                return aux.Point(start.x + t1 * delta_x1, start.y + t1 * delta_y1)
+        return None
@@ -2,20 +2,23 @@
 Модуль стратегии игры
 """
 
+import multiprocessing.util
 import time
+import typing
 
 import attr
-import numpy as np
 from strategy_bridge.bus import DataBus, DataReader, DataWriter
 from strategy_bridge.common import config
 from strategy_bridge.model.referee import RefereeCommand
-from strategy_bridge.pb.messages_robocup_ssl_wrapper_pb2 import SSL_WrapperPacket
 from strategy_bridge.processors import BaseProcessor
 from strategy_bridge.utils.debugger import debugger
 import bridge.processors.referee_state_processor as state_machine
 
 import bridge.processors.auxiliary as aux
-from bridge.processors import const, field, router, strategy
+import bridge.processors.robot as robot
+from bridge.processors import command_ring, const, field, log, planner, router, scheduler, strategy, vision, world_snapshot
+
+logger = log.get_logger("controller")
 
 
 # TODO: Refactor this class and corresponding matlab scripts
@@ -31,13 +34,12 @@ class SSLController(BaseProcessor):
     vision_reader: DataReader = attr.ib(init=False)
     referee_reader: DataReader = attr.ib(init=False)
     commands_sink_writer: DataWriter = attr.ib(init=False)
-    _ssl_converter: SSL_WrapperPacket = attr.ib(init=False)
 
     dbg_game_status: strategy.GameStates = strategy.GameStates.TIMEOUT
     dbg_state: strategy.States = strategy.States.DEBUG
 
-    cur_time = time.time()
-    delta_t = 0.0
+    delta_t = const.LOW_LEVEL_Ts
+    last_planning = 0.0
 
     ctrl_mapping = const.CONTROL_MAPPING
     count_halt_cmd = 0
@@ -50,10 +52,18 @@ class SSLController(BaseProcessor):
         self.vision_reader = DataReader(data_bus, config.VISION_DETECTIONS_TOPIC)
         self.referee_reader = DataReader(data_bus, config.REFEREE_COMMANDS_TOPIC)
         self.commands_sink_writer = DataWriter(data_bus, const.TOPIC_SINK, 20)
-        self._ssl_converter = SSL_WrapperPacket()
+        self.command_ring: typing.Optional[command_ring.CommandRing] = None
+        if const.COMMANDS_SHM:
+            self.command_ring = command_ring.CommandRing(self.ally_color, create=True)
 
         self.field = field.Field(self.ctrl_mapping, self.ally_color)
-        self.router = router.Router(self.field)
+        self.router = router.Router(self.field, planner.make_planner(const.PATH_PLANNER))
+        # Исполнители планировщика останавливаются при завершении процесса процессора;
+        # atexit не вызывается в процессах, запущенных через fork
+        multiprocessing.util.Finalize(self, self.router.close, exitpriority=10)
+        self.vision = vision.VisionPipeline()
+        self.scheduler = scheduler.DeadlineScheduler()
+        self.snapshot: typing.Optional[world_snapshot.WorldSnapshot] = None
 
         self.strategy = strategy.Strategy()
 
@@ -79,125 +89,78 @@ class SSLController(BaseProcessor):
         """
         Прочитать новые пакеты из SSL-Vision
         """
-        status = False
-
-        balls: list[aux.Point] = []
-        b_bots_id: list[int] = []
-        b_bots_pos: list[list] = [[] for _ in range(const.TEAM_ROBOTS_MAX_COUNT)]
-        b_bots_ang: list[list] = [[] for _ in range(const.TEAM_ROBOTS_MAX_COUNT)]
-
-        y_bots_id: list[int] = []
-        y_bots_pos: list[list] = [[] for _ in range(const.TEAM_ROBOTS_MAX_COUNT)]
-        y_bots_ang: list[list] = [[] for _ in range(const.TEAM_ROBOTS_MAX_COUNT)]
-        field_info = np.zeros(const.GEOMETRY_PACKET_SIZE)
+        if const.VISION_SHM:
+            return self.read_snapshot()
 
-        queue = self.vision_reader.read_new()
-
-        for ssl_package in queue:
+        packets: list[bytes] = []
+        for ssl_package in self.vision_reader.read_new():
             try:
                 ssl_package_content = ssl_package.content
             except AttributeError:
-                pass
-                # None
-            if not ssl_package_content:
                 continue
+            if ssl_package_content:
+                packets.append(ssl_package_content)
 
-            status = True
-
-            ssl_package_content = self._ssl_converter.FromString(ssl_package_content)
-            geometry = ssl_package_content.geometry
-            if geometry:
-                field_info[0] = geometry.field.field_length
-                field_info[1] = geometry.field.field_width
-                if geometry.field.field_length != 0 and geometry.field.goal_width != 0:
-                    const.GOAL_DX = geometry.field.field_length / 2
-                    const.GOAL_DY = geometry.field.goal_width
-
-            detection = ssl_package_content.detection
-            # camera_id = detection.camera_id
-            for ball in detection.balls:
-                balls.append(aux.Point(ball.x, ball.y))
-
-            cur_state, cur_active = self.state_machine.get_state()
-            self.strategy.change_game_state(cur_state, cur_active)
-            self.router.avoid_ball(False)
-            if cur_state in [state_machine.State.STOP] or (
-                cur_active != const.Color.ALL and cur_active != self.field.ally_color
-            ):
-                self.router.avoid_ball(True)
-
-            # TODO: Barrier states
-            for robot_det in detection.robots_blue:
-                b_bots_id.append(robot_det.robot_id)
-                b_bots_pos[robot_det.robot_id].append(
-                    aux.Point(robot_det.x, robot_det.y)
-                )
-                b_bots_ang[robot_det.robot_id].append(robot_det.orientation)
+        # Все детекции экстраполируются на момент t по времени захвата кадра
+        self.vision.update(self.field, packets, time.time())
 
-            for robot_det in detection.robots_yellow:
-                y_bots_id.append(robot_det.robot_id)
-                y_bots_pos[robot_det.robot_id].append(
-                    aux.Point(robot_det.x, robot_det.y)
-                )
-                y_bots_ang[robot_det.robot_id].append(robot_det.orientation)
-
-        if len(balls) != 0:
-            balls_sum = aux.Point(0, 0)
-            for ball in balls:
-                balls_sum += ball
-            ball = balls_sum / len(balls)
-            self.field.update_ball(ball, time.time())
-        elif self.field.ally_with_ball is not None:
-            ally = self.field.ally_with_ball
-            ball = (
-                ally.get_pos()
-                + aux.rotate(aux.RIGHT, ally.get_angle()) * ally.get_radius() / 2
-            )
-            self.field.update_ball(ball, time.time())
-
-        self.field.ally_with_ball = None
-        for r in self.field.allies:
-            if self.field._is_ball_in(r):
-                self.field.ally_with_ball = r
-
-        for r_id in set(b_bots_id):
-            position = aux.average_point(b_bots_pos[r_id])
-            angle = aux.average_angle(b_bots_ang[r_id])
-            if position != self.field.b_team[r_id].get_pos() or const.IS_SIMULATOR_USED:
-                self.field.update_blu_robot(r_id, position, angle, time.time())
-        for robot in self.field.b_team:
-            if time.time() - robot.last_update() > 0.5:
-                robot.used(0)
-            else:
-                robot.used(1)
-
-        for r_id in set(y_bots_id):
-            position = aux.average_point(y_bots_pos[r_id])
-            angle = aux.average_angle(y_bots_ang[r_id])
-            if position != self.field.y_team[r_id].get_pos() or const.IS_SIMULATOR_USED:
-                self.field.update_yel_robot(r_id, position, angle, time.time())
-        for robot in self.field.y_team:
-            if time.time() - robot.last_update() > 0.5:
-                robot.used(0)
-            else:
-                robot.used(1)
-
-        return status
-
-    def control_loop(self) -> None:
+        return len(packets) != 0
+
+    def read_snapshot(self) -> bool:
+        """
+        Прочитать последний снимок поля, опубликованный VisionProcessor
+
+        @return True, если снимок новый
+        """
+        if self.snapshot is None:
+            try:
+                self.snapshot = world_snapshot.WorldSnapshot(create=False)
+            except FileNotFoundError:
+                # VisionProcessor еще не запущен
+                logger.info("waiting for world snapshot from VisionProcessor")
+                return False
+        return self.snapshot.update_field(self.field) is not None
+
+    def update_game_state(self) -> None:
+        """
+        Передать состояние игры от рефери в стратегию и маршрутизатор
+        """
+        cur_state, cur_active = self.state_machine.get_state()
+        self.strategy.change_game_state(cur_state, cur_active)
+        self.router.avoid_ball(
+            cur_state == state_machine.State.STOP
+            or cur_active not in (const.Color.ALL, self.field.ally_color)
+        )
+
+    def control_loop(self, is_planning: bool = True) -> None:
         """
         Рассчитать стратегию, тактику и физику для роботов на поле
+
+        is_planning - пересчитывать ли стратегию и маршруты (иначе только регуляторы)
         """
         self.router.update(self.field)
-        waypoints = self.strategy.process(self.field)
 
-        for i in range(const.TEAM_ROBOTS_MAX_COUNT):
-            self.router.get_route(i).clear()
-            self.router.set_dest(i, waypoints[i], self.field)
-        self.router.reroute(self.field)
-
-        for i in range(const.TEAM_ROBOTS_MAX_COUNT):
-            self.router.get_route(i).go_route(self.field.allies[i], self.field)
+        # Если на планирование не хватает времени, роботы едут по маршрутам прошлого такта
+        if is_planning and not self.scheduler.has_time("planning"):
+            logger.warning("planning skipped, %.1f ms left in tick", self.scheduler.get_remaining() * 1000)
+        elif is_planning:
+            with self.scheduler.stage("planning"):
+                deadline = self.scheduler.get_stage_deadline("planning")
+                waypoints = self.strategy.process(self.field)
+
+                # Маршруты не очищаются: роутер сохраняет точки пути, пока цель не сместилась
+                for i in range(const.TEAM_ROBOTS_MAX_COUNT):
+                    self.router.set_dest(i, waypoints[i], self.field)
+                self.router.reroute(self.field, deadline)
+
+        with self.scheduler.stage("control"):
+            commands = [
+                self.router.get_route(i).calc_vel(self.field.allies[i], self.field, self.delta_t)
+                for i in range(const.TEAM_ROBOTS_MAX_COUNT)
+            ]
+            commands = self.router.deconflict(self.field, commands)
+            active = [(self.field.allies[i], command) for i, command in enumerate(commands) if command is not None]
+            robot.update_vel_xyw_many([rbt for rbt, _ in active], [command for _, command in active], self.delta_t)
 
     def control_assign(self) -> None:
         """
@@ -205,11 +168,21 @@ class SSLController(BaseProcessor):
         """
         # self.field.allies[const.DEBUG_ID].speed_x = 0
         # self.field.allies[const.DEBUG_ID].speed_y = 0
+        commands = []
         for i in range(const.TEAM_ROBOTS_MAX_COUNT):
-            if self.field.allies[i].is_used():
-                self.field.allies[i].color = self.ally_color
+            if not self.field.allies[i].is_used():
+                continue
+            self.field.allies[i].color = self.ally_color
             # self.field.allies[i].speed_r = self.square.get()
-            self.commands_sink_writer.write(self.field.allies[i])
+            commands.append(self.field.allies[i].get_command())
+
+        if self.command_ring is not None:
+            self.command_ring.write(commands)
+        elif const.SINK_BATCHED:
+            self.commands_sink_writer.write(commands)
+        else:
+            for command in commands:
+                self.commands_sink_writer.write(command)
 
     def process_referee_cmd(self) -> None:
         cur_cmd = self.get_last_referee_command()
@@ -275,11 +248,28 @@ class SSLController(BaseProcessor):
         Выполнить цикл процессора
         """
 
-        self.delta_t = time.time() - self.cur_time
-        self.cur_time = time.time()
-
-        self.read_vision()
-        self.process_referee_cmd()
-        self.control_loop()
-
-        self.control_assign()
+        # Процессор работает с периодом регуляторов LOW_LEVEL_Ts, стратегия и маршруты
+        # пересчитываются в ближайший такт после истечения периода Ts.
+        # Планирование не вынесено в отдельный поток: стратегия и роутер изменяют поле
+        # и маршруты, по которым едут регуляторы. Поэтому такт с планированием длиннее
+        # LOW_LEVEL_Ts (до бюджета "planning" в const.STAGE_BUDGETS): после дедлайна этапа
+        # reroute не запускает планировщик, а без запаса времени этап пропускается целиком
+        now = time.time()
+        is_planning = now - self.last_planning >= const.Ts - const.LOW_LEVEL_Ts / 2
+        if is_planning:
+            self.last_planning = now
+        self.delta_t = self.scheduler.start_tick(const.Ts if is_planning else const.LOW_LEVEL_Ts)
+
+        with self.scheduler.stage("vision"):
+            self.read_vision()
+        if is_planning:
+            with self.scheduler.stage("referee"):
+                self.process_referee_cmd()
+                self.update_game_state()
+
+        self.control_loop(is_planning)
+
+        with self.scheduler.stage("assign"):
+            self.control_assign()
+        if self.scheduler.end_tick():
+            logger.warning("tick overrun: %d of %d ticks", self.scheduler.tick_overruns, self.scheduler.ticks)
@@ -19,7 +19,7 @@ def shortesthull(p1: aux.Point, p2: aux.Point, points: list[aux.Point]) -> list[
         dist = 0.0
         last_wp_pos = hull[-1][0]
         for wpt in hull[-1]:
-            dist += (wpt - last_wp_pos).mag()
+            dist += wpt.dist_to(last_wp_pos)
             last_wp_pos = wpt
         if dist < mindist:
             mindist = dist
@@ -189,9 +189,8 @@ class RefStates:
         self.put_kickoff_waypoints(field, waypoints)
         # self.we_kick = 0
         if self.we_kick:
-            go_kick = fld.find_nearest_robot(field.ball.get_pos(), field.allies)
-            target = field.enemy_goal.center
-            target.y = 300
+            go_kick = field.find_nearest_ally(field.ball.get_pos())
+            target = aux.Point(field.enemy_goal.center.x, 300)
             waypoint = wp.Waypoint(
                 field.ball.get_pos(),
                 (target - field.allies[go_kick.r_id].get_pos()).arg(),
@@ -199,7 +198,7 @@ class RefStates:
             )
             waypoints[go_kick.r_id] = waypoint
         else:
-            go_kick = fld.find_nearest_robot(field.ball.get_pos(), field.allies)
+            go_kick = field.find_nearest_ally(field.ball.get_pos())
             target = aux.point_on_line(
                 field.ball.get_pos(), aux.Point(field.polarity * const.GOAL_DX, 0), 200
             )
@@ -2,14 +2,26 @@
 Описание полей и интерфейсов взаимодействия с роботом
 """
 
-import math
 import typing
 
+import numpy as np
+
 import bridge.processors.auxiliary as aux
 import bridge.processors.const as const
 import bridge.processors.entity as entity
+import bridge.processors.robot_command as robot_command
 import bridge.processors.tau as tau
 import bridge.processors.waypoint as wp
+import bridge.processors.world as world
+
+VEL_FILTER_T = 0.2  # с, постоянная времени фильтров требуемой скорости по осям робота
+
+
+def make_vel_filters(count: int) -> tau.FOLPBank:
+    """
+    Создать общий набор фильтров скорости для count роботов (строки 2 * r_id и 2 * r_id + 1)
+    """
+    return tau.FOLPBank(2 * count, VEL_FILTER_T, const.Ts)
 
 
 class Robot(entity.Entity):
@@ -25,14 +37,20 @@ class Robot(entity.Entity):
         color: const.Color,
         r_id: int,
         ctrl_id: int,
+        states: typing.Optional[world.EntityStates] = None,
+        vel_filters: typing.Optional[tau.FOLPBank] = None,
     ) -> None:
-        super().__init__(pos, angle, R)
+        """
+        Конструктор
+
+        vel_filters - общий набор фильтров скорости команды (make_vel_filters); без него
+        робот создает собственные фильтры
+        """
+        super().__init__(pos, angle, R, states=states, idx=r_id)
 
         self.r_id = r_id
         self.ctrl_id = ctrl_id
-        self.__is_used = 0
         self.color = color
-        self.last_update_ = 0.0
 
         self.speed_x = 0.0
         self.speed_y = 0.0
@@ -70,10 +88,14 @@ class Robot(entity.Entity):
         # self.max_acc = 1000
         # self.xxRL = tau.RateLimiter(const.Ts, self.max_acc)
         # self.yyRL = tau.RateLimiter(const.Ts, self.max_acc)
-        self.xx_t = 0.2
-        self.xx_flp = tau.FOLP(self.xx_t, const.Ts)
-        self.yy_t = 0.2
-        self.yy_flp = tau.FOLP(self.yy_t, const.Ts)
+        # Фильтры требуемых скоростей x и y - строки общего набора, чтобы update_vel_xyw_many
+        # обновляла их для всей команды одной операцией
+        if vel_filters is None:
+            self.vel_filters = make_vel_filters(1)
+            self.vel_rows = np.array([0, 1])
+        else:
+            self.vel_filters = vel_filters
+            self.vel_rows = np.array([2 * r_id, 2 * r_id + 1])
         # self.a0TF = 0.5
         # self.a0Flp = tau.FOLP(self.a0TF, const.Ts)
 
@@ -138,28 +160,27 @@ class Robot(entity.Entity):
         """
         Выставить флаг использования робота
         """
-        self.__is_used = a
+        self._states.used[self._idx] = a
 
     def is_used(self) -> int:
         """
         Узнать, используется ли робот
         """
-        return self.__is_used
-
-    def last_update(self) -> float:
-        """
-        Получить время последнего обновления робота
-        """
-        return self.last_update_
+        return int(self._states.used[self._idx])
 
     def update(self, pos: aux.Point, angle: float, t: float) -> None:
         """
         Обновить состояние робота согласно SSL Vision
         """
         super().update(pos, angle, t)
+        self.reset_kick()
+
+    def reset_kick(self) -> None:
+        """
+        Сбросить команды удара после обновления состояния робота
+        """
         self.kick_forward_ = 0
         self.kick_up_ = 0
-        self.last_update_ = t
 
     def kick_forward(self) -> None:
         """
@@ -195,7 +216,29 @@ class Robot(entity.Entity):
         self.dribbler_speed_ = robot.dribbler_speed_
         self.kicker_charge_enable_ = robot.kicker_charge_enable_
         self.beep = robot.beep
-        self.__is_used = robot.is_used()
+        self.used(robot.is_used())
+
+    def get_command(self) -> robot_command.RobotCommand:
+        """
+        Получить команду с текущими полями управления для отправки в CommandSink
+        """
+        return robot_command.RobotCommand(
+            self.ctrl_id,
+            self.color,
+            (
+                self.speed_x,
+                self.speed_y,
+                self.speed_r,
+                self.kick_up_,
+                self.kick_forward_,
+                self.auto_kick_,
+                self.kicker_voltage_,
+                self.dribbler_enable_,
+                self.dribbler_speed_,
+                self.kicker_charge_enable_,
+                self.beep,
+            ),
+        )
 
     def clear_fields(self) -> None:
         """
@@ -229,9 +272,9 @@ class Robot(entity.Entity):
                     target.pos,
                     target.pos
                     - aux.rotate(aux.RIGHT, target.angle) * const.KICK_ALIGN_DIST,
-                    self._pos,
+                    self.get_pos(),
                 ),
-                self._pos,
+                self.get_pos(),
             )
             < const.KICK_ALIGN_OFFSET * commit_scale
         )
@@ -250,45 +293,28 @@ class Robot(entity.Entity):
         """
         commit_scale = 1.2 if self.is_kick_committed else 1
         return (
-            abs(aux.wind_down_angle(self._angle - angle))
+            abs(aux.wind_down_angle(self.get_angle() - angle))
             < const.KICK_ALIGN_ANGLE * commit_scale
         )
 
-    def update_vel_xyw(self, vel: aux.Point, wvel: float) -> None:
+    def filter_vel(self, x: float, y: float, dt: typing.Optional[float] = None) -> tuple[float, float]:
         """
-        Выполнить тик низкоуровневых регуляторов скорости робота
+        Пропустить требуемые скорости по осям робота через фильтры скорости
 
-        vel - требуемый вектор скорости [мм/с] \\
-        wvel - требуемая угловая скорость [рад/с]
+        dt - фактическое время с прошлого такта [с] (по умолчанию const.Ts)
         """
-        self.speed_x = self.xx_flp.process(
-            1 / self.k_xx * aux.rotate(vel, -self._angle).x
-        )
-        self.speed_y = self.yy_flp.process(
-            1 / self.k_yy * aux.rotate(vel, -self._angle).y
-        )
+        out = self.vel_filters.process(np.array([x, y]), dt, self.vel_rows)
+        return float(out[0]), float(out[1])
 
-        # self.speed_x = self.xx_flp.process(1 / self.k_xx * vel.x)
-        # self.speed_y = self.yy_flp.process(1 / self.k_yy * vel.y)
-
-        # RcompY = self.Kwy * self.RcompFfy.process(self.RcompFdy.process(self.speed_y))
-        # RcompY = self.Kwy * self.RcompFdy.process(abs(float(self.speed_y)**2))
-        r_comp_y = 0
-        self.speed_r = 1 / self.k_ww * (wvel - r_comp_y)
-        if abs(self.speed_r) > const.MAX_SPEED_R:
-            self.speed_r = const.MAX_SPEED_R * abs(self.speed_r) / self.speed_r
-
-        vec_speed = math.sqrt(self.speed_x**2 + self.speed_y**2)
-        r_speed = abs(self.speed_r)
-
-        if const.IS_SIMULATOR_USED:
-            vec_speed *= (const.MAX_SPEED_R - r_speed) / const.MAX_SPEED_R
-        else:
-            vec_speed *= ((const.MAX_SPEED_R - r_speed) / const.MAX_SPEED_R) ** 4
+    def update_vel_xyw(self, vel: aux.Point, wvel: float, dt: typing.Optional[float] = None) -> None:
+        """
+        Выполнить тик низкоуровневых регуляторов скорости робота
 
-        ang = math.atan2(self.speed_y, self.speed_x)
-        self.speed_x = vec_speed * math.cos(ang)
-        self.speed_y = vec_speed * math.sin(ang)
+        vel - требуемый вектор скорости [мм/с] \\
+        wvel - требуемая угловая скорость [рад/с] \\
+        dt - фактическое время с прошлого такта [с] (по умолчанию const.Ts)
+        """
+        update_vel_xyw_many([self], [(vel, wvel)], dt)
 
     def __str__(self) -> str:
         return (
@@ -306,3 +332,54 @@ class Robot(entity.Entity):
             + " "
             + str(self.speed_r)
         )
+
+
+def update_vel_xyw_many(
+    robots: list[Robot], commands: list[tuple[aux.Point, float]], dt: typing.Optional[float] = None
+) -> None:
+    """
+    Выполнить тик низкоуровневых регуляторов скорости для роботов robots одной операцией
+
+    commands - (vel, wvel) для каждого робота, как у Robot.update_vel_xyw
+    Роботы могут быть из разных наборов фильтров (разных команд или с собственными фильтрами)
+    """
+    if not robots:
+        return
+
+    vel = np.array([(command[0].x, command[0].y) for command in commands])
+    wvel = np.array([command[1] for command in commands])
+    angle = np.array([rbt.get_angle() for rbt in robots])
+    k_xy = np.array([(rbt.k_xx, rbt.k_yy) for rbt in robots])
+    k_ww = np.array([rbt.k_ww for rbt in robots])
+
+    # Требуемая скорость в системе координат робота
+    cos, sin = np.cos(-angle), np.sin(-angle)
+    local = np.stack((vel[:, 0] * cos - vel[:, 1] * sin, vel[:, 1] * cos + vel[:, 0] * sin), axis=1)
+    local /= k_xy
+
+    # Роботы группируются по наборам фильтров: строки одного набора обновляются вместе
+    groups: dict[int, list[int]] = {}
+    for i, rbt in enumerate(robots):
+        groups.setdefault(id(rbt.vel_filters), []).append(i)
+    speed = np.empty_like(local)
+    for members in groups.values():
+        rows = np.concatenate([robots[i].vel_rows for i in members])
+        speed[members] = robots[members[0]].vel_filters.process(local[members].reshape(-1), dt, rows).reshape(-1, 2)
+
+    # RcompY = self.Kwy * self.RcompFfy.process(self.RcompFdy.process(self.speed_y))
+    speed_r = np.clip(wvel / k_ww, -const.MAX_SPEED_R, const.MAX_SPEED_R)
+
+    # Поступательная скорость уменьшается при вращении
+    vec_speed = np.hypot(speed[:, 0], speed[:, 1])
+    if const.IS_SIMULATOR_USED:
+        vec_speed *= (const.MAX_SPEED_R - np.abs(speed_r)) / const.MAX_SPEED_R
+    else:
+        vec_speed *= ((const.MAX_SPEED_R - np.abs(speed_r)) / const.MAX_SPEED_R) ** 4
+    ang = np.arctan2(speed[:, 1], speed[:, 0])
+
+    for rbt, speed_x, speed_y, speed_rot in zip(
+        robots, (vec_speed * np.cos(ang)).tolist(), (vec_speed * np.sin(ang)).tolist(), speed_r.tolist()
+    ):
+        rbt.speed_x = speed_x
+        rbt.speed_y = speed_y
+        rbt.speed_r = speed_rot
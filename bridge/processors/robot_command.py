@@ -0,0 +1,63 @@
+"""
+Компактная команда роботу для передачи через шину от контроллера к CommandSink
+
+Хранит только номер канала управления, цвет и поля управления в порядке пакета на робота,
+поэтому сериализуется намного дешевле объекта robot.Robot и не ссылается на его состояние
+"""
+
+import typing
+
+import numpy as np
+
+import bridge.processors.const as const
+
+COMMAND_SIZE = 13  # количество чисел в пакете одному роботу
+
+
+class RobotCommand:
+    """
+    Команда одному роботу
+    """
+
+    __slots__ = ("ctrl_id", "color", "fields")
+
+    def __init__(self, ctrl_id: int, color: const.Color, fields: tuple[float, ...]) -> None:
+        """
+        Конструктор
+
+        fields - (speed_x, speed_y, speed_r, kick_up, kick_forward, auto_kick, kicker_voltage,
+        dribbler_enable, dribbler_speed, kicker_charge_enable, beep)
+        """
+        self.ctrl_id = ctrl_id
+        self.color = color
+        self.fields = fields
+
+    def __getstate__(self) -> tuple[int, const.Color, tuple[float, ...]]:
+        return self.ctrl_id, self.color, self.fields
+
+    def __setstate__(self, state: tuple[int, const.Color, tuple[float, ...]]) -> None:
+        self.ctrl_id, self.color, self.fields = state
+
+    def __repr__(self) -> str:
+        return f"RobotCommand({self.ctrl_id}, {self.color}, {self.fields})"
+
+    def write(self, row: np.ndarray) -> None:
+        """
+        Записать поля управления в строку row таблицы команд CommandSink
+        """
+        row[1:12] = self.fields
+
+
+def get_color_index(color: const.Color) -> typing.Optional[int]:
+    """
+    Получить номер половины таблицы команд для цвета: 0 - синие, 1 - желтые
+    """
+    if color == const.Color.BLUE:
+        return 0
+    if color == const.Color.YELLOW:
+        return 1
+    return None
+
+
+# Содержимое сообщения в TOPIC_SINK: команда одному роботу или команды всех роботов за такт
+SinkMessage = typing.Union[RobotCommand, list[RobotCommand]]
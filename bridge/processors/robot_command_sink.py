@@ -1,25 +1,49 @@
 """
 Модуль-прослойка между стратегией и отправкой пакетов на роботов
 """
-import struct
 import typing
 
 import attr
+import numpy as np
 from strategy_bridge.bus import DataBus, DataReader, DataWriter
 from strategy_bridge.common import config
 from strategy_bridge.processors import BaseProcessor
 
-import bridge.processors.auxiliary as aux
+import bridge.processors.command_ring as command_ring
 import bridge.processors.const as const
-import bridge.processors.robot as robot
+import bridge.processors.robot_command as robot_command
 
 from time import time
 
+# Столбцы таблицы команд (порядок чисел в пакете на робота)
+COMMAND_SIZE = robot_command.COMMAND_SIZE
+SPEEDS = slice(1, 4)
+KICK_UP = 4
+KICK_FORWARD = 5
+AUTO_KICK = 6
+KICKER_VOLTAGE = 7
+DRIBBLER = slice(8, 10)
+KICKER_CHARGE = 10
+
+SPEED_DEAD_BAND = 1.5  # скорости меньше по модулю не отправляются
+
+
+def _get_default_commands() -> np.ndarray:
+    """
+    Получить таблицу команд роботам, от которых еще ничего не приходило (как у нового robot.Robot)
+    """
+    commands = np.zeros((2, const.TEAM_ROBOTS_MAX_COUNT, COMMAND_SIZE))
+    commands[..., KICKER_CHARGE] = 1
+    return commands
+
 
 @attr.s(auto_attribs=True)
 class CommandSink(BaseProcessor):
     """
     Прослойка между стратегией и отправкой пакетов на роботов
+
+    Команды хранятся в таблице [цвет (синие, желтые), номер робота, поле команды],
+    которая обновляется на месте и отправляется одним блоком байт
     """
 
     processing_pause: typing.Optional[float] = 0.01
@@ -27,12 +51,14 @@ class CommandSink(BaseProcessor):
     commands_sink_reader: DataReader = attr.ib(init=False)
     commands_writer: DataWriter = attr.ib(init=False)
 
-    b_control_team = [
-        robot.Robot(aux.GRAVEYARD_POS, 0, const.ROBOT_R, "b", i, 0) for i in range(const.TEAM_ROBOTS_MAX_COUNT)
-    ]
-    y_control_team = [
-        robot.Robot(aux.GRAVEYARD_POS, 0, const.ROBOT_R, "y", i, 0) for i in range(const.TEAM_ROBOTS_MAX_COUNT)
-    ]
+    commands: np.ndarray = attr.ib(init=False, factory=_get_default_commands)
+    used: np.ndarray = attr.ib(init=False, factory=lambda: np.zeros((2, const.TEAM_ROBOTS_MAX_COUNT), dtype=bool))
+    _out: np.ndarray = attr.ib(init=False, factory=lambda: np.zeros((2, const.TEAM_ROBOTS_MAX_COUNT, COMMAND_SIZE)))
+    _rings: dict[const.Color, command_ring.CommandRing] = attr.ib(init=False, factory=dict)
+    _frame: np.ndarray = attr.ib(init=False, factory=lambda: np.zeros(command_ring.FRAME_SHAPE))
+    _reversed: np.ndarray = attr.ib(
+        init=False, factory=lambda: np.isin(np.arange(const.TEAM_ROBOTS_MAX_COUNT), const.REVERSED_KICK)
+    )
 
     def initialize(self, data_bus: DataBus) -> None:
         """
@@ -47,127 +73,77 @@ class CommandSink(BaseProcessor):
         Метод обратного вызова процесса
         """
 
+        if const.COMMANDS_SHM:
+            self.read_rings()
+
         cmds = self.commands_sink_reader.read_new()
 
         for cmd in cmds:
-            r: robot.Robot = cmd.content
-            if not r.is_used():
-                continue
-            ctrl_id = r.ctrl_id
-
-            if ctrl_id is None:
-                continue
-
-            if ctrl_id in const.REVERSED_KICK:
-                r.kick_forward_, r.kick_up_ = r.kick_up_, r.kick_forward_
-                if r.auto_kick_ == 2:
-                    r.auto_kick_ = 1
-                elif r.auto_kick_ == 1:
-                    r.auto_kick_ = 2
-
-            if r.color == const.Color.BLUE:
-                self.b_control_team[ctrl_id].copy_control_fields(r)
-            elif r.color == const.Color.YELLOW:
-                self.y_control_team[ctrl_id].copy_control_fields(r)
-                #self.y_control_team[ctrl_id].used(1)
-
+            content: robot_command.SinkMessage = cmd.content
+            if isinstance(content, robot_command.RobotCommand):
+                self.apply_command(content)
+            else:
+                for command in content:
+                    self.apply_command(command)
 
         rules = self.get_rules()
 
         self.commands_writer.write(rules)
 
+    def apply_command(self, command: robot_command.RobotCommand) -> None:
+        """
+        Записать команду роботу в таблицу команд
+        """
+        color = robot_command.get_color_index(command.color)
+        if color is None or command.ctrl_id is None:
+            return
+        command.write(self.commands[color, command.ctrl_id])
+        self.used[color, command.ctrl_id] = True
+
+    def read_rings(self) -> None:
+        """
+        Записать в таблицу команд последние кадры из буферов общей памяти контроллеров
+        """
+        for color in (const.Color.BLUE, const.Color.YELLOW):
+            if color not in self._rings:
+                try:
+                    self._rings[color] = command_ring.CommandRing(color, create=False)
+                except FileNotFoundError:
+                    # Контроллер этого цвета еще не запущен
+                    continue
+            if self._rings[color].read(self._frame) is None:
+                continue
+            present = self._frame[..., 0] > 0
+            self.commands[present] = self._frame[present]
+            self.commands[present, 0] = 0
+            self.used |= present
+
     def get_rules(self) -> bytes:
         """
         Сформировать массив команд для отправки на роботов
         """
-        rules: list[float] = []
+        out = self._out
+        np.copyto(out, self.commands)
 
-        if const.IS_SIMULATOR_USED:
-            for i in range(const.TEAM_ROBOTS_MAX_COUNT):
-                if abs(self.b_control_team[i].speed_x) < 1.5:
-                    self.b_control_team[i].speed_x = 0
-                if abs(self.b_control_team[i].speed_y) < 1.5:
-                    self.b_control_team[i].speed_y = 0
-                if abs(self.b_control_team[i].speed_r) < 1.5:
-                    self.b_control_team[i].speed_r = 0
-                rules.append(0)
-                rules.append(self.b_control_team[i].speed_x)
-                rules.append(self.b_control_team[i].speed_y)
-                rules.append(self.b_control_team[i].speed_r)
-                rules.append(self.b_control_team[i].kick_up_)
-                rules.append(self.b_control_team[i].kick_forward_)
-                rules.append(self.b_control_team[i].auto_kick_)
-                rules.append(self.b_control_team[i].kicker_voltage_ // 2)
-                rules.append(self.b_control_team[i].dribbler_enable_)
-                rules.append(self.b_control_team[i].dribbler_speed_)
-                rules.append(self.b_control_team[i].kicker_charge_enable_)
-                rules.append(self.b_control_team[i].beep)
-                rules.append(0)
-
-            for i in range(const.TEAM_ROBOTS_MAX_COUNT):
-                if abs(self.y_control_team[i].speed_x) < 1.5:
-                    self.y_control_team[i].speed_x = 0
-                if abs(self.y_control_team[i].speed_y) < 1.5:
-                    self.y_control_team[i].speed_y = 0
-                if abs(self.y_control_team[i].speed_r) < 1.5:
-                    self.y_control_team[i].speed_r = 0
-                rules.append(0)
-                rules.append(self.y_control_team[i].speed_x)
-                rules.append(self.y_control_team[i].speed_y)
-                rules.append(self.y_control_team[i].speed_r)
-                rules.append(self.y_control_team[i].kick_up_)
-                rules.append(self.y_control_team[i].kick_forward_)
-                rules.append(self.y_control_team[i].auto_kick_)
-                rules.append(self.y_control_team[i].kicker_voltage_ // 2)
-                rules.append(self.y_control_team[i].dribbler_enable_)
-                rules.append(self.y_control_team[i].dribbler_speed_)
-                rules.append(self.y_control_team[i].kicker_charge_enable_)
-                rules.append(self.y_control_team[i].beep)
-                rules.append(0)
-        else:
-            for i in range(const.TEAM_ROBOTS_MAX_COUNT):
-                control_team = self.y_control_team if self.y_control_team[i].is_used() else self.b_control_team
-            
-                if self.y_control_team[i].is_used():
-                    pass
-                elif self.b_control_team[i].is_used():
-                    pass
-                else:
-                    for _ in range(13):
-                        rules.append(0)
-                    continue
+        speeds = out[..., SPEEDS]
+        speeds[np.abs(speeds) < SPEED_DEAD_BAND] = 0
+
+        # У роботов из REVERSED_KICK перепутаны верхний и прямой удары
+        rev = self._reversed
+        out[:, rev, KICK_UP], out[:, rev, KICK_FORWARD] = out[:, rev, KICK_FORWARD], out[:, rev, KICK_UP]
+        auto_kick = out[:, rev, AUTO_KICK]
+        out[:, rev, AUTO_KICK] = np.where(auto_kick == 1, 2, np.where(auto_kick == 2, 1, auto_kick))
 
-                if not const.IS_DRIBLER_USED:
-                    if round(time()*2) % 10 == 0:
-                        control_team[i].dribbler_enable_ = 1
-                        control_team[i].dribbler_speed_ = 1
-                    else:
-                        control_team[i].dribbler_enable_ = 0
-                        control_team[i].dribbler_speed_ = 0
-
-                if abs(control_team[i].speed_x) < 1.5:
-                    control_team[i].speed_x = 0
-                if abs(control_team[i].speed_y) < 1.5:
-                    control_team[i].speed_y = 0
-                if abs(control_team[i].speed_r) < 1.5:
-                    control_team[i].speed_r = 0
-                rules.append(0)
-                rules.append(control_team[i].speed_x)
-                rules.append(control_team[i].speed_y)
-                rules.append(control_team[i].speed_r)
-                rules.append(control_team[i].kick_up_)
-                rules.append(control_team[i].kick_forward_)
-                rules.append(control_team[i].auto_kick_)
-                rules.append(control_team[i].kicker_voltage_)
-                rules.append(control_team[i].dribbler_enable_)
-                rules.append(control_team[i].dribbler_speed_)
-                rules.append(control_team[i].kicker_charge_enable_)
-                rules.append(control_team[i].beep)
-                rules.append(0)
-            for _ in range(const.TEAM_ROBOTS_MAX_COUNT):
-                for _ in range(13):
-                    rules.append(0)
-
-        # rules = [15] * 13 * 32
-        b = bytes()
-        return b.join((struct.pack("d", rule) for rule in rules))
+        if const.IS_SIMULATOR_USED:
+            out[..., KICKER_VOLTAGE] //= 2
+            return out.tobytes()
+
+        # На реальных роботах команды идут в первую половину пакета: желтому роботу, если он
+        # управляется, иначе синему; вторая половина пакета пустая
+        team = out[0]
+        np.copyto(team, out[1], where=self.used[1][:, np.newaxis])
+        if not const.IS_DRIBLER_USED:
+            team[:, DRIBBLER] = 1 if round(time() * 2) % 10 == 0 else 0
+        team[~(self.used[0] | self.used[1])] = 0
+        out[1] = 0
+        return out.tobytes()
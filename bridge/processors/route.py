@@ -3,10 +3,16 @@
 """
 
 import math
+import time
+import typing
+
+import numpy as np
 
 import bridge.processors.auxiliary as aux
 import bridge.processors.waypoint as wp
-from bridge.processors import const, field, robot, tau
+from bridge.processors import const, field, log, robot, tau, trajectory
+
+logger = log.get_logger("route")
 
 
 class Route:
@@ -18,7 +24,7 @@ class Route:
         """
         Конструктор
         """
-        self._robot = [wp.Waypoint(rbt.get_pos(), rbt._angle, wp.WType.T_ROBOT)]
+        self._robot = [wp.Waypoint(rbt.get_pos(), rbt.get_angle(), wp.WType.T_ROBOT)]
         self._destination = [wp.Waypoint(aux.GRAVEYARD_POS, 0, wp.WType.T_GRAVEYARD)]
         self._routewp: list[wp.Waypoint] = []
         # self.__route = [*self.robot, *self.__routewp, *self.__destination]
@@ -26,6 +32,10 @@ class Route:
         self.go_flag = 0
         self.go_time = 0
 
+        # Траектория сохраняется между тиками, пока маршрут и отклонение от нее не изменятся
+        self._trajectory: typing.Optional[trajectory.PathTrajectory] = None
+        self._trajectory_start = 0.0
+
     def update(self, rbt: robot.Robot) -> None:
         """
         Обновить маршрут
@@ -115,10 +125,39 @@ class Route:
                 wpt.type == wp.WType.S_BALL_PASS,
             ]:
                 break
-            dist += (wpt.pos - last_wp_pos).mag()
+            dist += wpt.pos.dist_to(last_wp_pos)
             last_wp_pos = wpt.pos
         return dist
 
+    def get_reference(self, rbt: robot.Robot) -> tuple[aux.Point, aux.Point]:
+        """
+        Получить опорные положение и скорость робота на траектории в текущий момент
+
+        Траектория строится заново, если изменились оставшиеся точки маршрута
+        или робот отклонился от нее больше чем на TRAJ_MAX_DEVIATION
+        """
+        now = time.time()
+        route_pos = np.array([(wpt.pos.x, wpt.pos.y) for wpt in self.__get_route()[1:]])
+        self_pos = rbt.get_pos()
+
+        traj = self._trajectory
+        if traj is not None and traj.follows(route_pos, const.REPLAN_TARGET_TOL):
+            ref_pos, ref_vel = traj.sample(now - self._trajectory_start)
+            if math.hypot(ref_pos[0] - self_pos.x, ref_pos[1] - self_pos.y) < const.TRAJ_MAX_DEVIATION:
+                return aux.Point(*ref_pos.tolist()), aux.Point(*ref_vel.tolist())
+
+        # Начальная скорость - проекция текущей на первый отрезок
+        points = np.concatenate(([(self_pos.x, self_pos.y)], route_pos))
+        first = points[1] - points[0]
+        first_len = math.hypot(first[0], first[1])
+        cur_vel = rbt.get_vel()
+        v0 = (cur_vel.x * first[0] + cur_vel.y * first[1]) / first_len if first_len > 0 else 0.0
+
+        self._trajectory = trajectory.PathTrajectory(points, v0)
+        self._trajectory_start = now
+        ref_pos, ref_vel = self._trajectory.sample(0)
+        return aux.Point(*ref_pos.tolist()), aux.Point(*ref_vel.tolist())
+
     def __str__(self) -> str:
         strin = "ROUTE: "
         for wpt in self.__get_route():
@@ -127,10 +166,24 @@ class Route:
         #     strin += " -> " + str(wp)
         return strin
 
-    def go_route(self, rbt: robot.Robot, fld: field.Field) -> None:
+    def go_route(self, rbt: robot.Robot, fld: field.Field, dt: typing.Optional[float] = None) -> None:
         """
         Двигаться по маршруту route
         """
+        command = self.calc_vel(rbt, fld, dt)
+        if command is not None:
+            rbt.update_vel_xyw(*command, dt)
+
+    def calc_vel(
+        self, rbt: robot.Robot, fld: field.Field, dt: typing.Optional[float] = None
+    ) -> typing.Optional[tuple[aux.Point, float]]:
+        """
+        Рассчитать требуемые скорости для движения по маршруту route
+
+        dt - фактическое время с прошлого такта для регуляторов (по умолчанию const.Ts)
+        @return (вектор скорости [мм/с], угловая скорость [рад/с]) для rbt.update_vel_xyw
+        или None, если скорости робота уже заданы напрямую (S_VELOCITY)
+        """
         target_point = self.get_next_wp()
 
         rbt.kicker_charge_enable_ = 1
@@ -138,10 +191,9 @@ class Route:
         if target_point.type == wp.WType.S_VELOCITY:  # and self.go_flag == 0:
             wvel = target_point.angle
             vel = target_point.pos
-            rbt.speed_x = rbt.xx_flp.process(1 / rbt.k_xx * vel.x)
-            rbt.speed_y = rbt.yy_flp.process(1 / rbt.k_yy * vel.y)
+            rbt.speed_x, rbt.speed_y = rbt.filter_vel(1 / rbt.k_xx * vel.x, 1 / rbt.k_yy * vel.y, dt)
             rbt.speed_r = 1 / rbt.k_ww * wvel
-            return
+            return None
 
         cur_vel = rbt.get_vel()
 
@@ -190,7 +242,9 @@ class Route:
                 angle0 = end_point.angle
 
             rbt.dribbler_enable_ = True
-            print("asd",rbt.r_id, rbt.kicker_voltage_)
+            logger.debug(
+                "robot %d near ball, kicker voltage: %s", rbt.r_id, rbt.kicker_voltage_, extra={"key": ("kick", rbt.r_id)}
+            )
             rbt.dribbler_speed_ = 15
             if rbt.kicker_voltage_ == 0:
                 rbt.kicker_voltage_ = const.VOLTAGE_SHOOT
@@ -225,9 +279,23 @@ class Route:
                 #     self.go_flag = 1
                 #     self.go_time = time.time()
 
+        elif end_point.type == wp.WType.S_ENDPOINT and target_point.type in [
+            wp.WType.S_ENDPOINT,
+            wp.WType.R_PASSTHROUGH,
+        ]:
+            # Слежение за траекторией: прямая связь по опорной скорости и PISD по отклонению
+            ref_pos, ref_vel = self.get_reference(rbt)
+            ref_err = ref_pos - rbt.get_pos()
+            u_x = -rbt.pos_reg_x.process(ref_err.x, ref_vel.x - cur_vel.x, dt)
+            u_y = -rbt.pos_reg_y.process(ref_err.y, ref_vel.y - cur_vel.y, dt)
+            transl_vel = aux.Point(u_x, u_y) - ref_vel
+            if transl_vel.mag() > const.MAX_SPEED:
+                transl_vel = transl_vel.unity() * const.MAX_SPEED
+            angle0 = end_point.angle
         else:
-            u_x = -rbt.pos_reg_x.process(vec_err.x, -cur_vel.x)
-            u_y = -rbt.pos_reg_y.process(vec_err.y, -cur_vel.y)
+            self._trajectory = None
+            u_x = -rbt.pos_reg_x.process(vec_err.x, -cur_vel.x, dt)
+            u_y = -rbt.pos_reg_y.process(vec_err.y, -cur_vel.y, dt)
             # transl_vel = vel0 * u
             transl_vel = aux.Point(u_x, u_y)
             angle0 = end_point.angle
@@ -237,7 +305,7 @@ class Route:
 
         aerr = aux.wind_down_angle(angle0 - rbt.get_angle())
 
-        ang_vel = rbt.angle_reg.process(aerr, -rbt.get_anglevel())
+        ang_vel = rbt.angle_reg.process(aerr, -rbt.get_anglevel(), dt)
 
         # if self.go_flag == 1:  #NOTE: kostil
         #     if time.time() - self.go_time < 1:
@@ -266,4 +334,4 @@ class Route:
         else:
             rbt.auto_kick_ = 0
 
-        rbt.update_vel_xyw(transl_vel, ang_vel)
+        return transl_vel, ang_vel
@@ -5,10 +5,13 @@
 """
 
 import math
+import time
 import typing
 
+import numpy as np
+
 import bridge.processors.auxiliary as aux
-from bridge.processors import const, field, route
+from bridge.processors import batch_aux, const, costmap, field, planner, planning_pool, route
 import bridge.processors.quickhull as qh
 import bridge.processors.waypoint as wp
 
@@ -18,14 +21,45 @@ class Router:
     Маршрутизатор
     """
 
-    def __init__(self, fld: field.Field) -> None:
+    def __init__(
+        self,
+        fld: field.Field,
+        path_planner: typing.Optional[planner.Planner] = None,
+        workers: int = const.PLANNING_WORKERS,
+    ) -> None:
         """
         Конструктор
+
+        path_planner - глобальный планировщик пути; без него маршруты строятся
+        векторным полем и обходом штрафных зон
+        workers - число параллельных исполнителей планировщика, 0 - планировать последовательно
         """
         self.routes = [
             route.Route(fld.allies[i]) for i in range(const.TEAM_ROBOTS_MAX_COUNT)
         ]
         self.__avoid_ball = False
+        self.planner = path_planner
+
+        # Последний построенный планировщиком путь каждого робота: (цель, промежуточные точки)
+        self.plans: list[typing.Optional[tuple[aux.Point, list[aux.Point]]]] = [
+            None
+        ] * const.TEAM_ROBOTS_MAX_COUNT
+        # Маршрут робота состоит только из точек сохраненного пути и конечной точки
+        self._plan_in_route = [False] * const.TEAM_ROBOTS_MAX_COUNT
+        self.replan_count = 0
+        self.pool: typing.Optional[planning_pool.PlanningPool] = None
+        if path_planner is not None and workers > 0:
+            self.pool = planning_pool.PlanningPool(path_planner, workers, const.PLANNING_PROCESSES)
+
+        # Карта стоимости поля, пересоздается при изменении ворот
+        self.costmap: typing.Optional[costmap.CostMap] = None
+        self._costmap_goal: typing.Optional[field.Goal] = None
+
+        # Набор скоростей-кандидатов для согласования движения союзников
+        speeds = np.array([0.25, 0.5, 0.75, 1.0]) * const.MAX_SPEED
+        angles = np.arange(16) * 2 * math.pi / 16
+        ring = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+        self._candidates = np.concatenate(([[0.0, 0.0]], (speeds[:, None, None] * ring).reshape(-1, 2)))
 
     def avoid_ball(self, state: bool = True) -> None:
         """
@@ -33,6 +67,13 @@ class Router:
         """
         self.__avoid_ball = state
 
+    def close(self) -> None:
+        """
+        Остановить исполнителей глобального планировщика
+        """
+        if self.pool is not None:
+            self.pool.close()
+
     def update(self, fld: field.Field) -> None:
         """
         Обновить маршруты актуальным состоянием поля
@@ -47,12 +88,10 @@ class Router:
         if idx != fld.gk_id and target.type != wp.WType.R_IGNORE_GOAl_HULL:
             dest_pos = target.pos
             for goal in [fld.ally_goal, fld.enemy_goal]:
-                if aux.is_point_inside_poly(dest_pos, goal.big_hull):
-                    closest_out = aux.nearest_point_on_poly(dest_pos, goal.big_hull)
+                if goal.big_hull_poly.contains(dest_pos):
+                    closest_out = goal.big_hull_poly.nearest_point(dest_pos)
                     angle0 = target.angle
-                    self.routes[idx].set_dest_wp(
-                        wp.Waypoint(closest_out, angle0, wp.WType.S_ENDPOINT)
-                    )
+                    self._put_dest(idx, wp.Waypoint(closest_out, angle0, wp.WType.S_ENDPOINT))
                     return
 
         if self.__avoid_ball:
@@ -67,26 +106,59 @@ class Router:
                     const.KEEP_BALL_DIST + const.ROBOT_R,
                 )
                 angle0 = target.angle
-                self.routes[idx].set_dest_wp(
-                    wp.Waypoint(closest_out, angle0, wp.WType.S_ENDPOINT)
-                )
+                self._put_dest(idx, wp.Waypoint(closest_out, angle0, wp.WType.S_ENDPOINT))
                 return
 
-        if abs(target.pos.x) > const.GOAL_DX:
-            target.pos.x = const.GOAL_DX * aux.sign(target.pos.x)
-        if abs(target.pos.y) > 1500:
-            target.pos.y = 1500 * aux.sign(target.pos.y)
-        self.routes[idx].set_dest_wp(target)
+        if abs(target.pos.x) > const.GOAL_DX or abs(target.pos.y) > 1500:
+            # Точка стратегии не изменяется, вместо нее создается ограниченная копия
+            target = wp.Waypoint(
+                aux.Point(aux.minmax(target.pos.x, const.GOAL_DX), aux.minmax(target.pos.y, 1500)),
+                target.angle,
+                target.type,
+            )
+        self._put_dest(idx, target)
+
+    def _put_dest(self, idx: int, dest: wp.Waypoint) -> None:
+        """
+        Задать конечную точку маршрута idx
 
-    def reroute(self, fld: field.Field) -> None:
+        Если цель не сместилась, точки сохраненного пути остаются в маршруте (их проверит reroute),
+        иначе промежуточные точки маршрута удаляются
+        """
+        cached = self.plans[idx]
+        if not (
+            self._plan_in_route[idx]
+            and cached is not None
+            and dest.type == self.routes[idx].get_dest_wp().type
+            and aux.dist(cached[0], dest.pos) < const.REPLAN_TARGET_TOL
+        ):
+            self.routes[idx].clear()
+            self._plan_in_route[idx] = False
+        self.routes[idx].set_dest_wp(dest)
+
+    def reroute(self, fld: field.Field, deadline: typing.Optional[float] = None) -> None:
         """
         Рассчитать маршруты по актуальным путевым точкам
+
+        deadline - момент (time.time()), после которого глобальный планировщик не запускается
+        заново: используются только сохраненные пути, остальные маршруты строятся векторным полем
         """
-        for idx in range(const.TEAM_ROBOTS_MAX_COUNT):
+        static_map = self.update_costmap(fld)
 
-            self_pos = fld.allies[idx].get_pos()
+        # Векторное поле считается одним пакетом для всех маршрутов после основного цикла
+        vfield_ids: list[int] = []
+        vfield_hull_check: list[bool] = []
+
+        obstacles: typing.Optional[planner.Obstacles] = None
+        if self.planner is not None:
+            obstacles = self.get_obstacles(fld)
+
+        pending: list[int] = []
+        for idx in range(const.TEAM_ROBOTS_MAX_COUNT):
 
             if not self.routes[idx].is_used():
+                self.plans[idx] = None
+                self._plan_in_route[idx] = False
                 continue
 
             if self.routes[idx].get_next_type() == wp.WType.S_VELOCITY:
@@ -108,13 +180,29 @@ class Router:
                 idx == fld.gk_id
                 or self.routes[idx].get_dest_wp().type == wp.WType.R_IGNORE_GOAl_HULL
             ):
-                pth_wp = self.calc_vector_field(idx, fld)
-                if pth_wp is not None:
-                    self.routes[idx].insert_wp(pth_wp)
+                self.drop_plan_points(idx)
+                vfield_ids.append(idx)
+                vfield_hull_check.append(False)
+                continue
+
+            pending.append(idx)
+
+        # Пути глобального планировщика не зависят друг от друга и могут считаться параллельно,
+        # маршруты дополняются ими по порядку номеров роботов
+        planned: set[int] = set()
+        if obstacles is not None:
+            planned = self.plan_routes(pending, fld, obstacles, deadline)
+
+        fallback: list[int] = []
+        for idx in pending:
+            if idx in planned:
                 continue
+            self.drop_plan_points(idx)
+
+            self_pos = fld.allies[idx].get_pos()
 
             for goal in [fld.ally_goal, fld.enemy_goal]:
-                if aux.is_point_inside_poly(self_pos, goal.hull):
+                if goal.hull_poly.contains(self_pos):
                     closest_out = aux.find_nearest_point(
                         self_pos, goal.big_hull, [goal.up, aux.GRAVEYARD_POS, goal.down]
                     )
@@ -127,14 +215,10 @@ class Router:
                         )
                     )
                     continue
-                pint = aux.segment_poly_intersect(
-                    self_pos, self.routes[idx].get_next_wp().pos, goal.hull
-                )
+                pint = goal.hull_poly.segment_intersect(self_pos, self.routes[idx].get_next_wp().pos)
                 if pint is not None:
                     angle0 = self.routes[idx].get_dest_wp().angle
-                    if aux.is_point_inside_poly(
-                        self.routes[idx].get_dest_wp().pos, goal.big_hull
-                    ):
+                    if goal.big_hull_poly.contains(self.routes[idx].get_dest_wp().pos):
                         self.routes[idx].set_dest_wp(
                             wp.Waypoint(pint, angle0, wp.WType.S_ENDPOINT)
                         )
@@ -149,133 +233,439 @@ class Router:
                             wp.Waypoint(convex_hull[j], angle0, wp.WType.R_PASSTHROUGH)
                         )
 
-            if self.__avoid_ball:
-                dest_pos = self.routes[idx].get_dest_wp().pos
-                self_pos = fld.allies[idx].get_pos()
-                angle0 = self.routes[idx].get_dest_wp().angle
-                if aux.is_point_inside_circle(
-                    self_pos, fld.ball.get_pos(), const.KEEP_BALL_DIST
-                ):
-                    closest_out = aux.nearest_point_on_circle(
-                        self_pos, fld.ball.get_pos(), const.KEEP_BALL_DIST
-                    )
-                    self.routes[idx].insert_wp(
-                        wp.Waypoint(closest_out, angle0, wp.WType.R_PASSTHROUGH)
-                    )
-                    continue
-                points = aux.line_circle_intersect(
-                    self_pos, dest_pos, fld.ball.get_pos(), const.KEEP_BALL_DIST
+            fallback.append(idx)
+
+        if self.__avoid_ball:
+            fallback = self.avoid_ball_routes(fallback, fld)
+        vfield_ids.extend(fallback)
+        vfield_hull_check.extend([True] * len(fallback))
+
+        pth_wps = self.calc_vector_fields(vfield_ids, fld)
+        # Точки векторного поля внутри штрафных зон отбрасываются (проверка по карте стоимости)
+        in_zone = iter(
+            static_map.inside_static(batch_aux.to_array(pth_wp.pos for pth_wp in pth_wps if pth_wp is not None)).tolist()
+        )
+        for idx, hull_check, pth_wp in zip(vfield_ids, vfield_hull_check, pth_wps):
+            if pth_wp is None:
+                continue
+            if next(in_zone) and hull_check:
+                continue
+            self.routes[idx].insert_wp(pth_wp)
+
+    def avoid_ball_routes(self, ids: list[int], fld: field.Field) -> list[int]:
+        """
+        Добавить в маршруты роботов ids объезд зоны вокруг мяча
+
+        Проверки выполняются одним пакетом batch_aux для всех роботов
+        @return номера роботов, маршруты которых дополняются векторным полем
+        """
+        if not ids:
+            return []
+        ball_pos = batch_aux.to_array([fld.ball.get_pos()])[0]
+        self_pos = batch_aux.to_array(fld.allies[idx].get_pos() for idx in ids)
+        dest_pos = batch_aux.to_array(self.routes[idx].get_dest_wp().pos for idx in ids)
+
+        inside = batch_aux.is_point_inside_circle(self_pos, ball_pos, const.KEEP_BALL_DIST)
+        closest_out = batch_aux.nearest_point_on_circle(self_pos, ball_pos, const.KEEP_BALL_DIST)
+        _, crossing = batch_aux.line_circle_intersect(self_pos, dest_pos, ball_pos, const.KEEP_BALL_DIST)
+        crossings = crossing.sum(axis=1)
+
+        # Из двух точек касания выбирается ближайшая к цели, при равенстве - вторая
+        tangents, count = batch_aux.get_tangent_points(ball_pos, self_pos, const.KEEP_BALL_DIST)
+        first = (count == 1) | (batch_aux.dist(tangents[:, 0], dest_pos) < batch_aux.dist(tangents[:, 1], dest_pos))
+        tangent = np.where(first[:, np.newaxis], tangents[:, 0], tangents[:, 1])
+        offset = tangent - ball_pos
+        mag = np.hypot(offset[:, 0], offset[:, 1])
+        detour = tangent + offset / np.where(mag == 0, 1, mag)[:, np.newaxis] * const.ROBOT_R
+
+        vfield: list[int] = []
+        for k, idx in enumerate(ids):
+            angle0 = self.routes[idx].get_dest_wp().angle
+            if inside[k]:
+                self.routes[idx].insert_wp(
+                    wp.Waypoint(aux.Point(*closest_out[k].tolist()), angle0, wp.WType.R_PASSTHROUGH)
                 )
-                if points is None:
+                continue
+            if crossings[k] == 0:
+                continue
+            if crossings[k] == 2:
+                if count[k] == 0:
                     continue
-                if len(points) == 2:
-                    points = aux.get_tangent_points(
-                        fld.ball.get_pos(), self_pos, const.KEEP_BALL_DIST
-                    )
-                    p = aux.Point(0, 0)
-                    if points is None:
-                        continue
-                    if len(points) == 2:
-                        p = (
-                            points[0]
-                            if aux.dist(points[0], dest_pos)
-                            < aux.dist(points[1], dest_pos)
-                            else points[1]
-                        )
-                    else:
-                        p = points[0]
-                    self.routes[idx].insert_wp(
-                        wp.Waypoint(
-                            p + (p - fld.ball.get_pos()).unity() * const.ROBOT_R,
-                            angle0,
-                            wp.WType.R_PASSTHROUGH,
-                        )
-                    )
+                self.routes[idx].insert_wp(wp.Waypoint(aux.Point(*detour[k].tolist()), angle0, wp.WType.R_PASSTHROUGH))
+            vfield.append(idx)
+        return vfield
 
-            pth_wp = self.calc_vector_field(idx, fld)
-            if pth_wp is not None:
-                is_inside = False
-                for goal in [fld.ally_goal, fld.enemy_goal]:
-                    if aux.is_point_inside_poly(pth_wp.pos, goal.big_hull):
-                        is_inside = True
-                        break
-                if not is_inside:
-                    self.routes[idx].insert_wp(pth_wp)
+    def update_costmap(self, fld: field.Field) -> costmap.CostMap:
+        """
+        Обновить карту стоимости: роботов и зону вокруг мяча (если его надо объезжать)
 
-    def calc_vector_field(
-        self, idx: int, fld: field.Field
-    ) -> typing.Optional[wp.Waypoint]:
+        Статический слой пересчитывается только при пересоздании ворот
         """
-        Рассчитать ближайшую промежуточную путевую точку
-        согласно первому приближению векторного поля
+        if self.costmap is None or self._costmap_goal is not fld.ally_goal:
+            self.costmap = costmap.CostMap()
+            goals = [fld.ally_goal] if fld.enemy_goal is fld.ally_goal else [fld.ally_goal, fld.enemy_goal]
+            self.costmap.set_static([goal.big_hull_poly for goal in goals])
+            self._costmap_goal = fld.ally_goal
+
+        self.costmap.update_robots(
+            np.concatenate((fld.b_states.pos, fld.y_states.pos)),
+            np.concatenate((fld.b_states.used, fld.y_states.used)),
+        )
+        self.costmap.update_ball(fld.ball_states.pos[0], self.__avoid_ball)
+        return self.costmap
+
+    def get_obstacles(self, fld: field.Field) -> planner.Obstacles:
         """
-        self_pos = fld.allies[idx].get_pos()
-        target_point = self.routes[idx].get_next_wp()
-        dist = (self_pos - target_point.pos).mag()
+        Получить препятствия для планировщика
 
-        vector_field_threshold = 200
-        if dist < vector_field_threshold:
-            return None
+        Круги - все роботы в порядке fld.all_bots и мяч (если его надо объезжать),
+        полигоны - расширенные штрафные зоны; к препятствиям прикладывается карта стоимости
+        """
+        centers = [fld.b_states.pos, fld.y_states.pos]
+        radii = [np.full(const.ROBOTS_MAX_COUNT, float(const.PLANNER_CLEARANCE))]
+        if self.__avoid_ball:
+            centers.append(fld.ball_states.pos)
+            radii.append(np.array([float(const.KEEP_BALL_DIST)]))
+
+        goals = [fld.ally_goal] if fld.enemy_goal is fld.ally_goal else [fld.ally_goal, fld.enemy_goal]
+        polygons = [goal.big_hull_poly.vertices for goal in goals]
+        return planner.Obstacles(np.concatenate(centers), np.concatenate(radii), polygons, self.costmap)
 
+    def plan_routes(
+        self, ids: list[int], fld: field.Field, obstacles: planner.Obstacles, deadline: typing.Optional[float] = None
+    ) -> set[int]:
+        """
+        Построить маршруты глобальным планировщиком для роботов ids
+
+        Сохраненные пути проверяются последовательно, новые пути строятся пулом
+        исполнителей (если он есть) по одному снимку препятствий и применяются
+        в порядке ids, поэтому результат не зависит от порядка завершения заданий
+        @return номера роботов, маршруты которых построены планировщиком
+        """
+        planned: set[int] = set()
+        if self.pool is None:
+            for idx in ids:
+                replan = deadline is None or time.time() < deadline
+                if self.plan_route(idx, fld, obstacles, replan):
+                    planned.add(idx)
+            return planned
+
+        jobs: list[int] = []
+        requests: list[planning_pool.PlanJob] = []
+        for idx in ids:
+            request = self.get_plan_request(idx, fld, obstacles)
+            if request is None:
+                continue
+            path = self.find_plan(idx, *request, replan=False)
+            if path is not None:
+                self.apply_plan(idx, request[1], path)
+                planned.add(idx)
+            else:
+                jobs.append(idx)
+                requests.append(request)
+
+        if not requests or (deadline is not None and time.time() >= deadline):
+            return planned
+
+        self.replan_count += len(requests)
+        for idx, request, path in zip(jobs, requests, self.pool.plan_all(requests, jobs, deadline)):
+            if self.apply_plan(idx, request[1], path):
+                planned.add(idx)
+        return planned
+
+    def plan_route(self, idx: int, fld: field.Field, obstacles: planner.Obstacles, replan: bool = True) -> bool:
+        """
+        Построить маршрут до следующей путевой точки глобальным планировщиком
+
+        replan - можно ли запускать планировщик, если сохраненный путь не подходит
+        @return False, если маршрут надо строить обычными правилами (робот в штрафной,
+        цель в штрафной, особый тип точки или путь не найден)
+        """
+        request = self.get_plan_request(idx, fld, obstacles)
+        if request is None:
+            return False
+        path = self.find_plan(idx, *request, replan=replan)
+        if path is None and not replan:
+            return False
+        return self.apply_plan(idx, request[1], path)
+
+    def get_plan_request(
+        self, idx: int, fld: field.Field, obstacles: planner.Obstacles
+    ) -> typing.Optional[planning_pool.PlanJob]:
+        """
+        Получить начало, цель и препятствия для планирования маршрута робота idx
+
+        @return None, если маршрут строится обычными правилами
+        """
+        if self.planner is None:
+            return None
         if self.routes[idx].get_dest_wp().type in [
             wp.WType.S_IGNOREOBSTACLES,
             wp.WType.S_BALL_GO,
-            wp.WType.R_IGNORE_GOAl_HULL,
         ]:
+            self.plans[idx] = None
             return None
 
+        self_pos = fld.allies[idx].get_pos()
+        # В сохраненном маршруте следующая точка - точка пути, а цель планирования - конечная
+        target = self.routes[idx].get_dest_wp() if self._plan_in_route[idx] else self.routes[idx].get_next_wp()
+        for goal in [fld.ally_goal, fld.enemy_goal]:
+            if goal.hull_poly.contains(self_pos) or goal.big_hull_poly.contains(target.pos):
+                self.plans[idx] = None
+                return None
+
+        # Не считаем препятствиями самого робота, неиспользуемых роботов
+        # и препятствия, в которых уже находятся начало или конец пути
+        # Роботы, в кругах которых лежат концы пути, берутся из пространственного индекса поля
+        ends = np.array([(self_pos.x, self_pos.y), (target.pos.x, target.pos.y)])
+        bots = const.ROBOTS_MAX_COUNT
+        circles = np.ones(len(obstacles.centers), dtype=bool)
+        circles[:bots] = np.concatenate((fld.b_states.used, fld.y_states.used))
+        ally_offset = 0 if fld.ally_color == const.Color.BLUE else const.TEAM_ROBOTS_MAX_COUNT
+        circles[ally_offset + idx] = False
+        _, covering = fld.index.query_radius_many(ends, np.full(len(ends), const.PLANNER_CLEARANCE - planner.EPS))
+        circles[covering] = False
+        circles[bots:] &= ~obstacles.select(np.arange(len(circles)) >= bots).inside_circles(ends).any(axis=0)
+        polygons = ~obstacles.inside_polygons(ends).any(axis=0)
+
+        request = obstacles.select(circles, polygons)
+        request.ignore = ally_offset + idx
+        return self_pos, target.pos, request
+
+    def find_plan(
+        self, idx: int, self_pos: aux.Point, target: aux.Point, obstacles: planner.Obstacles, replan: bool = True
+    ) -> typing.Optional[list[aux.Point]]:
+        """
+        Получить путь робота idx: сохраненный, если он еще безопасен, иначе новый (если replan)
+        """
+        cached = self.plans[idx]
+        if cached is not None and aux.dist(cached[0], target) < const.REPLAN_TARGET_TOL:
+            path = self.reuse_plan(self_pos, target, cached[1], obstacles)
+            if path is not None:
+                return path
+        if not replan or self.planner is None:
+            return None
+        self.replan_count += 1
+        return self.planner.plan(self_pos, target, obstacles)
+
+    def apply_plan(self, idx: int, target: aux.Point, path: typing.Optional[list[aux.Point]]) -> bool:
+        """
+        Сохранить путь робота idx и добавить его точки в маршрут
+
+        @return False, если путь не найден
+        """
+        if path is None:
+            self.plans[idx] = None
+            return False
+        cached = self.plans[idx]
+        self.plans[idx] = (target, path[1:-1])
+        if self._plan_in_route[idx]:
+            route_angle = self.routes[idx].get_next_wp().angle
+            if cached is not None and cached[1] == path[1:-1] and route_angle == self.routes[idx].get_dest_wp().angle:
+                # Маршрут уже содержит эти точки
+                return True
+            self.routes[idx].clear()
+
+        self._plan_in_route[idx] = self.routes[idx].get_next_wp() is self.routes[idx].get_dest_wp()
+        angle0 = self.routes[idx].get_dest_wp().angle
+        for point in reversed(path[1:-1]):
+            self.routes[idx].insert_wp(wp.Waypoint(point, angle0, wp.WType.R_PASSTHROUGH))
+        return True
+
+    def drop_plan_points(self, idx: int) -> None:
+        """
+        Удалить из маршрута idx точки сохраненного пути, если маршрут строится без него
+        """
+        if self._plan_in_route[idx]:
+            self.routes[idx].clear()
+            self._plan_in_route[idx] = False
+
+    @staticmethod
+    def reuse_plan(
+        self_pos: aux.Point, target: aux.Point, passthrough: list[aux.Point], obstacles: planner.Obstacles
+    ) -> typing.Optional[list[aux.Point]]:
+        """
+        Проверить сохраненный путь на столкновения с актуальными препятствиями
+
+        Пройденные точки отбрасываются: путь продолжается от самой дальней точки, видимой
+        из текущего положения. Если путь стал небезопасен, возвращает None
+        """
+        points = np.array([(p.x, p.y) for p in [*passthrough, target]])
+        visible = np.flatnonzero(obstacles.segments_free(np.array((self_pos.x, self_pos.y)), points))
+        if len(visible) == 0:
+            return None
+        first = int(visible[-1])
+        rest = points[first:]
+        if not obstacles.segments_free(rest[:-1], rest[1:]).all():
+            return None
+        return [self_pos, *passthrough[first:], target]
+
+    def calc_vector_field(
+        self, idx: int, fld: field.Field
+    ) -> typing.Optional[wp.Waypoint]:
+        """
+        Рассчитать ближайшую промежуточную путевую точку
+        согласно первому приближению векторного поля
+        """
+        return self.calc_vector_fields([idx], fld)[0]
+
+    def calc_vector_fields(
+        self, ids: list[int], fld: field.Field
+    ) -> list[typing.Optional[wp.Waypoint]]:
+        """
+        Рассчитать промежуточные путевые точки векторного поля сразу для маршрутов ids
+
+        Мешать маршруту могут только роботы ближе его длины: они берутся из пространственного
+        индекса поля, расстояния до них и до мяча считаются одной операцией над массивами
+        """
+        result: list[typing.Optional[wp.Waypoint]] = [None] * len(ids)
+
+        vector_field_threshold = 200
         sep_dist = 500
         ball_sep_dist = 150
 
-        closest_robot: typing.Any = None
-        closest_dist = dist
-
-        # Расчет теней роботов для векторного поля
-        for r in fld.all_bots:
-            if r.r_id == idx or r.is_used() == 0:
-                continue
-            robot_separation = aux.dist(
-                aux.closest_point_on_line(self_pos, target_point.pos, r.get_pos()),
-                r.get_pos(),
-            )
-            robot_dist = aux.dist(self_pos, r.get_pos())
-            if robot_dist == 0:
-                continue
-            if robot_separation < sep_dist and robot_dist < closest_dist:
-                closest_robot = r
-                closest_dist = robot_dist
-                closest_separation = robot_separation
-        ball_separation = aux.dist(
-            aux.closest_point_on_line(self_pos, target_point.pos, fld.ball.get_pos()),
-            fld.ball.get_pos(),
+        active = [
+            i
+            for i, idx in enumerate(ids)
+            if self.routes[idx].get_dest_wp().type
+            not in [
+                wp.WType.S_IGNOREOBSTACLES,
+                wp.WType.S_BALL_GO,
+                wp.WType.R_IGNORE_GOAl_HULL,
+            ]
+        ]
+        if not active:
+            return result
+
+        route_ids = np.array([ids[i] for i in active])
+        starts = fld.allies_states.pos[route_ids]
+        next_pos = [self.routes[ids[i]].get_next_wp().pos for i in active]
+        ends = np.array([(pos.x, pos.y) for pos in next_pos])
+        seg = ends - starts
+        dist = np.hypot(seg[:, 0], seg[:, 1])
+
+        # Препятствия: роботы обеих команд в порядке индекса поля (fld.all_bots) и мяч
+        team = const.TEAM_ROBOTS_MAX_COUNT
+        obstacles = np.concatenate((fld.b_states.pos, fld.y_states.pos, fld.ball_states.pos))
+        obst_ids = np.concatenate((np.arange(team), np.arange(team), [-1]))
+        obst_sep = np.full(len(obstacles), float(sep_dist))
+        obst_sep[-1] = ball_sep_dist
+
+        # Пары (маршрут, препятствие): роботы внутри круга радиусом длины маршрута и мяч
+        robot_route, robot_obst = fld.index.query_radius_many(starts, np.where(dist < vector_field_threshold, 0, dist))
+        pair_route = np.concatenate((robot_route, np.arange(len(route_ids))))
+        pair_obst = np.concatenate((robot_obst, np.full(len(route_ids), len(obstacles) - 1)))
+
+        rel = obstacles[pair_obst] - starts[pair_route]
+        obst_dist = np.hypot(rel[:, 0], rel[:, 1])
+        pair_seg = seg[pair_route]
+        seg_len2 = np.maximum(dist * dist, 1e-9)[pair_route]
+        proj = np.clip(np.einsum("pk,pk->p", rel, pair_seg) / seg_len2, 0, 1)
+        closest = rel - proj[:, np.newaxis] * pair_seg
+        separation = np.hypot(closest[:, 0], closest[:, 1])
+
+        blocking = (
+            (separation < obst_sep[pair_obst])
+            & (obst_dist < dist[pair_route])
+            & (obst_dist != 0)
+            & (obst_ids[pair_obst] != route_ids[pair_route])
+            & (dist[pair_route] >= vector_field_threshold)
         )
-        ball_dist = aux.dist(self_pos, fld.ball.get_pos())
-        if ball_separation < ball_sep_dist and ball_dist < closest_dist:
-            closest_robot = fld.ball
-            closest_dist = ball_dist
-            closest_separation = ball_separation
-
-        passthrough_wp_pos = target_point.pos - self_pos
-        # angle_cos = aux.scalar_mult((closest_robot.get_pos() - self_pos).unity(),
-        # (target_point.pos - self_pos).unity())
-        if closest_robot is not None and closest_dist != 0:
-            side = aux.vec_mult(
-                closest_robot.get_pos() - self_pos, target_point.pos - self_pos
-            )
-            # offset_angle_val = 200*math.pi/6 * closest_dist**(-2)
-            offset_angle_val = -2 * math.atan(
-                (sep_dist - closest_separation) / (2 * (closest_dist))
-            )
+
+        # Для каждого маршрута - ближайшее мешающее препятствие (при равенстве - с меньшим номером)
+        pairs = np.flatnonzero(blocking)
+        pairs = pairs[np.lexsort((pair_obst[pairs], obst_dist[pairs], pair_route[pairs]))]
+        _, first = np.unique(pair_route[pairs], return_index=True)
+
+        for p in pairs[first].tolist():
+            k = int(pair_route[p])
+            offset_angle_val = -2 * math.atan((sep_dist - separation[p]) / (2 * obst_dist[p]))
+            side = seg[k, 1] * rel[p, 0] - seg[k, 0] * rel[p, 1]
             offset_angle = offset_angle_val if side < 0 else -offset_angle_val
-            passthrough_wp_pos = self_pos + aux.rotate(
-                target_point.pos - self_pos, offset_angle
-            )
+            self_pos = aux.Point(*starts[k].tolist())
+            passthrough_wp_pos = self_pos + aux.rotate(aux.Point(*seg[k].tolist()), offset_angle)
+            result[active[k]] = wp.Waypoint(passthrough_wp_pos, 0, wp.WType.R_PASSTHROUGH)
 
-            passthrough_wp = wp.Waypoint(passthrough_wp_pos, 0, wp.WType.R_PASSTHROUGH)
-        else:
-            passthrough_wp = None
+        return result
 
-        return passthrough_wp
+    def deconflict(
+        self, fld: field.Field, commands: list[typing.Optional[tuple[aux.Point, float]]]
+    ) -> list[typing.Optional[tuple[aux.Point, float]]]:
+        """
+        Согласовать скорости союзных роботов, чтобы они не сталкивались друг с другом
+
+        commands - результаты route.Route.calc_vel для каждого союзника (вектор скорости
+        в командах направлен противоположно скорости робота в координатах поля)
+        Роботы обрабатываются по приоритету: сначала работающие с мячом и вратарь (их
+        скорости не меняются), затем остальные по номерам. Каждый следующий робот выбирает
+        из набора скоростей ту, что ближе всего к желаемой с учетом времени до столкновения
+        (velocity obstacle) с уже согласованными союзниками и остальными роботами,
+        движущимися с текущими скоростями
+        """
+        team = const.TEAM_ROBOTS_MAX_COUNT
+        ally_offset = 0 if fld.ally_color == const.Color.BLUE else team
+
+        # Все роботы в порядке fld.all_bots, союзники с командами получат новые скорости
+        pos = np.concatenate((fld.b_states.pos, fld.y_states.pos))
+        vel = np.concatenate((fld.b_states.vel, fld.y_states.vel))
+        known = np.concatenate((fld.b_states.used, fld.y_states.used))
+
+        agents = [i for i in range(team) if commands[i] is not None and fld.allies[i].is_used()]
+        for i in agents:
+            known[ally_offset + i] = False
+
+        fixed = [
+            i
+            for i in agents
+            if i == fld.gk_id
+            or self.routes[i].get_dest_wp().type
+            in [
+                wp.WType.S_BALL_KICK,
+                wp.WType.S_BALL_KICK_UP,
+                wp.WType.S_BALL_GRAB,
+                wp.WType.S_BALL_GO,
+                wp.WType.S_BALL_PASS,
+                wp.WType.S_STOP,
+            ]
+        ]
+        order = fixed + [i for i in agents if i not in fixed]
+
+        result = list(commands)
+        for i in order:
+            command = commands[i]
+            if command is None:
+                continue
+            row = ally_offset + i
+            pref = -np.array([command[0].x, command[0].y])
+            if i not in fixed:
+                others = np.flatnonzero(known)
+                new_vel = self._select_vel(pos[row], pref, pos[others], vel[others])
+                if new_vel is not None:
+                    result[i] = (aux.Point(*(-new_vel).tolist()), command[1])
+                    pref = new_vel
+            vel[row] = pref
+            known[row] = True
+        return result
+
+    def _select_vel(
+        self, self_pos: np.ndarray, pref: np.ndarray, other_pos: np.ndarray, other_vel: np.ndarray
+    ) -> typing.Optional[np.ndarray]:
+        """
+        Выбрать скорость, ближайшую к желаемой pref с учетом столкновений с другими роботами
+
+        @return новая скорость или None, если желаемая скорость безопасна на горизонте планирования
+        """
+        if len(other_pos) == 0:
+            return None
+        horizon = const.DECONFLICT_HORIZON
+        candidates = np.concatenate((pref[np.newaxis], self._candidates))
+        ttc = _time_to_collision(other_pos - self_pos, candidates, other_vel, 2 * const.ROBOT_R + 50)
+        ttc = ttc.min(axis=1)
+        if ttc[0] > horizon:
+            return None
+        penalty = np.where(ttc > horizon, 0.0, const.DECONFLICT_WEIGHT / np.maximum(ttc, 1e-3))
+        cost = penalty + np.hypot(candidates[:, 0] - pref[0], candidates[:, 1] - pref[1])
+        return candidates[np.argmin(cost)]
 
     def calc_kick_wp(self, idx: int) -> wp.Waypoint:
         """
@@ -316,3 +706,24 @@ class Router:
         Получить маршрут для робота с индексом idx
         """
         return self.routes[idx]
+
+
+def _time_to_collision(
+    rel_pos: np.ndarray, candidates: np.ndarray, other_vel: np.ndarray, radius: float
+) -> np.ndarray:
+    """
+    Рассчитать время до столкновения [K, M] для скоростей-кандидатов [K, 2]
+    с роботами, находящимися в rel_pos [M, 2] и движущимися со скоростями other_vel [M, 2]
+
+    Если столкновения не будет, время равно inf; если роботы уже касаются
+    и сближаются, время равно 0
+    """
+    rel_vel = candidates[:, np.newaxis, :] - other_vel[np.newaxis, :, :]
+    a = np.einsum("kmi,kmi->km", rel_vel, rel_vel)
+    b = np.einsum("mi,kmi->km", rel_pos, rel_vel)
+    c = np.einsum("mi,mi->m", rel_pos, rel_pos) - radius**2
+    disc = b * b - a * c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (b - np.sqrt(np.maximum(disc, 0))) / a
+    ttc = np.where((disc > 0) & (a > 0) & (t >= 0), t, np.inf)
+    return np.where(c < 0, np.where(b > 0, 0.0, np.inf), ttc)
@@ -0,0 +1,116 @@
+"""
+Учет времени такта контроллера
+
+Такт делится на этапы, у каждого этапа свой бюджет времени. Планировщик
+отвечает, успевает ли этап до конца такта, считает превышения бюджетов
+и фактический шаг по времени для регуляторов
+"""
+
+import contextlib
+import time
+import typing
+
+from bridge.processors import const
+
+
+class DeadlineScheduler:
+    """
+    Планировщик этапов такта с крайними сроками
+    """
+
+    def __init__(
+        self,
+        period: float = const.Ts,
+        budgets: typing.Optional[dict[str, float]] = None,
+        max_dt: float = const.MAX_DT,
+    ) -> None:
+        """
+        Конструктор
+
+        period - период такта [с]
+        budgets - бюджеты времени этапов [с]
+        max_dt - ограничение шага по времени для регуляторов после долгой паузы [с]
+        """
+        self.period = period
+        self.budgets = dict(const.STAGE_BUDGETS if budgets is None else budgets)
+        self.max_dt = max_dt
+
+        self.ticks = 0
+        self.tick_overruns = 0  # такты, не уложившиеся в период
+        self.overruns = {name: 0 for name in self.budgets}  # превышения бюджетов этапов
+        self.skips = {name: 0 for name in self.budgets}  # этапы, пропущенные из-за нехватки времени
+        self.worst = {name: 0.0 for name in self.budgets}  # наибольшее время этапов [с]
+
+        self.dt = period
+        self._tick_start: typing.Optional[float] = None
+        self._deadline = 0.0
+
+    def start_tick(self, period: typing.Optional[float] = None) -> float:
+        """
+        Начать такт
+
+        period - длительность этого такта [с], по умолчанию self.period
+        @return фактическое время с начала прошлого такта [с], ограниченное max_dt
+        """
+        now = time.time()
+        if self._tick_start is not None:
+            self.dt = min(max(now - self._tick_start, 0.0), self.max_dt)
+        self._tick_start = now
+        self._deadline = now + (self.period if period is None else period)
+        self.ticks += 1
+        return self.dt
+
+    def end_tick(self) -> bool:
+        """
+        Закончить такт
+
+        @return True, если такт не уложился в период
+        """
+        if time.time() > self._deadline:
+            self.tick_overruns += 1
+            return True
+        return False
+
+    def get_remaining(self) -> float:
+        """
+        Получить время до конца такта [с]
+        """
+        return self._deadline - time.time()
+
+    def get_stage_deadline(self, name: str) -> float:
+        """
+        Получить момент, к которому этап name должен закончиться
+        """
+        return min(time.time() + self.budgets[name], self._deadline)
+
+    def has_time(self, name: str) -> bool:
+        """
+        Проверить, что бюджет этапа name помещается в остаток такта
+
+        Если не помещается, этап считается пропущенным
+        """
+        if self.get_remaining() >= self.budgets[name]:
+            return True
+        self.skips[name] += 1
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> typing.Iterator[None]:
+        """
+        Выполнить этап name, учитывая его время
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            self.worst[name] = max(self.worst[name], elapsed)
+            if elapsed > self.budgets[name]:
+                self.overruns[name] += 1
+
+    def __str__(self) -> str:
+        stages = ", ".join(
+            f"{name}: {self.overruns[name]} over, {self.skips[name]} skip, {self.worst[name] * 1000:.1f} ms"
+            for name in self.budgets
+        )
+        return f"ticks: {self.ticks}, overruns: {self.tick_overruns} ({stages})"
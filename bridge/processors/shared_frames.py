@@ -0,0 +1,109 @@
+"""
+Кадры фиксированного размера в общей памяти с номерами версий
+
+Один процесс пишет кадры по кругу в несколько ячеек, любое количество процессов
+читает последний целиком записанный кадр. Блокировок нет: у каждой ячейки свой номер
+кадра, поэтому читатель замечает, что ячейку перезаписали во время копирования
+
+Раскладка памяти (все числа по 8 байт):
+- номер последнего записанного кадра
+- номера кадров в каждой ячейке (-1 - ячейка сейчас перезаписывается)
+- ячейки с кадрами float64
+"""
+
+import typing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+class SharedFrames:
+    """
+    Кольцо кадров формы shape из slots ячеек
+    """
+
+    def __init__(self, name: str, shape: tuple[int, ...], slots: int, create: bool) -> None:
+        """
+        Конструктор
+
+        create - создать память (писатель) или подключиться к существующей (читатель);
+        при подключении к еще не созданной памяти возникает FileNotFoundError
+        """
+        self.name = name
+        size = 8 * (1 + slots + slots * int(np.prod(shape)))
+        self.is_owner = create
+        if create:
+            try:
+                self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+            except FileExistsError:
+                # Осталась от прошлого запуска
+                self._shm = shared_memory.SharedMemory(name)
+                if self._shm.size < size:
+                    self._shm.close()
+                    self._shm.unlink()
+                    self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name)
+            # Читатель не должен удалять память при своем завершении
+            resource_tracker.unregister(self._shm._name, "shared_memory")  # type: ignore
+
+        buf = self._shm.buf
+        self._head: np.ndarray = np.ndarray((1,), np.int64, buf, 0)
+        self._seqs: np.ndarray = np.ndarray((slots,), np.int64, buf, 8)
+        self._frames: np.ndarray = np.ndarray((slots, *shape), np.float64, buf, 8 * (1 + slots))
+        if create:
+            self._head[0] = 0
+            self._seqs[:] = 0
+
+        self._writing = 0
+        self._last_read = 0
+
+    def begin_write(self) -> np.ndarray:
+        """
+        Начать запись следующего кадра
+
+        @return ячейка кадра в общей памяти (со старым содержимым), заполнять на месте
+        """
+        self._writing = int(self._head[0]) + 1
+        slot = self._writing % len(self._seqs)
+        self._seqs[slot] = -1
+        return self._frames[slot]
+
+    def end_write(self) -> int:
+        """
+        Закончить запись кадра, начатую begin_write, и сделать его доступным читателям
+
+        @return номер записанного кадра
+        """
+        seq = self._writing
+        self._seqs[seq % len(self._seqs)] = seq
+        self._head[0] = seq
+        return seq
+
+    def read(self, out: np.ndarray) -> typing.Optional[int]:
+        """
+        Скопировать в out последний кадр, если он новее прочитанного ранее
+
+        @return номер кадра или None, если нового целого кадра нет
+        """
+        seq = int(self._head[0])
+        if seq == self._last_read:
+            return None
+        slot = seq % len(self._seqs)
+        if self._seqs[slot] != seq:
+            return None
+        np.copyto(out, self._frames[slot])
+        # Кадр мог быть перезаписан во время копирования
+        if self._seqs[slot] != seq:
+            return None
+        self._last_read = seq
+        return seq
+
+    def close(self) -> None:
+        """
+        Отключиться от памяти (и удалить ее, если она создана этим объектом)
+        """
+        del self._head, self._seqs, self._frames
+        self._shm.close()
+        if self.is_owner:
+            self._shm.unlink()
@@ -0,0 +1,170 @@
+"""
+Пространственный индекс для быстрого поиска ближайших роботов
+
+Равномерная сетка по положениям точек; перестраивается один раз за тик
+после обновления данных со зрения
+"""
+
+import math
+import typing
+
+import numpy as np
+
+from bridge.processors import const
+
+
+class SpatialIndex:
+    """
+    Индекс точек на равномерной сетке
+    """
+
+    def __init__(self, cell_size: float = const.SPATIAL_CELL_SIZE) -> None:
+        """
+        Конструктор
+
+        cell_size - размер ячейки сетки [мм]
+        """
+        self._cell = cell_size
+        self.points = np.zeros((0, 2))
+        self._cells: dict[tuple[int, int], np.ndarray] = {}
+        self._bounds = (0, 0, -1, -1)
+        # Индексированные точки и их ячейки для пакетных запросов
+        self._ids = np.zeros(0, dtype=np.intp)
+        self._point_cells = np.zeros((0, 2), dtype=np.int64)
+
+    def build(self, points: np.ndarray, valid: typing.Optional[np.ndarray] = None) -> None:
+        """
+        Построить индекс по точкам points [N, 2]; точки с valid == False не индексируются
+
+        Индексы, возвращаемые запросами, - номера строк points
+        """
+        self.points = np.asarray(points, dtype=float)
+        ids = np.arange(len(self.points))
+        if valid is not None:
+            ids = ids[valid]
+
+        cells = np.floor(self.points[ids] / self._cell).astype(np.int64)
+        self._ids = ids
+        self._point_cells = cells
+        self._cells = {}
+        if len(ids) == 0:
+            self._bounds = (0, 0, -1, -1)
+            return
+        keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        splits = np.searchsorted(inverse[order], np.arange(1, len(keys)))
+        for key, members in zip(keys.tolist(), np.split(ids[order], splits)):
+            self._cells[(key[0], key[1])] = members
+        mins = cells.min(axis=0).tolist()
+        maxs = cells.max(axis=0).tolist()
+        self._bounds = (mins[0], mins[1], maxs[0], maxs[1])
+
+    def _gather(self, x_min: int, y_min: int, x_max: int, y_max: int) -> np.ndarray:
+        """
+        Получить индексы точек в прямоугольнике ячеек
+        """
+        b_x_min, b_y_min, b_x_max, b_y_max = self._bounds
+        x_min, y_min = max(x_min, b_x_min), max(y_min, b_y_min)
+        x_max, y_max = min(x_max, b_x_max), min(y_max, b_y_max)
+        if (x_max - x_min + 1) * (y_max - y_min + 1) > len(self._cells):
+            # Прямоугольник больше числа занятых ячеек: быстрее перебрать занятые
+            found = [members for (cx, cy), members in self._cells.items() if x_min <= cx <= x_max and y_min <= cy <= y_max]
+        else:
+            found = [
+                self._cells[(cx, cy)]
+                for cx in range(x_min, x_max + 1)
+                for cy in range(y_min, y_max + 1)
+                if (cx, cy) in self._cells
+            ]
+        if not found:
+            return np.zeros(0, dtype=np.intp)
+        return np.concatenate(found)
+
+    def _ring(self, cx: int, cy: int, ring: int) -> np.ndarray:
+        """
+        Получить индексы точек в ячейках на расстоянии ring (по Чебышеву) от ячейки (cx, cy)
+        """
+        if ring == 0:
+            return self._gather(cx, cy, cx, cy)
+        parts = [
+            self._gather(cx - ring, cy - ring, cx + ring, cy - ring),
+            self._gather(cx - ring, cy + ring, cx + ring, cy + ring),
+            self._gather(cx - ring, cy - ring + 1, cx - ring, cy + ring - 1),
+            self._gather(cx + ring, cy - ring + 1, cx + ring, cy + ring - 1),
+        ]
+        return np.concatenate(parts)
+
+    def query_radius(self, point: tuple[float, float], radius: float) -> np.ndarray:
+        """
+        Получить индексы точек, лежащих ближе radius к point, в порядке возрастания расстояния
+        """
+        px, py = point
+        ids = self._gather(
+            math.floor((px - radius) / self._cell),
+            math.floor((py - radius) / self._cell),
+            math.floor((px + radius) / self._cell),
+            math.floor((py + radius) / self._cell),
+        )
+        dist = np.hypot(self.points[ids, 0] - px, self.points[ids, 1] - py)
+        inside = dist < radius
+        ids, dist = ids[inside], dist[inside]
+        return ids[np.argsort(dist, kind="stable")]
+
+    def query_radius_many(self, points: np.ndarray, radii: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Найти для каждой из точек points [Q, 2] точки индекса, лежащие ближе radii [Q]
+
+        Отбор по ячейкам и проверка расстояний делаются для всех запросов одной операцией
+        @return (queries, ids) - пары номеров запроса и точки индекса, упорядоченные по запросам
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        radii = np.asarray(radii, dtype=float).reshape(-1)
+        low = np.floor((points - radii[:, np.newaxis]) / self._cell)
+        high = np.floor((points + radii[:, np.newaxis]) / self._cell)
+        candidates = np.all(
+            (self._point_cells[np.newaxis] >= low[:, np.newaxis]) & (self._point_cells[np.newaxis] <= high[:, np.newaxis]),
+            axis=2,
+        )
+        delta = self.points[self._ids][np.newaxis] - points[:, np.newaxis]
+        found = candidates & (np.hypot(delta[..., 0], delta[..., 1]) < radii[:, np.newaxis])
+        queries, members = np.nonzero(found)
+        return queries, self._ids[members]
+
+    def query_knn(self, point: tuple[float, float], k: int, allowed: typing.Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Получить индексы k ближайших к point точек (или меньше, если точек не хватает)
+
+        allowed - маска [N] точек, которые можно возвращать
+        """
+        if not self._cells or k <= 0:
+            return np.zeros(0, dtype=np.intp)
+        px, py = point
+        cx, cy = math.floor(px / self._cell), math.floor(py / self._cell)
+        b_x_min, b_y_min, b_x_max, b_y_max = self._bounds
+        max_ring = max(cx - b_x_min, b_x_max - cx, cy - b_y_min, b_y_max - cy, 0)
+
+        found: list[np.ndarray] = []
+        count = 0
+        ids = np.zeros(0, dtype=np.intp)
+        dist = np.zeros(0)
+        for ring in range(max_ring + 1):
+            ring_ids = self._ring(cx, cy, ring)
+            if allowed is not None:
+                ring_ids = ring_ids[allowed[ring_ids]]
+            if len(ring_ids) != 0:
+                found.append(ring_ids)
+                count += len(ring_ids)
+            if count < k:
+                continue
+            ids = np.concatenate(found)
+            dist = np.hypot(self.points[ids, 0] - px, self.points[ids, 1] - py)
+            # Все точки ближе ring * cell уже просмотрены
+            if np.partition(dist, k - 1)[k - 1] <= ring * self._cell:
+                break
+        else:
+            if not found:
+                return np.zeros(0, dtype=np.intp)
+            ids = np.concatenate(found)
+            dist = np.hypot(self.points[ids, 0] - px, self.points[ids, 1] - py)
+        return ids[np.argsort(dist, kind="stable")[:k]]
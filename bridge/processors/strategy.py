@@ -16,6 +16,7 @@ import bridge.processors.auxiliary as aux
 import bridge.processors.const as const
 import bridge.processors.drawing as draw
 import bridge.processors.field as fld
+import bridge.processors.log as log
 import bridge.processors.ref_states as refs
 import bridge.processors.robot as robot
 import bridge.processors.waypoint as wp
@@ -24,6 +25,8 @@ from bridge.processors.referee_state_processor import Color as ActiveTeam
 
 from bridge.easy_strategy import easy_run
 
+logger = log.get_logger("strategy")
+
 
 class States(Enum):
     """Класс с глобальными состояниями игры"""
@@ -90,8 +93,7 @@ class Strategy:
         if self.game_status != GameStates.PENALTY:
             self.refs.is_started = 0
 
-        print("-" * 32)
-        print(self.game_status, "\twe_active:", self.we_active)
+        logger.debug("game state: %s, we_active: %s", self.game_status, self.we_active)
         if self.game_status == GameStates.RUN or 1:  ##########NOTE
             self.run(field, waypoints)
         else:
@@ -226,7 +228,7 @@ class Strategy:
         """Удар мяча из аута"""
         self.put_kickoff_waypoints(field, waypoints)
         # self.we_kick = 1
-        go_kick = fld.find_nearest_robot(field.ball.get_pos(), field.allies)
+        go_kick = field.find_nearest_ally(field.ball.get_pos())
         if self.we_kick:
             self.attacker(field, waypoints, go_kick.r_id)
         else:
@@ -1,12 +1,29 @@
 """
 Динамические звенья и регуляторы
+
+Все звенья принимают фактическое время с прошлого вызова (dt) и используют точную
+дискретизацию (при входе, постоянном на шаге), поэтому работают с любым и переменным
+периодом. FOLPBank обрабатывает сразу count одинаковых фильтров массивами NumPy
 """
 
 import math
+import typing
 from enum import Enum, auto
 
+import numpy as np
+
 import bridge.processors.auxiliary as aux
 
+Index = typing.Union[int, slice, np.ndarray]
+
+
+def get_decay(t: float, dt: float) -> float:
+    """
+    Получить долю, на которую звено первого порядка с постоянной времени t
+    приближается ко входу за время dt: 1 - exp(-dt / t)
+    """
+    return -math.expm1(-dt / t)
+
 
 class FOD:
     """
@@ -26,13 +43,14 @@ class FOD:
         self._out = 0.0
         self._is_angle = is_angle
 
-    def process(self, x: float) -> float:
+    def process(self, x: float, dt: typing.Optional[float] = None) -> float:
         """
         Рассчитать и получить следующее значение выхода звена
 
         ВЫЗЫВАТЬ РАЗ В ПЕРИОД КВАНТВАНИЯ
 
         x - новое значение входа
+        dt - фактическое время с прошлого вызова (по умолчанию период квантования)
         """
         err = x - self._int
         if self._is_angle:
@@ -43,7 +61,7 @@ class FOD:
                 err += 2 * math.pi
                 self._int -= 2 * math.pi
         self._out = err / self._t
-        self._int += self._out * self._ts
+        self._int += err * get_decay(self._t, self._ts if dt is None else dt)
         return self._out
 
     def get_val(self) -> float:
@@ -67,20 +85,18 @@ class FOLP:
         """
         self._t = T
         self._ts = Ts
-        self._int = 0.0
         self._out = 0.0
 
-    def process(self, x: float) -> float:
+    def process(self, x: float, dt: typing.Optional[float] = None) -> float:
         """
         Рассчитать и получить следующее значение выхода звена
 
         ВЫЗЫВАТЬ РАЗ В ПЕРИОД КВАНТВАНИЯ
 
         x - новое значение входа
+        dt - фактическое время с прошлого вызова (по умолчанию период квантования)
         """
-        err = x - self._out
-        self._int += err * self._ts
-        self._out = self._int / self._t
+        self._out += (x - self._out) * get_decay(self._t, self._ts if dt is None else dt)
         return self._out
 
     def get_val(self) -> float:
@@ -109,17 +125,19 @@ class Integrator:
         """
         Сбросить значение интегратора
         """
-        self._int = 0
+        self._int = 0.0
+        self._out = 0.0
 
-    def process(self, x: float) -> float:
+    def process(self, x: float, dt: typing.Optional[float] = None) -> float:
         """
         Рассчитать и получить следующее значение выхода звена
 
         ВЫЗЫВАТЬ РАЗ В ПЕРИОД КВАНТВАНИЯ
 
         x - новое значение входа
+        dt - фактическое время с прошлого вызова (по умолчанию период квантования)
         """
-        self._int += x * self._ts
+        self._int += x * (self._ts if dt is None else dt)
         self._out = self._int
         return self._out
 
@@ -190,9 +208,11 @@ class PISD:
             self.__max_out[self.__mode.value],
         )
 
-    def process(self, xerr: float, x_i: float) -> float:
+    def process(self, xerr: float, x_i: float, dt: typing.Optional[float] = None) -> float:
         """
         Рассчитать следующий тик регулятора
+
+        dt - фактическое время с прошлого вызова (по умолчанию период квантования)
         """
         gain, k_d, k_i, max_out = self.__get_gains()
 
@@ -202,7 +222,7 @@ class PISD:
         u_clipped = aux.minmax(u, max_out)
 
         if u != u_clipped:
-            self.__int.process(xerr + k_d * x_i)
+            self.__int.process(xerr + k_d * x_i, dt)
 
         self.__out = u_clipped
         return self.__out
@@ -224,16 +244,17 @@ class RateLimiter:
         Конструктор
         """
         self.__out = 0.0
-        self.__int = Integrator(Ts)
-        self.__k = 1 / Ts
+        self.__ts = Ts
         self.__max_der = max_der
 
-    def process(self, x: float) -> float:
+    def process(self, x: float, dt: typing.Optional[float] = None) -> float:
         """
         Рассчитать следующий тик звена
+
+        dt - фактическое время с прошлого вызова (по умолчанию период квантования)
         """
-        u = aux.minmax(self.__k * (x - self.__out), self.__max_der)
-        self.__out = self.__int.process(u)
+        dt = self.__ts if dt is None else dt
+        self.__out += aux.minmax(x - self.__out, self.__max_der * dt)
         return self.__out
 
     def get_val(self) -> float:
@@ -241,3 +262,34 @@ class RateLimiter:
         Получить последнее значение выхода звена без расчета
         """
         return self.__out
+
+
+class FOLPBank:
+    """
+    Набор из count фильтров низких частот первого порядка (см. FOLP)
+    """
+
+    def __init__(self, count: int, T: typing.Union[float, np.ndarray], Ts: float) -> None:
+        """
+        Конструктор
+
+        T - постоянная времени ФНЧ (общая или [count])
+        """
+        self._t = np.broadcast_to(np.asarray(T, dtype=float), (count,)).copy()
+        self._ts = Ts
+        self._out = np.zeros(count)
+
+    def process(self, x: np.ndarray, dt: typing.Optional[float] = None, idx: Index = slice(None)) -> np.ndarray:
+        """
+        Рассчитать следующие значения выходов фильтров idx по входам x
+        """
+        dt = self._ts if dt is None else dt
+        out = self._out[idx]
+        self._out[idx] = out - (x - out) * np.expm1(-dt / self._t[idx])
+        return self._out[idx]
+
+    def get_val(self) -> np.ndarray:
+        """
+        Получить последние значения выходов фильтров без расчета
+        """
+        return self._out
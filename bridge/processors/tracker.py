@@ -0,0 +1,146 @@
+"""
+Фильтр Калмана для оценки скоростей и ускорений объектов на поле
+
+Каждый объект описывается по осям x, y и углу состоянием [положение, скорость, ускорение]
+(модель постоянного ускорения с белым шумом рывка). Все объекты обрабатываются
+одними матричными операциями NumPy, шаг по времени у каждого объекта свой
+"""
+
+import math
+import typing
+
+import numpy as np
+
+from bridge.processors import const
+
+AXES = 3  # x, y, угол
+ORDER = 3  # положение, скорость, ускорение
+
+Index = typing.Union[int, np.ndarray]
+
+
+class KalmanTracker:
+    """
+    Батчевый фильтр Калмана для count объектов
+    """
+
+    # Если объект не обновлялся дольше, фильтр для него запускается заново [с]
+    RESET_TIMEOUT = 0.5
+
+    def __init__(self, count: int, meas_noise: typing.Sequence[float], jerk: typing.Sequence[float]) -> None:
+        """
+        Конструктор
+
+        meas_noise - СКО шума измерения по осям x, y, угол
+        jerk - характерный рывок по осям x, y, угол (задает шум процесса)
+        """
+        self.count = count
+        self.x = np.zeros((count, AXES, ORDER))
+        self.p = np.zeros((count, AXES, ORDER, ORDER))
+        self.t = np.zeros(count)
+        self.initialized = np.zeros(count, dtype=bool)
+
+        self._r = np.tile(np.square(np.asarray(meas_noise, dtype=float)), (count, 1))
+        self._q = np.tile(np.square(np.asarray(jerk, dtype=float)), (count, 1))
+
+    def set_noise(self, idx: Index, meas_noise: typing.Sequence[float], jerk: typing.Sequence[float]) -> None:
+        """
+        Задать параметры шумов для объектов idx
+        """
+        self._r[idx] = np.square(np.asarray(meas_noise, dtype=float))
+        self._q[idx] = np.square(np.asarray(jerk, dtype=float))
+
+    def update(self, idx: Index, z: np.ndarray, t: float) -> None:
+        """
+        Выполнить шаг фильтра для объектов idx по измерениям z [len(idx), 3] (x, y, угол) в момент t
+        """
+        rows = np.atleast_1d(idx)
+        z = np.asarray(z, dtype=float).reshape(len(rows), AXES)
+
+        dt = t - self.t[rows]
+        fresh = ~self.initialized[rows] | (dt > self.RESET_TIMEOUT) | (dt < 0)
+        if fresh.any():
+            self._init(rows[fresh], z[fresh], t)
+            rows, z, dt = rows[~fresh], z[~fresh], dt[~fresh]
+            if len(rows) == 0:
+                return
+
+        x = self.x[rows]
+        p = self.p[rows]
+
+        # Прогноз
+        f = _transition(dt)
+        x = np.einsum("nij,naj->nai", f, x)
+        p = np.einsum("nij,najk,nlk->nail", f, p, f) + self._q[rows][:, :, None, None] * _jerk_cov(dt)[:, None]
+
+        # Коррекция по измерению положения
+        innov = z - x[:, :, 0]
+        innov[:, 2] = _wind_down(innov[:, 2])
+        s = p[:, :, 0, 0] + self._r[rows]
+        gain = p[:, :, :, 0] / s[:, :, None]
+        x += gain * innov[:, :, None]
+        p -= gain[:, :, :, None] * p[:, :, None, 0, :]
+        x[:, 2, 0] = _wind_down(x[:, 2, 0])
+
+        self.x[rows] = x
+        self.p[rows] = p
+        self.t[rows] = t
+
+    def _init(self, idx: np.ndarray, z: np.ndarray, t: float) -> None:
+        """
+        Запустить фильтр для объектов idx с нулевыми скоростями
+        """
+        self.x[idx] = 0
+        self.x[idx, :, 0] = z
+        self.p[idx] = 0
+        self.p[idx, :, 0, 0] = self._r[idx]
+        self.p[idx, :, 1, 1] = const.MAX_SPEED**2
+        self.p[idx, :, 2, 2] = (10 * const.MAX_SPEED) ** 2
+        self.t[idx] = t
+        self.initialized[idx] = True
+
+    def get_vel(self, idx: Index) -> np.ndarray:
+        """
+        Получить оценки скоростей [..., 3] по осям x, y, угол
+        """
+        return self.x[idx, :, 1]
+
+    def get_acc(self, idx: Index) -> np.ndarray:
+        """
+        Получить оценки ускорений [..., 3] по осям x, y, угол
+        """
+        return self.x[idx, :, 2]
+
+
+def _transition(dt: np.ndarray) -> np.ndarray:
+    """
+    Матрицы перехода модели постоянного ускорения [len(dt), 3, 3]
+    """
+    f = np.zeros((len(dt), ORDER, ORDER))
+    f[:, 0, 0] = f[:, 1, 1] = f[:, 2, 2] = 1
+    f[:, 0, 1] = f[:, 1, 2] = dt
+    f[:, 0, 2] = dt**2 / 2
+    return f
+
+
+def _jerk_cov(dt: np.ndarray) -> np.ndarray:
+    """
+    Ковариации шума процесса для белого шума рывка единичной интенсивности [len(dt), 3, 3]
+    """
+    dt2 = dt * dt
+    dt3 = dt2 * dt
+    q = np.empty((len(dt), ORDER, ORDER))
+    q[:, 0, 0] = dt3 * dt2 / 20
+    q[:, 0, 1] = q[:, 1, 0] = dt2 * dt2 / 8
+    q[:, 0, 2] = q[:, 2, 0] = dt3 / 6
+    q[:, 1, 1] = dt3 / 3
+    q[:, 1, 2] = q[:, 2, 1] = dt2 / 2
+    q[:, 2, 2] = dt
+    return q
+
+
+def _wind_down(angle: np.ndarray) -> np.ndarray:
+    """
+    Привести углы к диапазону [-pi, pi)
+    """
+    return (angle + math.pi) % (2 * math.pi) - math.pi
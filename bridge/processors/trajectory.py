@@ -0,0 +1,131 @@
+"""
+Траектории движения по маршруту с ограничением скорости и ускорения
+
+Путь по ломаной из путевых точек параметризуется по времени трапецеидальным
+профилем скорости: разгон, движение с максимальной скоростью, торможение до нуля
+"""
+
+import math
+
+import numpy as np
+
+from bridge.processors import const
+
+
+class TrapezoidProfile:
+    """
+    Одномерный трапецеидальный профиль скорости
+
+    Начинается со скорости v0 и заканчивается остановкой через length мм
+    """
+
+    def __init__(self, length: float, v0: float, v_max: float, a_max: float) -> None:
+        """
+        Конструктор
+
+        length - длина пути [мм]
+        v0 - начальная скорость вдоль пути [мм/с]
+        v_max - максимальная скорость [мм/с]
+        a_max - максимальное ускорение [мм/с^2]
+        """
+        self.length = max(length, 0.0)
+        self.v0 = max(v0, 0.0)
+        self._acc = a_max
+        self._dec = a_max
+
+        if self.length == 0:
+            self.v0 = self.v_peak = 0.0
+            self._t1 = self._t2 = self._t3 = 0.0
+            self._d1 = self._d2 = 0.0
+            return
+
+        if self.v0**2 / (2 * a_max) >= self.length:
+            # Остановиться вовремя не успеваем - тормозим сильнее
+            self.v_peak = self.v0
+            self._dec = self.v0**2 / (2 * self.length)
+            self._d1 = self._d2 = 0.0
+        else:
+            self.v_peak = min(v_max, math.sqrt(a_max * self.length + self.v0**2 / 2))
+            self._d1 = abs(self.v_peak**2 - self.v0**2) / (2 * a_max)
+            self._d2 = self.length - self._d1 - self.v_peak**2 / (2 * a_max)
+        if self.v0 > self.v_peak:
+            self._acc = -a_max
+
+        self._t1 = (self.v_peak - self.v0) / self._acc
+        self._t2 = self._d2 / self.v_peak
+        self._t3 = self.v_peak / self._dec
+
+    def get_duration(self) -> float:
+        """
+        Получить время движения по профилю [с]
+        """
+        return self._t1 + self._t2 + self._t3
+
+    def sample(self, t: float) -> tuple[float, float]:
+        """
+        Получить пройденный путь [мм] и скорость [мм/с] в момент t [с] от начала профиля
+        """
+        if t <= 0:
+            return 0.0, self.v0
+        if t < self._t1:
+            return self.v0 * t + self._acc * t**2 / 2, self.v0 + self._acc * t
+        t -= self._t1
+        if t < self._t2:
+            return self._d1 + self.v_peak * t, self.v_peak
+        t -= self._t2
+        if t < self._t3:
+            return self._d1 + self._d2 + self.v_peak * t - self._dec * t**2 / 2, self.v_peak - self._dec * t
+        return self.length, 0.0
+
+
+class PathTrajectory:
+    """
+    Траектория вдоль ломаной с трапецеидальным профилем скорости
+    """
+
+    def __init__(
+        self,
+        points: np.ndarray,
+        v0: float = 0.0,
+        v_max: float = const.MAX_SPEED,
+        a_max: float = const.MAX_ACC,
+    ) -> None:
+        """
+        Конструктор
+
+        points - вершины ломаной [N, 2], первая - начальное положение робота
+        v0 - начальная скорость вдоль первого отрезка [мм/с]
+        """
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        seg = np.diff(self.points, axis=0)
+        seg_len = np.hypot(seg[:, 0], seg[:, 1])
+        self._dirs = seg / np.maximum(seg_len, 1e-9)[:, np.newaxis]
+        self._cum = np.concatenate(([0.0], np.cumsum(seg_len)))
+        self.profile = TrapezoidProfile(float(self._cum[-1]), v0, v_max, a_max)
+
+    def get_duration(self) -> float:
+        """
+        Получить время движения по траектории [с]
+        """
+        return self.profile.get_duration()
+
+    def sample(self, t: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Получить опорные положение [мм] и скорость [мм/с] в момент t [с] от начала траектории
+        """
+        s, v = self.profile.sample(t)
+        if len(self._dirs) == 0:
+            return self.points[0].copy(), np.zeros(2)
+        k = int(np.clip(np.searchsorted(self._cum, s, side="right") - 1, 0, len(self._dirs) - 1))
+        pos = self.points[k] + self._dirs[k] * (s - self._cum[k])
+        return pos, self._dirs[k] * v
+
+    def follows(self, points: np.ndarray, tol: float) -> bool:
+        """
+        Проверить, что оставшиеся точки маршрута points [K, 2] совпадают с концом траектории
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 0 or len(points) >= len(self.points):
+            return False
+        delta = self.points[-len(points) :] - points
+        return bool(np.all(np.hypot(delta[:, 0], delta[:, 1]) < tol))
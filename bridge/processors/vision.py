@@ -0,0 +1,294 @@
+"""
+Обработка пакетов SSL-Vision: объединение детекций с нескольких камер
+"""
+
+import math
+import typing
+
+import numpy as np
+from strategy_bridge.pb.messages_robocup_ssl_wrapper_pb2 import SSL_WrapperPacket
+
+import bridge.processors.auxiliary as aux
+from bridge.processors import const, field
+
+# Столбцы таблицы сумм детекций
+_SUM_X, _SUM_Y, _SUM_SIN, _SUM_COS, _COUNT = range(5)
+
+TEAM_INDEX = {const.Color.BLUE: 0, const.Color.YELLOW: 1}
+
+
+class VisionDecoder:
+    """
+    Разбор пакетов SSL_WrapperPacket
+
+    Каждый пакет разбирается один раз, из нескольких кадров одной камеры
+    остается только самый свежий, геометрия поля применяется только при изменении
+    """
+
+    def __init__(self) -> None:
+        """
+        Конструктор
+        """
+        self._geometry: typing.Optional[tuple[float, float]] = None
+
+    def decode(self, packets: typing.Iterable[bytes]) -> list[typing.Any]:
+        """
+        Разобрать пакеты и получить последний кадр (SSL_DetectionFrame) каждой камеры
+        """
+        frames: dict[int, typing.Any] = {}
+        for raw in packets:
+            packet = SSL_WrapperPacket.FromString(raw)
+            if packet.HasField("geometry"):
+                self.update_geometry(packet.geometry)
+            if not packet.HasField("detection"):
+                continue
+            detection = packet.detection
+            last = frames.get(detection.camera_id)
+            if last is None or detection.t_capture >= last.t_capture:
+                frames[detection.camera_id] = detection
+        return list(frames.values())
+
+    def update_geometry(self, geometry: typing.Any) -> bool:
+        """
+        Применить геометрию поля (SSL_GeometryData), если она изменилась
+
+        @return True, если геометрия изменилась
+        """
+        field_length = geometry.field.field_length
+        goal_width = geometry.field.goal_width
+        if field_length == 0 or goal_width == 0 or self._geometry == (field_length, goal_width):
+            return False
+        self._geometry = (field_length, goal_width)
+        const.GOAL_DX = field_length / 2
+        const.GOAL_DY = goal_width
+        return True
+
+
+class CameraBuffer:
+    """
+    Буфер последних кадров камер
+
+    Хранит только самый свежий кадр каждой камеры и оценивает смещение между
+    часами SSL-Vision (t_capture) и локальными часами. Каждый кадр выдается
+    один раз, чтобы фильтр положения не получал одно измерение повторно
+    """
+
+    # Скорость, с которой оценка смещения часов может расти [с/кадр]
+    OFFSET_DRIFT = 1e-4
+
+    def __init__(self, max_age: float = const.VISION_MAX_FRAME_AGE) -> None:
+        """
+        Конструктор
+
+        max_age - максимальная задержка кадра относительно текущего момента [с]
+        """
+        self._max_age = max_age
+        self._frames: dict[int, typing.Any] = {}
+        # t_capture последнего выданного кадра каждой камеры
+        self._used: dict[int, float] = {}
+        self._offset: typing.Optional[float] = None
+
+    def reset(self) -> None:
+        """
+        Забыть кадры всех камер и оценку смещения часов
+        """
+        self._frames.clear()
+        self._used.clear()
+        self._offset = None
+
+    def push(self, frames: typing.Iterable[typing.Any], t: float) -> None:
+        """
+        Добавить новые кадры (SSL_DetectionFrame), принятые в момент t
+        """
+        for frame in frames:
+            last = self._frames.get(frame.camera_id)
+            if last is not None and frame.t_capture <= last.t_capture:
+                if frame.t_capture >= last.t_capture - self._max_age:
+                    continue
+                # Часы SSL-Vision перешли назад (перезапуск): старые кадры и смещение
+                # остальных камер относятся к прежним часам
+                self.reset()
+            self._frames[frame.camera_id] = frame
+
+            # Минимальная наблюдаемая задержка, медленно растущая на случай дрейфа часов
+            offset = t - frame.t_capture
+            if self._offset is None or offset < self._offset:
+                self._offset = offset
+            else:
+                self._offset += min(offset - self._offset, self.OFFSET_DRIFT)
+
+    def get_frames(self, t: float) -> list[tuple[typing.Any, float]]:
+        """
+        Получить еще не выданные актуальные кадры камер и их задержку относительно момента t [с]
+        """
+        if self._offset is None:
+            return []
+        frames = []
+        for camera_id, frame in self._frames.items():
+            if frame.t_capture <= self._used.get(camera_id, -math.inf):
+                continue
+            self._used[camera_id] = frame.t_capture
+            delay = t - (frame.t_capture + self._offset)
+            if delay <= self._max_age:
+                frames.append((frame, max(delay, 0.0)))
+        return frames
+
+
+class VisionAggregator:
+    """
+    Накопитель детекций роботов и мяча за один тик
+
+    Для каждого робота копит сумму координат, синусов и косинусов углов и число
+    детекций, после чего усредняет положения всех роботов за один проход
+    """
+
+    def __init__(self) -> None:
+        """
+        Конструктор
+        """
+        self._robots = np.zeros((len(TEAM_INDEX), const.TEAM_ROBOTS_MAX_COUNT, 5))
+        self._ball = np.zeros(3)
+
+        # Скорости объектов для экстраполяции детекций на момент тика
+        self._robots_vel = np.zeros((len(TEAM_INDEX), const.TEAM_ROBOTS_MAX_COUNT, 2))
+        self._robots_anglevel = np.zeros((len(TEAM_INDEX), const.TEAM_ROBOTS_MAX_COUNT))
+        self._ball_vel = np.zeros(2)
+
+    def reset(self) -> None:
+        """
+        Очистить накопленные детекции
+        """
+        self._robots.fill(0)
+        self._ball.fill(0)
+
+    def set_motion(self, fld: field.Field) -> None:
+        """
+        Запомнить текущие скорости объектов поля для экстраполяции детекций
+        """
+        for color, team_idx in TEAM_INDEX.items():
+            states = fld.get_team_states(color)
+            launched = states.launched
+            self._robots_vel[team_idx] = states.vel * launched[:, np.newaxis]
+            self._robots_anglevel[team_idx] = states.anglevel * launched
+        self._ball_vel[:] = fld.ball_states.vel[0] * fld.ball_states.launched[0]
+
+    def add_detection(self, detection: typing.Any, delay: float = 0.0) -> None:
+        """
+        Добавить детекции из SSL_DetectionFrame
+
+        delay - задержка кадра относительно момента тика [с], детекции экстраполируются на нее
+        """
+        ball_shift = self._ball_vel * delay
+        for ball in detection.balls:
+            self._ball += (ball.x + ball_shift[0], ball.y + ball_shift[1], 1)
+        self.add_robots(const.Color.BLUE, detection.robots_blue, delay)
+        self.add_robots(const.Color.YELLOW, detection.robots_yellow, delay)
+
+    def add_robots(self, color: const.Color, robots: typing.Sequence[typing.Any], delay: float = 0.0) -> None:
+        """
+        Добавить детекции роботов команды color (SSL_DetectionRobot)
+        """
+        count = len(robots)
+        if count == 0:
+            return
+        det = np.fromiter(
+            (val for r in robots for val in (r.robot_id, r.x, r.y, r.orientation)),
+            dtype=float,
+            count=4 * count,
+        ).reshape(count, 4)
+        ids = det[:, 0].astype(np.intp)
+        valid = (ids >= 0) & (ids < const.TEAM_ROBOTS_MAX_COUNT)
+        if not valid.all():
+            ids, det = ids[valid], det[valid]
+
+        team_idx = TEAM_INDEX[color]
+        if delay != 0:
+            det[:, 1:3] += self._robots_vel[team_idx, ids] * delay
+            det[:, 3] += self._robots_anglevel[team_idx, ids] * delay
+
+        rows = np.empty((len(ids), 5))
+        rows[:, _SUM_X] = det[:, 1]
+        rows[:, _SUM_Y] = det[:, 2]
+        rows[:, _SUM_SIN] = np.sin(det[:, 3])
+        rows[:, _SUM_COS] = np.cos(det[:, 3])
+        rows[:, _COUNT] = 1
+        np.add.at(self._robots[team_idx], ids, rows)
+
+    def get_ball(self) -> typing.Optional[tuple[float, float]]:
+        """
+        Получить усредненное положение мяча или None, если мяч не был виден
+        """
+        count = self._ball[2]
+        if count == 0:
+            return None
+        return self._ball[0] / count, self._ball[1] / count
+
+    def get_robots(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Получить усредненные положения всех увиденных роботов
+
+        @return (seen, pos, angle):
+            seen - маска увиденных роботов [команда, номер]
+            pos - положения [команда, номер, 2]
+            angle - углы [команда, номер]
+        """
+        sums = self._robots
+        seen = sums[:, :, _COUNT] > 0
+        count = np.where(seen, sums[:, :, _COUNT], 1)
+        pos = sums[:, :, _SUM_X : _SUM_Y + 1] / count[:, :, np.newaxis]
+        angle = np.arctan2(sums[:, :, _SUM_SIN], sums[:, :, _SUM_COS])
+        return seen, pos, angle
+
+
+class VisionPipeline:
+    """
+    Полная обработка пакетов SSL-Vision за тик: разбор, буфер камер, объединение детекций
+    и обновление состояния поля
+    """
+
+    def __init__(self) -> None:
+        """
+        Конструктор
+        """
+        self.decoder = VisionDecoder()
+        self.camera_buffer = CameraBuffer()
+        self.aggregator = VisionAggregator()
+
+    def update(self, fld: field.Field, packets: typing.Iterable[bytes], t: float) -> None:
+        """
+        Обновить поле fld по новым пакетам, все детекции экстраполируются на момент t
+        """
+        self.camera_buffer.push(self.decoder.decode(packets), t)
+        fld.update_geometry()
+
+        # Обновляются только объекты, увиденные в новых кадрах; объекты камер без новых
+        # кадров остаются с прогнозом фильтра
+        frames = self.camera_buffer.get_frames(t)
+        self.aggregator.reset()
+        self.aggregator.set_motion(fld)
+        for detection, delay in frames:
+            self.aggregator.add_detection(detection, delay)
+
+        ball_pos = self.aggregator.get_ball()
+        if ball_pos is not None:
+            fld.update_ball(aux.Point(*ball_pos), t)
+        elif frames and fld.ally_with_ball is not None:
+            ally = fld.ally_with_ball
+            ball = ally.get_pos() + aux.rotate(aux.RIGHT, ally.get_angle()) * ally.get_radius() / 2
+            fld.update_ball(ball, t)
+
+        fld.update_ally_with_ball()
+
+        # TODO: Barrier states
+        seen, positions, angles = self.aggregator.get_robots()
+        for color, team_idx in TEAM_INDEX.items():
+            ids = np.flatnonzero(seen[team_idx])
+            pos = positions[team_idx, ids]
+            if not const.IS_SIMULATOR_USED:
+                # Не обновлять роботов, не сдвинувшихся с прошлого тика (как aux.Point.__eq__)
+                old_pos = fld.get_team_states(color).pos[ids]
+                moved = np.any(np.abs(pos - old_pos) >= 0.1, axis=1)
+                ids, pos = ids[moved], pos[moved]
+            fld.update_team(color, ids, pos, angles[team_idx, ids], t)
+
+        fld.update_used(t)
@@ -0,0 +1,54 @@
+"""
+Процессор зрения: единственный разбор пакетов SSL-Vision для всех потребителей
+
+Обновляет свое поле по пакетам SSL-Vision и публикует снимок его состояния
+в общую память (world_snapshot), откуда его читают контроллеры обоих цветов
+"""
+
+import time
+
+import attr
+from strategy_bridge.bus import DataBus, DataReader
+from strategy_bridge.common import config
+from strategy_bridge.processors import BaseProcessor
+
+from bridge.processors import const, field, vision, world_snapshot
+
+
+@attr.s(auto_attribs=True)
+class VisionProcessor(BaseProcessor):
+    """
+    Процессор, публикующий снимки состояния поля
+    """
+
+    vision_reader: DataReader = attr.ib(init=False)
+
+    def initialize(self, data_bus: DataBus) -> None:
+        """
+        Инициализация
+        """
+        super(VisionProcessor, self).initialize(data_bus)
+        self.vision_reader = DataReader(data_bus, config.VISION_DETECTIONS_TOPIC)
+
+        # Мяч в дриблере достраивается по роботам основной команды (const.COLOR)
+        self.field = field.Field(const.CONTROL_MAPPING, const.COLOR)
+        self.vision = vision.VisionPipeline()
+        self.snapshot = world_snapshot.WorldSnapshot(create=True)
+
+    def process(self) -> None:
+        """
+        Метод обратного вызова процесса
+        """
+        packets: list[bytes] = []
+        for ssl_package in self.vision_reader.read_new():
+            try:
+                ssl_package_content = ssl_package.content
+            except AttributeError:
+                continue
+            if ssl_package_content:
+                packets.append(ssl_package_content)
+
+        # Публикуется и без новых пакетов: устаревшие роботы должны перестать считаться используемыми
+        t = time.time()
+        self.vision.update(self.field, packets, t)
+        self.snapshot.publish(self.field, t)
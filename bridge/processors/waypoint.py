@@ -42,6 +42,8 @@ class Waypoint:
     Описание путевой точки
     """
 
+    __slots__ = ("pos", "angle", "type")
+
     def __init__(self, pos: aux.Point, angle: float, wp_type: WType) -> None:
         """
         Конструктор
@@ -0,0 +1,100 @@
+"""
+Хранение состояния объектов на поле в виде массивов (structure of arrays)
+
+Для каждой группы однотипных объектов (команда роботов, мяч) хранит:
+- положения
+- углы
+- скорости и ускорения
+- флаги использования
+- время последнего обновления
+"""
+
+import typing
+
+import numpy as np
+
+from bridge.processors import const, tracker
+
+Index = typing.Union[int, np.ndarray]
+
+
+class EntityStates:
+    """
+    Состояние группы объектов поля
+
+    Строка i каждого массива описывает объект с индексом i.
+    Скорости и ускорения оцениваются фильтром Калмана (tracker.KalmanTracker),
+    который может быть общим для нескольких групп
+    """
+
+    def __init__(
+        self,
+        count: int,
+        kalman: typing.Optional[tracker.KalmanTracker] = None,
+        offset: int = 0,
+    ) -> None:
+        """
+        Конструктор
+
+        @param count Количество объектов в группе
+        @param kalman Фильтр, строки offset...offset+count которого относятся к группе
+        @param offset Индекс первого объекта группы в фильтре
+        """
+        if kalman is None:
+            kalman = tracker.KalmanTracker(count, const.ROBOT_MEAS_NOISE, const.ROBOT_JERK)
+            offset = 0
+
+        self.count = count
+
+        self.pos = np.zeros((count, 2))
+        self.pos[:, 1] = const.GRAVEYARD_POS_X
+        self.angle = np.zeros(count)
+        self.vel = np.zeros((count, 2))
+        self.acc = np.zeros((count, 2))
+        self.anglevel = np.zeros(count)
+        self.used = np.zeros(count, dtype=bool)
+        self.last_update = np.zeros(count)
+        self.launched = np.zeros(count, dtype=bool)
+
+        self._kalman = kalman
+        self._offset = offset
+
+    def update(
+        self,
+        idx: Index,
+        pos: typing.Union[np.ndarray, typing.Sequence[float]],
+        angle: typing.Union[float, np.ndarray],
+        t: float,
+    ) -> None:
+        """
+        Обновить положения объектов с индексами idx и пересчитать их скорости и ускорения
+
+        idx - индекс объекта или массив индексов
+        pos - новые положения, массив [len(idx), 2]
+        angle - новые углы [рад]
+        t - момент измерения [с], может идти с переменным шагом
+        """
+        idx = np.atleast_1d(idx)
+        self.pos[idx] = pos
+        self.angle[idx] = angle
+
+        z = np.empty((len(idx), tracker.AXES))
+        z[:, :2] = self.pos[idx]
+        z[:, 2] = self.angle[idx]
+        rows = idx + self._offset
+        self._kalman.update(rows, z, t)
+
+        vel = self._kalman.get_vel(rows)
+        acc = self._kalman.get_acc(rows)
+        self.vel[idx] = vel[:, :2]
+        self.acc[idx] = acc[:, :2]
+        self.anglevel[idx] = vel[:, 2]
+
+        self.last_update[idx] = t
+        self.launched[idx] = True
+
+    def update_used(self, t: float, timeout: float = 0.5) -> None:
+        """
+        Пометить используемыми объекты, обновлявшиеся не позднее timeout секунд назад
+        """
+        np.less_equal(t - self.last_update, timeout, out=self.used)
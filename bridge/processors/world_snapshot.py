@@ -0,0 +1,116 @@
+"""
+Снимок состояния поля в общей памяти
+
+Процессор зрения публикует массивы состояния (world.EntityStates) всех роботов и мяча
+в двойной буфер общей памяти, контроллеры и отладочные инструменты подключаются
+только на чтение и копируют снимок в свое поле вместо разбора пакетов SSL-Vision
+
+Кадр: строки 0...2*TEAM_ROBOTS_MAX_COUNT - синие и желтые роботы, затем мяч,
+последняя строка - заголовок (время снимка и размеры поля)
+"""
+
+import typing
+
+import numpy as np
+
+from bridge.processors import const, field, shared_frames, world
+
+# Столбцы строки объекта
+X, Y, ANGLE, VX, VY, AX, AY, ANGLEVEL, USED, LAUNCHED, LAST_UPDATE = range(11)
+# Столбцы заголовка
+T, GOAL_DX, GOAL_DY = range(3)
+
+ENTITIES = 2 * const.TEAM_ROBOTS_MAX_COUNT + 1
+FRAME_SHAPE = (ENTITIES + 1, 11)
+
+SHM_NAME = "ssl-world"
+
+
+class WorldSnapshot:
+    """
+    Двойной буфер снимков состояния поля
+    """
+
+    def __init__(self, create: bool) -> None:
+        """
+        Конструктор
+
+        create - создать буфер (процессор зрения) или подключиться к существующему;
+        при подключении к еще не созданному буферу возникает FileNotFoundError
+        """
+        self._frames = shared_frames.SharedFrames(SHM_NAME, FRAME_SHAPE, 2, create)
+        self._frame = np.zeros(FRAME_SHAPE)
+
+    def publish(self, fld: field.Field, t: float) -> int:
+        """
+        Записать состояние поля fld на момент t
+
+        @return версия снимка
+        """
+        frame = self._frames.begin_write()
+        team = const.TEAM_ROBOTS_MAX_COUNT
+        _write_states(frame[:team], fld.b_states)
+        _write_states(frame[team : 2 * team], fld.y_states)
+        _write_states(frame[2 * team : ENTITIES], fld.ball_states)
+        frame[ENTITIES] = 0
+        frame[ENTITIES, (T, GOAL_DX, GOAL_DY)] = (t, const.GOAL_DX, const.GOAL_DY)
+        return self._frames.end_write()
+
+    def update_field(self, fld: field.Field) -> typing.Optional[float]:
+        """
+        Скопировать в поле fld последний снимок, если он новее прочитанного ранее
+
+        @return время снимка или None, если нового снимка нет
+        """
+        if self._frames.read(self._frame) is None:
+            return None
+        frame = self._frame
+        team = const.TEAM_ROBOTS_MAX_COUNT
+
+        header = frame[ENTITIES]
+        const.GOAL_DX = header[GOAL_DX]
+        const.GOAL_DY = header[GOAL_DY]
+        fld.update_geometry()
+
+        for color, rows in ((const.Color.BLUE, frame[:team]), (const.Color.YELLOW, frame[team : 2 * team])):
+            states = fld.get_team_states(color)
+            updated = np.flatnonzero(rows[:, LAST_UPDATE] != states.last_update)
+            _read_states(rows, states)
+            team_robots = fld.b_team if color == const.Color.BLUE else fld.y_team
+            for r_id in updated:
+                team_robots[r_id].reset_kick()
+
+        _read_states(frame[2 * team : ENTITIES], fld.ball_states)
+        fld.ball_predictor.update(fld.ball_states.pos[0], fld.ball_states.vel[0])
+
+        fld.update_ally_with_ball()
+        fld.update_index()
+        return float(header[T])
+
+    def close(self) -> None:
+        """
+        Отключиться от буфера (и удалить его, если он создан этим объектом)
+        """
+        self._frames.close()
+
+
+def _write_states(rows: np.ndarray, states: world.EntityStates) -> None:
+    rows[:, X : Y + 1] = states.pos
+    rows[:, ANGLE] = states.angle
+    rows[:, VX : VY + 1] = states.vel
+    rows[:, AX : AY + 1] = states.acc
+    rows[:, ANGLEVEL] = states.anglevel
+    rows[:, USED] = states.used
+    rows[:, LAUNCHED] = states.launched
+    rows[:, LAST_UPDATE] = states.last_update
+
+
+def _read_states(rows: np.ndarray, states: world.EntityStates) -> None:
+    states.pos[:] = rows[:, X : Y + 1]
+    states.angle[:] = rows[:, ANGLE]
+    states.vel[:] = rows[:, VX : VY + 1]
+    states.acc[:] = rows[:, AX : AY + 1]
+    states.anglevel[:] = rows[:, ANGLEVEL]
+    states.used[:] = rows[:, USED] > 0
+    states.launched[:] = rows[:, LAUNCHED] > 0
+    states.last_update[:] = rows[:, LAST_UPDATE]
@@ -13,6 +13,7 @@ import bridge.processors.const as const
 import bridge.processors.strategy as strategy
 from bridge.processors.python_controller import SSLController
 from bridge.processors.robot_command_sink import CommandSink
+from bridge.processors.vision_processor import VisionProcessor
 
 if __name__ == "__main__":
 
@@ -24,7 +25,7 @@ if __name__ == "__main__":
         # SSLController(
         #     ally_color="y",
         #     # should_debug=True,
-        #     processing_pause=const.Ts,  # type:ignore
+        #     processing_pause=const.LOW_LEVEL_Ts,  # type:ignore
         #     reduce_pause_on_process_time=True,
         #     dbg_game_status=strategy.GameStates.RUN,
         #     dbg_state=strategy.States.ATTACK,
@@ -32,18 +33,24 @@ if __name__ == "__main__":
         SSLController(
             ally_color=const.COLOR,
             # should_debug=True,
-            processing_pause=const.Ts,  # type:ignore
+            processing_pause=const.LOW_LEVEL_Ts,  # type:ignore
             reduce_pause_on_process_time=True,
             dbg_game_status=strategy.GameStates.RUN,
             dbg_state=strategy.States.ATTACK,
         ),
-        CommandSink(processing_pause=const.Ts / 2),  # , should_debug=True
+        CommandSink(processing_pause=const.SINK_Ts),  # , should_debug=True
         RobotCommandsSender(
-            processing_pause=const.Ts / 2,
+            processing_pause=const.SINK_Ts,
             should_debug=True,
             reduce_pause_on_process_time=True,
         ),
     ]
 
+    if const.VISION_SHM:
+        # SSL-Vision разбирается один раз с частотой камер, контроллеры читают снимок поля из общей памяти
+        PROCESSORS.insert(
+            2, VisionProcessor(processing_pause=const.VISION_Ts, reduce_pause_on_process_time=True)  # type:ignore
+        )
+
     RUNNER = Runner(processors=PROCESSORS)
     RUNNER.run()
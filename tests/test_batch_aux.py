@@ -0,0 +1,116 @@
+"""
+Сравнение векторизованных функций batch_aux с исходными функциями auxiliary
+"""
+
+import numpy as np
+import pytest
+
+import bridge.processors.auxiliary as aux
+from bridge.processors import batch_aux
+
+CASES = 300
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(2024)
+
+
+def random_point(rng: np.random.Generator, scale: float = 1000) -> aux.Point:
+    return aux.Point(*rng.uniform(-scale, scale, 2).tolist())
+
+
+def random_poly(rng: np.random.Generator) -> list[aux.Point]:
+    """
+    Случайный выпуклый полигон: вершины на окружности в порядке обхода
+    """
+    center = rng.uniform(-300, 300, 2)
+    radius = rng.uniform(100, 600)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, int(rng.integers(3, 8))))
+    return [aux.Point(*(center + radius * np.array([np.cos(a), np.sin(a)])).tolist()) for a in angles]
+
+
+def assert_point(actual: np.ndarray, expected: aux.Point) -> None:
+    assert actual == pytest.approx([expected.x, expected.y], abs=1e-6)
+
+
+@pytest.mark.parametrize("is_inf", ["S", "R", "L"])
+def test_closest_point_on_line(rng: np.random.Generator, is_inf: str) -> None:
+    p1 = [random_point(rng) for _ in range(CASES)]
+    p2 = [random_point(rng) for _ in range(CASES)]
+    points = [random_point(rng, 2000) for _ in range(CASES)]
+    p2[0] = p1[0]  # вырожденная линия
+
+    result = batch_aux.closest_point_on_line(
+        batch_aux.to_array(p1), batch_aux.to_array(p2), batch_aux.to_array(points), is_inf
+    )
+    for i in range(CASES):
+        assert_point(result[i], aux.closest_point_on_line(p1[i], p2[i], points[i], is_inf))
+
+
+def test_segment_poly_intersect(rng: np.random.Generator) -> None:
+    for _ in range(20):
+        poly = random_poly(rng)
+        starts = [random_point(rng) for _ in range(CASES)]
+        ends = [random_point(rng) for _ in range(CASES)]
+
+        points, found = batch_aux.segment_poly_intersect(
+            batch_aux.to_array(starts), batch_aux.to_array(ends), batch_aux.to_array(poly)
+        )
+        for i in range(CASES):
+            expected = aux.segment_poly_intersect(starts[i], ends[i], poly)
+            assert found[i] == (expected is not None)
+            if expected is not None:
+                assert_point(points[i], expected)
+
+
+def test_is_point_inside_poly(rng: np.random.Generator) -> None:
+    for _ in range(20):
+        poly = random_poly(rng)
+        points = [random_point(rng) for _ in range(CASES)]
+
+        inside = batch_aux.is_point_inside_poly(batch_aux.to_array(points), batch_aux.to_array(poly))
+        assert inside.tolist() == [aux.is_point_inside_poly(p, poly) for p in points]
+
+
+def test_nearest_point_on_poly(rng: np.random.Generator) -> None:
+    for _ in range(20):
+        poly = random_poly(rng)
+        points = [random_point(rng) for _ in range(CASES)]
+
+        result = batch_aux.nearest_point_on_poly(batch_aux.to_array(points), batch_aux.to_array(poly))
+        for i, point in enumerate(points):
+            assert_point(result[i], aux.nearest_point_on_poly(point, poly))
+
+
+def test_get_tangent_points(rng: np.random.Generator) -> None:
+    center = random_point(rng)
+    radius = 400.0
+    points = [random_point(rng, 2000) for _ in range(CASES)]
+    points[0] = center + aux.Point(radius, 0)  # точка на окружности
+
+    tangents, count = batch_aux.get_tangent_points(batch_aux.to_array([center])[0], batch_aux.to_array(points), radius)
+    for i, point in enumerate(points):
+        expected = aux.get_tangent_points(center, point, radius)
+        assert count[i] == (0 if expected is None else len(expected))
+        for k, tangent in enumerate(expected or []):
+            assert_point(tangents[i, k], tangent)
+
+
+def test_line_circle_intersect(rng: np.random.Generator) -> None:
+    center = random_point(rng, 500)
+    radius = 500.0
+    x1 = [random_point(rng, 1500) for _ in range(CASES)]
+    x2 = [random_point(rng, 1500) for _ in range(CASES)]
+    # Касательная к окружности
+    x1[0], x2[0] = center + aux.Point(-1000, radius), center + aux.Point(1000, radius)
+
+    points, valid = batch_aux.line_circle_intersect(
+        batch_aux.to_array(x1), batch_aux.to_array(x2), batch_aux.to_array([center])[0], radius
+    )
+    for i in range(CASES):
+        expected = aux.line_circle_intersect(x1[i], x2[i], center, radius) or []
+        actual = [points[i, k] for k in range(2) if valid[i, k]]
+        assert len(actual) == len(expected)
+        for point, exp in zip(actual, expected):
+            assert_point(point, exp)